@@ -0,0 +1,4 @@
+"""
+Benchmarks for the brand lift pipeline on synthetic data. Run one from the folder holding the step
+scripts, e.g. `python -m benchmarks.learners`; none of them touch Google, OpenAI or real survey files.
+"""
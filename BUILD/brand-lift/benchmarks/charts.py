@@ -0,0 +1,60 @@
+"""
+Wall time of rendering step 3's report figures on 1..N worker processes with render_charts.
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from brand_lift.charts import chart_job, draw_kpi_distribution, draw_summary_table, render_charts
+
+QUESTIONS = 40
+OPTIONS = 6
+
+
+def synthetic_chart_jobs(out_dir, n_questions=QUESTIONS, n_options=OPTIONS, seed=0) -> list:
+    """One response distribution per question plus a summary table per ten questions, as in a report."""
+    rng = np.random.default_rng(seed)
+    options = [f"Option {i}" for i in range(n_options)]
+    jobs = []
+    for q in range(n_questions):
+        counts = pd.DataFrame(
+            [(o, p, int(rng.integers(50, 500))) for o in options for p in ('Control', 'Exposed')],
+            columns=['Response_Code', 'panel_group', 'count']
+        )
+        jobs.append(chart_job(draw_kpi_distribution, os.path.join(out_dir, f"Q{q}_distribution.png"), counts=counts,
+                              question_id=f"Q{q}", panel_col='panel_group', order=options, hue_order=['Control','Exposed']))
+    summary_df = pd.DataFrame({'KPI': [f"KPI {i}" for i in range(8)], 'ATE_AIPW (%)': rng.normal(2, 1, 8).round(2)})
+    for t in range(max(1, n_questions // 10)):
+        jobs.append(chart_job(draw_summary_table, os.path.join(out_dir, f"summary_table_{t}.png"), summary_df=summary_df))
+    return jobs
+
+
+def benchmark_chart_rendering(n_questions=QUESTIONS, worker_counts=None) -> dict:
+    """Render synthetic_chart_jobs with each worker count; returns {workers: seconds}."""
+    out_dir = tempfile.mkdtemp(prefix="chart_benchmark_")
+    jobs = synthetic_chart_jobs(out_dir, n_questions)
+    cores = os.cpu_count() or 1
+    worker_counts = worker_counts or sorted({1, 2, 4, cores} & set(range(1, cores + 1)))
+    timings = {}
+    try:
+        for n_workers in worker_counts:
+            start = time.perf_counter()
+            written = render_charts(jobs, n_workers=n_workers)
+            timings[n_workers] = time.perf_counter() - start
+            print(f"{len(written):>4} of {len(jobs)} figures on {n_workers:>3} process(es): {timings[n_workers]:7.2f}s "
+                  f"({timings[worker_counts[0]] / timings[n_workers]:.2f}x)")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return timings
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    benchmark_chart_rendering()
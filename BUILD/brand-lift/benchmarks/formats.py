@@ -0,0 +1,67 @@
+"""
+Size on disk, write time and load time of step 2's long table as CSV, Parquet and Arrow IPC, loaded the
+way step 3's load_data does.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import write_export
+from brand_lift.reshape import long_output_path, reshape_vectorized
+
+SIZES = (100_000, 1_000_000)
+FORMATS = ("csv", "parquet", "arrow")
+QUESTIONS = 10
+OPTIONS = 4
+
+
+def read_long_table(path) -> pd.DataFrame:
+    """Same reads as load_data / load_columnar in step 3."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        table = pq.read_table(path, memory_map=True)
+    elif ext == ".arrow":
+        with pa.memory_map(path, 'r') as source:
+            table = pa_ipc.open_file(source).read_all()
+    else:
+        return pd.read_csv(path, dtype={'Respondent_ID': str})
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def benchmark_long_formats(sizes=SIZES, formats=FORMATS, n_questions=QUESTIONS, n_options=OPTIONS) -> pd.DataFrame:
+    """Per export size and format: long-table size on disk, reshape+write time and load time."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            wide_path = os.path.join(tmp, f"original_{n}.csv")
+            kpi_config, question_to_subcols = write_export(wide_path, n, n_questions, n_options)
+            for output_format in formats:
+                out_path = long_output_path(os.path.join(tmp, f"long_{n}.csv"), output_format)
+                start = time.perf_counter()
+                reshape_vectorized(wide_path, out_path, kpi_config, question_to_subcols, output_format=output_format)
+                write_s = time.perf_counter() - start
+                start = time.perf_counter()
+                long_df = read_long_table(out_path)
+                load_s = time.perf_counter() - start
+                size_mb = os.path.getsize(out_path) / 2**20
+                rows.append({'respondents': n, 'format': output_format, 'long_rows': len(long_df),
+                             'size_mb': round(size_mb, 1), 'write_s': round(write_s, 3), 'load_s': round(load_s, 3)})
+                print(f"{n:>9} respondents | {output_format:<7} | {size_mb:8.1f} MB | "
+                      f"write {write_s:6.2f}s | load {load_s:6.2f}s")
+                del long_df
+                os.remove(out_path)
+            os.remove(wide_path)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print(benchmark_long_formats())
@@ -0,0 +1,51 @@
+"""
+Wall time of step 2's sharded reshaper (reshape_parallel) on 1..N worker processes, checked
+byte-for-byte against the vectorized reshape.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import write_export
+from brand_lift.cache import file_hash
+from brand_lift.reshape import reshape_parallel, reshape_vectorized
+
+RESPONDENTS = 1_000_000
+QUESTIONS = 10
+OPTIONS = 4
+
+
+def benchmark_parallel_scaling(n_respondents=RESPONDENTS, max_workers=None, n_questions=QUESTIONS,
+                               n_options=OPTIONS) -> pd.DataFrame:
+    """Time reshape_parallel with 1..max_workers processes (default: all cores) on one export."""
+    max_workers = max_workers or os.cpu_count() or 1
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        wide_path = os.path.join(tmp, "original.csv")
+        kpi_config, question_to_subcols = write_export(wide_path, n_respondents, n_questions, n_options)
+        reference_path = os.path.join(tmp, "long_vectorized.csv")
+        reshape_vectorized(wide_path, reference_path, kpi_config, question_to_subcols)
+        reference = file_hash(reference_path)
+        baseline = None
+        for n_workers in range(1, max_workers + 1):
+            out_path = os.path.join(tmp, f"long_parallel_{n_workers}.csv")
+            start = time.perf_counter()
+            reshape_parallel(wide_path, out_path, kpi_config, question_to_subcols, n_workers=n_workers)
+            elapsed = time.perf_counter() - start
+            if file_hash(out_path) != reference:
+                raise AssertionError(f"Parallel output with {n_workers} workers differs from the vectorized reshape.")
+            os.remove(out_path)
+            baseline = baseline or elapsed
+            rows.append({'workers': n_workers, 'seconds': round(elapsed, 3), 'speedup': round(baseline / elapsed, 2)})
+            print(f"{n_workers:>3} workers | {elapsed:8.2f}s | {baseline / elapsed:5.2f}x")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print(benchmark_parallel_scaling())
@@ -0,0 +1,280 @@
+"""
+Per-stage time, throughput and memory of the whole brand lift pipeline (step 2's reshape, then
+step 3's cleaning, segment cube, top-box scores, significance tests, causal stage, charts, uploads,
+commentary and deck) on synthetic campaigns, with Drive, Slides and OpenAI replaced by local stubs.
+"""
+import asyncio
+import io
+import itertools
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager, redirect_stdout
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from brand_lift import uploads
+from brand_lift.causal import RespondentMatrix, aipw_interval, aipw_terms, cross_fit_nuisance
+from brand_lift.charts import chart_job, draw_aipw_distribution, draw_kpi_distribution, draw_panel_distribution, render_charts
+from brand_lift.commentary import CommentaryGenerator
+from brand_lift.profiling import RunProfiler
+from brand_lift.reshape import build_question_to_subcols, reshape_vectorized
+from brand_lift.segments import SegmentCube, TopBoxScorer, top_box_keywords
+from brand_lift.slides import DeckBuilder
+from brand_lift.stats import batched_chi_square
+from brand_lift.survey import DataCleaner
+from brand_lift.uploads import ImageUploader
+
+SIZES = (1_000, 10_000, 50_000)
+QUESTIONS = 8
+OPTIONS = 4
+EXPOSED_SHARE = 0.5
+EFFECT = 0.05
+# Step 3's defaults; the smoke test swaps in cheaper ones.
+LEARNER = "random_forest"
+FOLDS = 5
+BOOTSTRAP_B = 500
+CHAT_LATENCY = 0.05
+
+# KPI questions cycle through these scales, so Q2 is purchase intent (step 3's purchase_binary).
+KPI_SCALES = {
+    "Brand Awareness": ["Very aware", "Somewhat aware", "Heard of it", "Not aware"],
+    "Purchase Intent": ["Very likely", "Somewhat likely", "Unsure", "Not likely"],
+    "Consideration": ["Definitely would consider", "Might consider", "Would not consider"],
+    "Brand Preference": ["Prefer this brand", "No preference", "Prefer a competitor"],
+}
+DEMOGRAPHICS = {
+    "Q9": ("Age", ["18-24", "25-34", "35-44", "45-54", "55-64", "65+"]),
+    "Q10": ("Gender", ["Male", "Female", "Non-binary/third gender", "Prefer not to say"]),
+}
+SEGMENT_QUESTIONS = {name: q_id for q_id, (name, _) in DEMOGRAPHICS.items()}
+
+
+def make_synthetic_campaign(path, n_respondents, n_questions=QUESTIONS, n_options=OPTIONS, exposed_share=EXPOSED_SHARE,
+                            effect_size=EFFECT, seed=123, block_size=100_000) -> dict:
+    """
+    Write a wide Cint-style export to path. Exposed respondents pick each KPI question's first
+    (top-box) option effect_size more often than Control; Q9/Q10 carry age and gender.
+    Returns step 2's kpi_config and question_to_subcols, step 3's kpi_dict ({KPI: question IDs})
+    and the top-box option of each KPI.
+    """
+    rng = np.random.default_rng(seed)
+    kpi_names = list(KPI_SCALES)
+    q_numbers = itertools.islice((q for q in itertools.count(1) if f"Q{q}" not in DEMOGRAPHICS), n_questions)
+    questions, kpi_dict, reshape_mappings = [], {}, {}
+    for i, q in enumerate(q_numbers):
+        kpi = kpi_names[i % len(kpi_names)]
+        labels = (KPI_SCALES[kpi] + [f"Option {k}" for k in range(len(KPI_SCALES[kpi]) + 1, n_options + 1)])[:max(2, n_options)]
+        p_control = np.full(len(labels), 1 / len(labels))
+        lift = float(np.clip(effect_size, -p_control[0], 1 - p_control[0]))
+        p_exposed = p_control + np.r_[lift, np.full(len(labels) - 1, -lift / (len(labels) - 1))]
+        q_text = f"Q{q}_{kpi} question {q}"
+        questions.append((q_text, labels, p_control, p_exposed))
+        kpi_dict.setdefault(kpi, []).append(f"Q{q}")
+        reshape_mappings.setdefault(kpi, []).append(q_text)
+    for q_id, (name, labels) in DEMOGRAPHICS.items():
+        flat = np.full(len(labels), 1 / len(labels))
+        questions.append((f"{q_id}_{name}", labels, flat, flat))
+        reshape_mappings.setdefault("Demographics", []).append(f"{q_id}_{name}")
+
+    code_mapping = {
+        q_text: {f"{q_text.split('_')[0]}_{o + 1}": label for o, label in enumerate(labels)}
+        for q_text, labels, _, _ in questions
+    }
+    # Written in blocks so large exports don't dominate the memory figures being measured.
+    for start in range(0, max(n_respondents, 1), block_size):
+        n = max(min(block_size, n_respondents - start), 0)
+        exposed = rng.random(n) < exposed_share
+        columns = {
+            "Respondent ID": np.char.add("R", np.arange(start, start + n).astype(str)),
+            "Panel_Group": np.where(exposed, "Exposed", "Control"),
+        }
+        for q_text, labels, p_control, p_exposed in questions:
+            u = rng.random(n)
+            picked = np.where(exposed, np.searchsorted(np.cumsum(p_exposed), u, side='right'),
+                              np.searchsorted(np.cumsum(p_control), u, side='right'))
+            picked = np.minimum(picked, len(labels) - 1)  # cumsum may end just below 1.0
+            for o, col_name in enumerate(code_mapping[q_text]):
+                columns[col_name] = np.where(picked == o, "1", "")
+        pd.DataFrame(columns).to_csv(path, index=False, mode='w' if start == 0 else 'a', header=start == 0)
+    return {
+        'kpi_config': {"kpi_mappings": reshape_mappings},
+        'question_to_subcols': build_question_to_subcols(code_mapping),
+        'kpi_dict': kpi_dict,
+        'top_box': {kpi: [KPI_SCALES[kpi][0]] for kpi in kpi_dict},
+    }
+
+
+class FakeDriveService:
+    """Drive v3 files().create and batched permissions().create, answered locally."""
+    def __init__(self):
+        self.uploads = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return SimpleNamespace(create=lambda fileId, body: fileId)
+
+    def create(self, body, media_body, fields):
+        def execute():
+            with self._lock:
+                file_id = f"file{next(self._ids)}"
+                self.uploads += 1
+            return {'id': file_id, 'webContentLink': f"https://drive.example/{file_id}"}
+        return SimpleNamespace(execute=execute)
+
+    def new_batch_http_request(self, callback):
+        requests = []
+        return SimpleNamespace(add=lambda request, request_id: requests.append(request_id),
+                               execute=lambda: [callback(request_id, {'id': 'perm'}, None) for request_id in requests])
+
+
+class FakeSlidesService:
+    """Slides v1 presentations().batchUpdate, recording the number of requests sent."""
+    def __init__(self):
+        self.requests = 0
+
+    def presentations(self):
+        return self
+
+    def batchUpdate(self, presentationId, body):
+        def execute():
+            self.requests += len(body['requests'])
+            return {'replies': [{} for _ in body['requests']]}
+        return SimpleNamespace(execute=execute)
+
+
+class StubChat:
+    """Async stand-in for openai.ChatCompletion.acreate that answers after `latency` seconds."""
+    def __init__(self, latency=CHAT_LATENCY):
+        self.latency = latency
+
+    async def __call__(self, model, messages, max_tokens, temperature, request_timeout):
+        await asyncio.sleep(self.latency)
+        content = f"Stub commentary on: {messages[1]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@contextmanager
+def fake_media_upload():
+    """Let ImageUploader run without googleapiclient: MediaFileUpload just records the path."""
+    available, media_upload = uploads.GOOGLE_API_AVAILABLE, getattr(uploads, 'MediaFileUpload', None)
+    uploads.GOOGLE_API_AVAILABLE = True
+    uploads.MediaFileUpload = lambda path, mimetype: (path, mimetype)
+    try:
+        yield
+    finally:
+        uploads.GOOGLE_API_AVAILABLE = available
+        if media_upload is None:
+            del uploads.MediaFileUpload
+        else:
+            uploads.MediaFileUpload = media_upload
+
+
+def run_pipeline(campaign: dict, wide_path, out_dir, profiler, learner=LEARNER, folds=FOLDS, bootstrap_b=BOOTSTRAP_B,
+                 chart_workers=-1, chat_latency=CHAT_LATENCY) -> dict:
+    """Run every stage once on a campaign from make_synthetic_campaign; returns counts of what each stage produced."""
+    kpi_dict = campaign['kpi_dict']
+    long_path = os.path.join(out_dir, "survey_responses_long.csv")
+    with profiler.stage('reshape'), redirect_stdout(io.StringIO()):
+        reshape_vectorized(wide_path, long_path, campaign['kpi_config'], campaign['question_to_subcols'])
+    with profiler.stage('cleaning'):
+        df = pd.read_csv(long_path, dtype={'Respondent_ID': str}).rename(columns={'Panel_Group': 'panel_group'})
+        cleaner = DataCleaner(df, high_missing_threshold=90.0)
+        cleaner.run()
+        survey = cleaner.survey
+    with profiler.stage('segment_cube'):
+        segment_cube = SegmentCube(survey, SEGMENT_QUESTIONS)
+    with profiler.stage('top_box'):
+        top_box_cube = TopBoxScorer(segment_cube).cube(
+            {kpi: (questions, top_box_keywords(kpi)) for kpi, questions in kpi_dict.items()}, segments=segment_cube.segments)
+        TopBoxScorer.rates(top_box_cube, ['score', 'panel_group'])
+    with profiler.stage('stat_tests'):
+        q_ids = [q for questions in kpi_dict.values() for q in questions]
+        dense = segment_cube.array(['Question_ID', 'panel_group', 'Response_Code'])
+        _, p_values, _, _ = batched_chi_square(dense[segment_cube.labels['Question_ID'].get_indexer(q_ids)])
+    with profiler.stage('causal'):
+        with profiler.stage('respondent_matrix'):
+            outcomes = {kpi: (kpi_dict[kpi], options) for kpi, options in campaign['top_box'].items()}
+            matrix = RespondentMatrix(survey, list(DEMOGRAPHICS), outcomes=outcomes)
+        Y_all = np.column_stack([matrix.Y, matrix.outcomes.to_numpy()])
+        ps, mu0, mu1, _ = cross_fit_nuisance(matrix.X, matrix.W, Y_all, folds=folds, learner=learner, profiler=profiler)
+        _, _, _, aipw_bs = aipw_interval(aipw_terms(Y_all, matrix.W, ps, mu0, mu1), B=bootstrap_b, profiler=profiler)
+
+    jobs = [chart_job(draw_panel_distribution, os.path.join(out_dir, "panel_group_distribution.png"),
+                      panel_counts=segment_cube.counts_by(['panel_group'])),
+            chart_job(draw_aipw_distribution, os.path.join(out_dir, "aipw_distribution.png"), aipw_bs=aipw_bs[:, 0])]
+    for q_id in q_ids:
+        counts = segment_cube.counts_by(['Response_Code', 'panel_group'], where={'Question_ID': [q_id]})
+        jobs.append(chart_job(draw_kpi_distribution, os.path.join(out_dir, f"{q_id}_distribution.png"),
+                              counts=counts.reset_index(), question_id=q_id, panel_col='panel_group', order=None,
+                              hue_order=['Control', 'Exposed']))
+    charts = render_charts(jobs, n_workers=chart_workers, profiler=profiler)
+
+    drive = FakeDriveService()
+    with fake_media_upload():
+        image_urls = ImageUploader('benchmark', service_factory=lambda: drive, profiler=profiler).upload(charts)
+    with profiler.stage('commentary'):
+        commentaries = CommentaryGenerator(system_msg="You write brand lift commentary.", create=StubChat(chat_latency),
+                                           profiler=profiler).generate({
+            q_id: f"Summarise the Control vs Exposed difference for {q_id} (p={p:.3g})." for q_id, p in zip(q_ids, p_values)
+        })
+    slides_service = FakeSlidesService()
+    with profiler.stage('deck'):
+        deck = DeckBuilder(slides_service, 'benchmark', profiler=profiler)
+        for q_id, text in commentaries.items():
+            slide_id = deck.add_slide()
+            deck.add_text_box(slide_id, f"{q_id}: {text}")
+            deck.add_image(slide_id, image_urls.get(os.path.join(out_dir, f"{q_id}_distribution.png")))
+        deck.flush()
+    return {'long_rows': len(survey.df), 'charts': len(charts), 'uploads': drive.uploads,
+            'commentaries': len(commentaries), 'slide_requests': slides_service.requests}
+
+
+def benchmark_pipeline(sizes=SIZES, **options) -> pd.DataFrame:
+    """
+    run_pipeline on a synthetic campaign of each size (options go to run_pipeline). One row per
+    top-level stage: wall/CPU time, respondents per second and RSS. ru_maxrss only ever grows, so
+    sizes run smallest first and rss_growth_mb is the figure to compare across sizes.
+    """
+    rows = []
+    for n in sorted(sizes):
+        out_dir = tempfile.mkdtemp(prefix="pipeline_benchmark_")
+        try:
+            wide_path = os.path.join(out_dir, "original.csv")
+            campaign = make_synthetic_campaign(wide_path, n)
+            profiler = RunProfiler()
+            produced = run_pipeline(campaign, wide_path, out_dir, profiler, **options)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+        for record in profiler.stages:
+            if '/' in record['stage']:
+                continue
+            rows.append({
+                'respondents': n,
+                **produced,
+                'stage': record['stage'],
+                'wall_s': record['wall_s'],
+                'cpu_s': record['cpu_s'],
+                'child_cpu_s': record['child_cpu_s'],
+                'respondents_per_s': round(n / max(record['wall_s'], 1e-9)),
+                'peak_rss_mb': record['peak_rss_mb'],
+                'rss_growth_mb': record['rss_growth_mb'],
+            })
+            print(f"{n:>9} respondents | {record['stage']:<14} | {record['wall_s']:8.2f}s | "
+                  f"{rows[-1]['respondents_per_s']:>10,} resp/s | +{record['rss_growth_mb']:.0f} MB RSS")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print(benchmark_pipeline())
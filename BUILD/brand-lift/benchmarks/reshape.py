@@ -0,0 +1,52 @@
+"""
+Wall time of step 2's rowwise and vectorized reshapers on synthetic exports of 10k, 100k and 1M
+respondents, checking that every mode writes the same bytes.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import write_export
+from brand_lift.cache import file_hash
+from brand_lift.reshape import RESHAPERS
+
+SIZES = (10_000, 100_000, 1_000_000)
+MODES = ("rowwise", "vectorized")
+# write_export answers about 60% of option columns, so each respondent becomes ~20 long rows.
+QUESTIONS = 10
+OPTIONS = 4
+
+
+def benchmark_reshape(sizes=SIZES, modes=MODES, n_questions=QUESTIONS, n_options=OPTIONS) -> pd.DataFrame:
+    """Time each RESHAPERS mode per export size; raises AssertionError if two modes' outputs differ."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            wide_path = os.path.join(tmp, f"original_{n}.csv")
+            kpi_config, question_to_subcols = write_export(wide_path, n, n_questions, n_options)
+            digests, seconds = {}, {}
+            for mode in modes:
+                out_path = os.path.join(tmp, f"long_{mode}_{n}.csv")
+                start = time.perf_counter()
+                RESHAPERS[mode](wide_path, out_path, kpi_config, question_to_subcols)
+                seconds[mode] = time.perf_counter() - start
+                digests[mode] = file_hash(out_path)
+                rows.append({'respondents': n, 'mode': mode, 'seconds': round(seconds[mode], 3),
+                             'long_mb': round(os.path.getsize(out_path) / 2**20, 1)})
+                print(f"{n:>9} respondents | {mode:<10} | {seconds[mode]:8.2f}s "
+                      f"({seconds[modes[0]] / seconds[mode]:.1f}x vs {modes[0]})")
+                os.remove(out_path)
+            if len(set(digests.values())) != 1:
+                raise AssertionError(f"Reshaper outputs differ at {n} respondents: {digests}")
+            os.remove(wide_path)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print(benchmark_reshape())
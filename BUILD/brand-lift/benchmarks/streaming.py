@@ -0,0 +1,63 @@
+"""
+Peak RSS of step 2's streaming reshaper (reshape_streaming) against the in-memory vectorized one
+as the export grows: streaming should stay flat at roughly one chunk, vectorized should grow with
+the input.
+"""
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import write_export
+from brand_lift.profiling import peak_rss_mb
+from brand_lift.reshape import reshape_streaming, reshape_vectorized
+
+SIZES = (50_000, 200_000, 800_000)
+CHUNK_SIZE = 50_000
+QUESTIONS = 10
+OPTIONS = 4
+
+
+def _peak_rss_growth_mb(mode, input_path, output_path, kpi_config, question_to_subcols, chunk_size):
+    # A forked worker starts with its parent's RSS as its high-water mark, so report the growth.
+    baseline = peak_rss_mb()
+    if mode == "streaming":
+        reshape_streaming(input_path, output_path, kpi_config, question_to_subcols, chunk_size=chunk_size, resume=False)
+    else:
+        reshape_vectorized(input_path, output_path, kpi_config, question_to_subcols)
+    return peak_rss_mb() - baseline
+
+
+def benchmark_streaming_memory(sizes=SIZES, modes=("streaming", "vectorized"), chunk_size=CHUNK_SIZE,
+                               n_questions=QUESTIONS, n_options=OPTIONS) -> pd.DataFrame:
+    """
+    Peak RSS growth per reshaper and export size. Each run happens in a freshly forked worker so
+    its peak RSS isn't inherited from earlier runs (fork is unavailable on Windows).
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            wide_path = os.path.join(tmp, f"original_{n}.csv")
+            kpi_config, question_to_subcols = write_export(wide_path, n, n_questions, n_options)
+            input_mb = os.path.getsize(wide_path) / 2**20
+            for mode in modes:
+                out_path = os.path.join(tmp, f"long_{mode}_{n}.csv")
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as pool:
+                    growth_mb = pool.submit(_peak_rss_growth_mb, mode, wide_path, out_path, kpi_config,
+                                            question_to_subcols, chunk_size).result()
+                rows.append({'respondents': n, 'input_mb': round(input_mb, 1), 'mode': mode,
+                             'peak_rss_growth_mb': round(growth_mb, 1)})
+                print(f"{n:>9} respondents ({input_mb:7.1f} MB) | {mode:<10} | peak RSS +{growth_mb:8.1f} MB")
+                os.remove(out_path)
+            os.remove(wide_path)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print(benchmark_streaming_memory())
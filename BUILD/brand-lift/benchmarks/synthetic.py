@@ -0,0 +1,44 @@
+"""
+Synthetic survey inputs shared by the benchmarks and the tests.
+"""
+import numpy as np
+import pandas as pd
+
+from brand_lift.reshape import build_question_to_subcols
+
+# Answer cells as they appear in Cint exports: ticked, blank (twice as likely), padded, explicit 0.
+EXPORT_CELLS = np.array(["1", "", "", " 1 ", "0"])
+
+
+def write_export(path, n_respondents, n_questions=6, n_options=4, seed=7, block_size=100_000):
+    """
+    A wide Cint-style export with the quirks the reshapers must agree on: a BOM, CRLF line ends,
+    zero-padded IDs, a quoted free-text column, padded and zero answer cells, an option column
+    missing from the export and a KPI question outside the code mapping. Written in blocks of
+    block_size respondents, so a 1M-respondent export never sits in memory.
+    Returns (kpi_config, question_to_subcols).
+    """
+    rng = np.random.default_rng(seed)
+    code_mapping = {
+        f"Q{q}_question {q}": {f"Q{q}_{o + 1}": f"Option {o + 1}, q{q}" for o in range(n_options)}
+        for q in range(1, n_questions + 1)
+    }
+    # An option column missing from the export and a question outside the KPI config are skipped.
+    code_mapping["Q1_question 1"]["Q1_9"] = "Never exported"
+    option_cols = [col for options in code_mapping.values() for col in options if col != "Q1_9"]
+    for start in range(0, max(n_respondents, 1), block_size):
+        n = max(min(block_size, n_respondents - start), 0)
+        columns = {
+            "Respondent ID": np.char.zfill(np.arange(start, start + n).astype(str), 5),
+            "Panel_Group": np.where(rng.random(n) < 0.5, "Exposed", "Control"),
+            "Notes": np.full(n, "free text, with a comma"),
+        }
+        cells = EXPORT_CELLS[rng.integers(0, len(EXPORT_CELLS), size=(n, len(option_cols)))]
+        columns.update(zip(option_cols, cells.T))
+        pd.DataFrame(columns).to_csv(path, index=False, mode='w' if start == 0 else 'a', header=start == 0,
+                                     encoding='utf-8-sig' if start == 0 else 'utf-8', lineterminator="\r\n")
+    kpi_config = {"kpi_mappings": {
+        "Brand Awareness": list(code_mapping)[:3],
+        "Purchase Intent": list(code_mapping)[3:-1] + ["Q99_not in the code mapping"],
+    }}
+    return kpi_config, build_question_to_subcols(code_mapping)
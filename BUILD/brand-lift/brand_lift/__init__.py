@@ -0,0 +1 @@
+"""Helpers shared by the brand lift step 1-3 scripts."""
@@ -0,0 +1,202 @@
+"""On-disk caches for the brand lift scripts: content hashes, the step 3 stage cache and the LLM prompt cache."""
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from brand_lift.profiling import RunProfiler
+
+
+def file_hash(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def content_hash(*parts) -> str:
+    """Stable hash of stage inputs: DataFrames/arrays by content, everything else as sorted JSON."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+        elif isinstance(part, np.ndarray):
+            h.update(np.ascontiguousarray(part).tobytes())
+        elif isinstance(part, bytes):
+            h.update(part)
+        else:
+            h.update(json.dumps(part, sort_keys=True, default=str).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed on-disk cache of stage results with size-based LRU eviction. Keys include
+    code_version (step 3 passes a fingerprint of the pipeline code), so entries from edited code
+    are never reused. Each run() is timed as a stage of the profiler.
+    """
+    def __init__(self, cache_dir, max_mb=2048, enabled=True, code_version="", profiler=None):
+        self.cache_dir=cache_dir
+        self.max_bytes=max_mb*2**20
+        self.enabled=enabled
+        self.code_version=code_version
+        self.profiler=profiler or RunProfiler()
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, stage: str, *parts) -> str:
+        return content_hash(self.code_version, stage, *parts)
+
+    def run(self, stage: str, key: str, compute, files=None, cacheable=None):
+        """
+        Return the cached result for (stage, key) or compute and store it. `files(value)` lists
+        artifacts (e.g. PNGs) the stage writes; their bytes are cached too and restored on a hit.
+        A value for which `cacheable(value)` is false is returned without being stored.
+        """
+        with self.profiler.stage(stage):
+            path = os.path.join(self.cache_dir, f"{stage}-{key}.pkl")
+            if self.enabled and os.path.exists(path):
+                try:
+                    with open(path, 'rb') as f:
+                        entry = pickle.load(f)
+                    os.utime(path)  # mark as recently used
+                    for file_path, blob in entry['files'].items():
+                        if not os.path.exists(file_path) or os.path.getsize(file_path)!=len(blob):
+                            with open(file_path, 'wb') as out:
+                                out.write(blob)
+                    logging.info(f"Stage cache hit: {stage} ({key[:12]})")
+                    return entry['value']
+                except Exception as e:
+                    warnings.warn(f"Ignoring unreadable cache entry for {stage}: {e}")
+
+            value = compute()
+            if cacheable and not cacheable(value):
+                logging.info(f"Stage {stage} ({key[:12]}) recomputed; result not cached")
+                return value
+            if self.enabled:
+                blobs = {}
+                for file_path in (files(value) if files else []):
+                    if file_path and os.path.exists(file_path):
+                        with open(file_path, 'rb') as f:
+                            blobs[file_path] = f.read()
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump({'value': value, 'files': blobs}, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+                self.evict()
+            logging.info(f"Stage cache miss: {stage} ({key[:12]}), recomputed")
+            return value
+
+    def evict(self):
+        entries = sorted((os.path.getmtime(p), os.path.getsize(p), p) for p in glob.glob(os.path.join(self.cache_dir, '*.pkl')))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(p)
+            total -= size
+            logging.info(f"Evicted stage cache entry {os.path.basename(p)}")
+
+
+class PromptCache:
+    """
+    SQLite-backed cache of chat completion responses, keyed by a hash of
+    (model, system message, prompt, temperature, max_tokens). Entries older than ttl_days are
+    dropped, and the least recently used ones are evicted once responses exceed max_mb.
+    With bypass=True the cache is neither read nor written.
+    """
+    def __init__(self, path, ttl_days=30, max_mb=256, bypass=False):
+        self.path=path
+        self.ttl=ttl_days*86400
+        self.max_bytes=max_mb*2**20
+        self.bypass=bypass
+        self.hits=0
+        self.misses=0
+        self._lock=threading.Lock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        return conn
+
+    @staticmethod
+    def key(model, system_msg, prompt, temperature, max_tokens) -> str:
+        payload = json.dumps([model, system_msg, prompt, temperature, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, model, system_msg, prompt, temperature, max_tokens):
+        if self.bypass:
+            return None
+        key = self.key(model, system_msg, prompt, temperature, max_tokens)
+        now = time.time()
+        row = None
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                    if row is not None and now - row[1] > self.ttl:
+                        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        row = None
+                    elif row is not None:
+                        conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            warnings.warn(f"Prompt cache read failed: {e}")
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if row is None else row[0]
+
+    def put(self, model, system_msg, prompt, temperature, max_tokens, response: str):
+        if self.bypass:
+            return
+        key = self.key(model, system_msg, prompt, temperature, max_tokens)
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                        (key, response, len(response.encode('utf-8')), now, now)
+                    )
+                    conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                    self._evict(conn)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            warnings.warn(f"Prompt cache write failed: {e}")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> str:
+        suffix = " (bypassed)" if self.bypass else ""
+        return f"{self.hits} hits, {self.misses} misses{suffix}"
@@ -0,0 +1,198 @@
+"""
+Step 3's causal stage: the respondent design matrix, cross-fitted nuisance models, AIPW scores
+and their confidence intervals.
+"""
+import logging
+import os
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import norm
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+
+from brand_lift.learners import make_learner
+from brand_lift.profiling import RunProfiler
+from brand_lift.segments import match_options
+from brand_lift.survey import SurveyFrame
+
+
+class RespondentMatrix:
+    """
+    One row per Respondent_ID built from the long table: a sparse one-hot matrix X of
+    (Question_ID, Response_Code) answers for the covariate questions, plus any extra per-respondent
+    columns, the treatment vector W (Exposed=1), the outcome Y and a frame of extra binary
+    outcomes ({name: (question_ids, top-box options)} scores, one column each).
+    """
+    LONG_COLS = ['Respondent_ID','panel_group','Question_ID','Response_Code','ps','propensity_score']
+
+    def __init__(self, survey: SurveyFrame, covariate_questions, outcome_col='purchase_binary', panel_col='panel_group',
+                 outcomes=None):
+        df = survey.df
+        codes, self.respondent_ids = pd.factorize(df['Respondent_ID'])
+        n = len(self.respondent_ids)
+        _, first_row = np.unique(codes, return_index=True)
+
+        self.W = (df[panel_col].to_numpy()[first_row]=='Exposed').astype(int)
+        self.Y = pd.Series(df[outcome_col].to_numpy(dtype=float)).groupby(codes).max().to_numpy()
+
+        answers = survey.questions(covariate_questions)
+        feature_codes, answer_features = pd.factorize(answers['Question_ID'].astype(str) + '=' + answers['Response_Code'].astype(str))
+        onehot = sparse.csr_matrix(
+            (np.ones(len(answers)), (codes[answers.index.to_numpy()], feature_codes)),
+            shape=(n, len(answer_features)),
+        )
+        onehot.data[:] = 1.0  # a repeated answer still counts once
+        blocks = [onehot]
+        self.feature_names = list(answer_features)
+
+        # Any extra columns on the long table are respondent-level already; keep their first value.
+        extra = [c for c in df.columns if c not in self.LONG_COLS and c != outcome_col]
+        if extra:
+            extra_df = pd.get_dummies(df[extra].iloc[first_row].reset_index(drop=True), drop_first=True)
+            blocks.append(sparse.csr_matrix(extra_df.to_numpy(dtype=float, na_value=0.0)))
+            self.feature_names += list(extra_df.columns)
+
+        X = sparse.hstack(blocks, format='csr')
+        if X.shape[1]==0:
+            X = sparse.csr_matrix((n, 1))
+            self.feature_names = ['dummy_cov']
+        self.X = X
+        self.outcomes = self.top_box_outcomes(survey, outcomes or {}, codes)
+        self.ps = None
+
+    def __len__(self):
+        return len(self.respondent_ids)
+
+    def top_box_outcomes(self, survey: SurveyFrame, scores: dict, codes: np.ndarray) -> pd.DataFrame:
+        """
+        1 where a respondent answered any of a score's questions with exactly one of its top-box
+        options, else 0. The KPI answers are factorized once; each score is then a lookup on the
+        (question, response) codes. Scores no respondent hits are warned about.
+        """
+        Y = np.zeros((len(self), len(scores)))
+        answers = survey.questions(sorted({q for question_ids, _ in scores.values() for q in question_ids}))
+        if len(answers):
+            question_codes, questions = pd.factorize(answers['Question_ID'])
+            response_codes, responses = pd.factorize(answers['Response_Code'], use_na_sentinel=False)
+            rows = codes[answers.index.to_numpy()]
+            for j, (question_ids, options) in enumerate(scores.values()):
+                hit = questions.isin(question_ids)[question_codes] & match_options(responses, options)[response_codes]
+                Y[rows[hit], j] = 1.0
+        for name in np.array(list(scores), dtype=object)[Y.sum(axis=0) == 0]:
+            warnings.warn(f"No respondent gave a top-box answer for '{name}'; its causal outcome is all zeros.")
+        return pd.DataFrame(Y, columns=list(scores))
+
+
+def _timed_fit(name, model, X, y):
+    start = time.perf_counter()
+    model.fit(X, y)
+    return name, model, time.perf_counter() - start
+
+
+def fit_nuisance_models(jobs: dict, n_jobs=-1):
+    """Fit independent {name: (model, X, y)} jobs concurrently. Returns (fitted models, fit seconds)."""
+    workers = (os.cpu_count() or 1) if n_jobs in (None, -1) else max(1, n_jobs)
+    fitted, fit_times = {}, {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(_timed_fit, name, model, X, y) for name, (model, X, y) in jobs.items()]
+        for future in futures:
+            name, model, seconds = future.result()
+            fitted[name] = model
+            fit_times[name] = seconds
+            logging.info(f"Fitted {name} in {seconds:.2f}s")
+    return fitted, fit_times
+
+
+def cross_fit_nuisance(X, w: np.ndarray, y: np.ndarray, folds=5, n_jobs=-1, outcome_names=None,
+                       learner="random_forest", learner_options=None, profiler=None):
+    """
+    Out-of-fold propensity (ps) and T-learner outcome predictions (mu0, mu1) for AIPW.
+    y may be a (n x k) matrix of outcomes: the propensity model is fitted once per fold and shared,
+    mu0/mu1 come back as (n x k). Every model is independent, so all of them go to the pool in one batch,
+    timed as a "cross_fit" stage of the profiler. Outcome models are make_learner(learner, **learner_options).
+    """
+    with (profiler or RunProfiler()).stage('cross_fit'):
+        y = np.asarray(y, dtype=float)
+        Y = y.reshape(len(w), -1)
+        if outcome_names is None:
+            outcome_names = [""] if y.ndim == 1 else [f"y{j}" for j in range(Y.shape[1])]
+        tags = [f"{name}_" if name else "" for name in outcome_names]
+        n = len(w)
+        k = min(folds, int(np.bincount(w, minlength=2).min()))
+        if k < 2:
+            splits = [(np.arange(n), np.arange(n))]
+        else:
+            splits = list(StratifiedKFold(n_splits=k, shuffle=True, random_state=123).split(np.zeros(n), w))
+
+        jobs = {}
+        for i, (train, _) in enumerate(splits):
+            treated, control = train[w[train]==1], train[w[train]==0]
+            jobs[f"ps_fold{i}"] = (LogisticRegression(solver='lbfgs', max_iter=1000), X[train], w[train])
+            X_treated, X_control = X[treated], X[control]
+            for j, tag in enumerate(tags):
+                jobs[f"mu1_{tag}fold{i}"] = (make_learner(learner, **(learner_options or {})), X_treated, Y[treated, j])
+                jobs[f"mu0_{tag}fold{i}"] = (make_learner(learner, **(learner_options or {})), X_control, Y[control, j])
+        fitted, fit_times = fit_nuisance_models(jobs, n_jobs=n_jobs)
+
+        ps, mu0, mu1 = np.empty(n), np.empty(Y.shape), np.empty(Y.shape)
+        for i, (_, test) in enumerate(splits):
+            X_test = X[test]
+            ps[test] = fitted[f"ps_fold{i}"].predict_proba(X_test)[:,1]
+            for j, tag in enumerate(tags):
+                mu1[test, j] = fitted[f"mu1_{tag}fold{i}"].predict(X_test)
+                mu0[test, j] = fitted[f"mu0_{tag}fold{i}"].predict(X_test)
+        return ps, mu0.reshape(y.shape), mu1.reshape(y.shape), fit_times
+
+
+def bootstrap_mean(terms, B=500, seed=123, max_cells=20_000_000):
+    """
+    Bootstrap distribution of mean(terms): B resamples drawn chunk-wise as index matrices.
+    A (n x k) terms matrix is resampled jointly by row and gives a (B x k) result.
+    """
+    terms = np.asarray(terms, dtype=float)
+    n = len(terms)
+    width = int(np.prod(terms.shape[1:], dtype=int))
+    rng = np.random.default_rng(seed)
+    out = np.empty((B, *terms.shape[1:]))
+    chunk = max(1, min(B, max_cells // max(n * width, 1)))
+    for start in range(0, B, chunk):
+        stop = min(B, start + chunk)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        out[start:stop] = terms[idx].mean(axis=1)
+    return out
+
+
+def aipw_interval(terms, method="bootstrap", level=0.95, B=500, seed=123, max_cells=20_000_000, profiler=None):
+    """
+    AIPW estimate, CI bounds and bootstrap draws (None for "influence") from per-unit AIPW terms.
+    A (n x k) terms matrix gives one of each per column. B, seed and max_cells go to bootstrap_mean,
+    which is timed as a "bootstrap" stage of the profiler.
+    """
+    terms = np.asarray(terms, dtype=float)
+    estimate = terms.mean(axis=0)
+    tail = (1 - level) / 2
+    if method == "influence":
+        # The terms are the estimator's influence function plus the ATE, so Var(ATE) ~ Var(terms) / n.
+        se = terms.std(axis=0, ddof=1) / np.sqrt(len(terms))
+        z = norm.ppf(1 - tail)
+        return estimate, estimate - z*se, estimate + z*se, None
+    if method == "bootstrap":
+        # mu0/mu1/ps are held fixed across resamples, so each bootstrap AIPW estimate is just the
+        # mean of the resampled per-unit terms; all columns share the same resamples.
+        with (profiler or RunProfiler()).stage('bootstrap'):
+            draws = bootstrap_mean(terms, B=B, seed=seed, max_cells=max_cells)
+        lower, upper = np.percentile(draws, [100*tail, 100*(1 - tail)], axis=0)
+        return estimate, lower, upper, draws
+    raise ValueError(f"Unknown AIPW_VARIANCE {method!r}; use 'bootstrap' or 'influence'")
+
+
+def aipw_terms(Y, W, ps, mu0, mu1) -> np.ndarray:
+    """Per-respondent AIPW scores; Y/mu0/mu1 may be (n x k) for k outcomes sharing W and ps."""
+    if np.ndim(Y) == 2:
+        W, ps = W[:, None], ps[:, None]
+    return W*(Y - mu1)/ps - (1-W)*(Y - mu0)/(1-ps) + (mu1 - mu0)
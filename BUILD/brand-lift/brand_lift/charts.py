@@ -0,0 +1,261 @@
+"""
+Report chart jobs and the functions that draw them. A chart job is a draw function plus the
+precomputed data it plots; draw functions use nothing else, so jobs can be rendered in worker
+processes that import this module rather than inherit the notebook's state.
+"""
+import logging
+import multiprocessing
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from brand_lift.profiling import RunProfiler
+from brand_lift.style import ACCENT_COLOR, SECONDARY_COLOR, apply_style
+
+
+def chart_job(draw, path: str, **data) -> dict:
+    """A figure to render: `draw(path, **data)` must only use `data`, so it can run in any process."""
+    return {'draw': draw, 'path': path, 'data': data}
+
+
+def init_worker():
+    """Process pool initializer: render off-screen with the report styling."""
+    plt.switch_backend('Agg')
+    apply_style()
+
+
+def render_job(job: dict):
+    """Draw one job; returns (path, error message or None, seconds)."""
+    start = time.perf_counter()
+    try:
+        job['draw'](job['path'], **job['data'])
+        return job['path'], None, time.perf_counter() - start
+    except Exception as e:
+        return job['path'], f"{type(e).__name__}: {e}", time.perf_counter() - start
+    finally:
+        plt.close('all')
+
+
+def render_charts(jobs, n_workers=-1, timings=None, profiler=None) -> list:
+    """
+    Render chart jobs under Agg on a process pool of n_workers (-1 = all cores, 1 = in-process);
+    return the paths that were written. Charts that fail are warned about and left out.
+    If given, `timings` is filled with each chart's render time in seconds, keyed by path.
+    Timed as the 'render_charts' stage of the profiler.
+    """
+    with (profiler or RunProfiler()).stage('render_charts'):
+        jobs = list({job['path']: job for job in jobs}.values())  # a later job for the same file wins
+        if not jobs:
+            return []
+        n_workers = (os.cpu_count() or 1) if n_workers == -1 else n_workers
+        n_workers = max(1, min(n_workers, len(jobs)))
+        start = time.perf_counter()
+        if n_workers > 1:
+            # Not fork: by now the parent may be running threads (BLAS, uploads) whose locks a forked
+            # child would inherit mid-use. Workers start clean and import the draw functions instead.
+            start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context(start_method),
+                                     initializer=init_worker) as pool:
+                outcomes = list(pool.map(render_job, jobs))
+        else:
+            outcomes = [render_job(job) for job in jobs]
+        written = []
+        for path, error, seconds in outcomes:
+            if timings is not None:
+                timings[path] = seconds
+            if error:
+                warnings.warn(f"Chart {os.path.basename(path)} could not be drawn: {error}")
+            else:
+                written.append(path)
+        logging.info(f"Rendered {len(written)} of {len(jobs)} charts on {n_workers} process(es) "
+                     f"in {time.perf_counter() - start:.1f}s.")
+        return written
+
+
+def run_artifacts(artifacts, n_workers=-1, profiler=None) -> dict:
+    """
+    Produce each declared (name, artifact) once, as the 'report_artifacts' stage of the profiler:
+    chart jobs are rendered together by render_charts, the other artifacts are zero-argument
+    callables run in order. Returns {name: output}; a chart's output is its path, or None if it
+    could not be drawn. Every artifact is a profiler sub-stage: callables are profiled directly,
+    charts are recorded with the render time measured in their worker. Declaring a name or
+    chart file twice raises ValueError.
+    """
+    profiler = profiler or RunProfiler()
+    names = [name for name, _ in artifacts]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Report artifacts declared more than once: {', '.join(duplicates)}")
+    charts = {name: artifact for name, artifact in artifacts if isinstance(artifact, dict)}
+    chart_paths = [job['path'] for job in charts.values()]
+    if len(set(chart_paths)) != len(chart_paths):
+        raise ValueError("Two chart artifacts write the same file.")
+
+    with profiler.stage('report_artifacts'):
+        outputs, chart_timings = {}, {}
+        written = set(render_charts(charts.values(), n_workers=n_workers, timings=chart_timings, profiler=profiler))
+        for name, job in charts.items():
+            outputs[name] = job['path'] if job['path'] in written else None
+            profiler.record(name, chart_timings.get(job['path'], 0.0))
+            logging.info(f"Artifact {name}: {chart_timings.get(job['path'], 0.0):.2f}s")
+        for name, build in artifacts:
+            if name not in charts:
+                start = time.perf_counter()
+                with profiler.stage(name):
+                    outputs[name] = build()
+                logging.info(f"Artifact {name}: {time.perf_counter() - start:.2f}s")
+        return outputs
+
+
+def draw_panel_distribution(path, panel_counts):
+    plt.figure()
+    panel_counts.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
+    plt.title('Panel Group Distribution')
+    plt.xlabel('Group')
+    plt.ylabel('Count')
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_kpi_distribution(path, counts, question_id, panel_col, order, hue_order):
+    plt.figure(figsize=(10,6))
+    sns.barplot(x='Response_Code', y='count', hue=panel_col, data=counts, order=order, palette=[SECONDARY_COLOR, ACCENT_COLOR], hue_order=hue_order)
+    plt.title(f"{question_id} by {panel_col}")
+    plt.xticks(rotation=45,ha='right')
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_aipw_distribution(path, aipw_bs):
+    plt.figure()
+    plt.hist(aipw_bs, color='blue', bins=20)
+    plt.title('AIPW Bootstrap Distribution')
+    plt.xlabel('ATE (AIPW)')
+    plt.ylabel('Frequency')
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_ate_methods(path, ate_methods):
+    plt.figure()
+    plt.bar(ate_methods.keys(), [v*100 for v in ate_methods.values()], color='steelblue')
+    plt.title("ATE Estimates by Method")
+    plt.ylabel("ATE (percentage points)")
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_ps_distribution(path, ps_exposed, ps_control):
+    plt.figure()
+    plt.hist(ps_exposed, bins=20, color=ACCENT_COLOR, alpha=0.5, density=True, label='Exposed')
+    plt.hist(ps_control, bins=20, color=SECONDARY_COLOR, alpha=0.5, density=True, label='Control')
+    plt.title('Propensity Score Distribution by Group')
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_main_kpi(path, q2_counts):
+    q2_counts.plot(kind='bar', stacked=True, colormap='viridis')
+    plt.title('Purchase Intent (Q2) Breakdown')
+    plt.ylabel('Percentage')
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_summary_table(path, summary_df):
+    fig, ax = plt.subplots(figsize=(15, len(summary_df)*0.6+1))
+    ax.axis('off')
+    table = ax.table(cellText=summary_df.values, colLabels=summary_df.columns, loc='center')
+    table.auto_set_font_size(False)
+    table.set_fontsize(8)
+    table.auto_set_column_width(col=list(range(len(summary_df.columns))))
+    plt.tight_layout()
+    plt.savefig(path, dpi=300)
+
+
+def draw_ate_ci(path, methods, estimates, cis_lower, cis_upper):
+    plt.figure(figsize=(8,6))
+    x_positions = np.arange(len(methods))
+    plt.bar(x_positions, estimates, yerr=[cis_lower, cis_upper], capsize=5, color='skyblue', edgecolor='black')
+    plt.xticks(x_positions, methods)
+    plt.ylabel("ATE (%)")
+    plt.title("ATE Estimates with 95% Confidence Intervals")
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300)
+
+
+def draw_funnel_comparison(path, funnel_data):
+    funnel_data.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
+    plt.title('Comparison of Selected KPIs by Funnel Stage (Control vs Exposed)')
+    plt.xlabel('KPI')
+    plt.ylabel('Top-Box Percentage')
+    plt.xticks(rotation=0)
+    plt.legend(title='Panel Group')
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_top_box_by_segment(path, top_box, kpi_name, segment, xlabel):
+    top_box.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
+    plt.title(f'{kpi_name} by {segment} (Control vs Exposed)')
+    plt.xlabel(xlabel)
+    plt.ylabel('Top-Box Percentage')
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.savefig(path)
+
+
+def draw_sankey_funnel(path, flows):
+    from matplotlib.sankey import Sankey
+    control_aware, control_consider, control_purchase, exposed_aware, exposed_consider, exposed_purchase = flows
+    plt.figure(figsize=(10,8))
+    sankey = Sankey(unit=None, gap=0.5, scale=1.0)
+    sankey.add(flows=[100, -control_aware],
+               labels=['Control Start','Aware'],
+               orientations=[0,0],
+               trunklength=1.0)
+    sankey.add(flows=[control_aware, -control_consider],
+               labels=[None,'Consider'],
+               orientations=[0,0],
+               prior=0, connect=(1,0))
+    sankey.add(flows=[control_consider, -control_purchase],
+               labels=[None,'Purchase'],
+               orientations=[0,0],
+               prior=1, connect=(1,0))
+
+    # The original script also passed dx=2 here. Sankey.add hands unknown keywords to PathPatch,
+    # which has no dx property, so it raised AttributeError and the diagram was never drawn.
+    sankey.add(flows=[100, -exposed_aware],
+               labels=['Exposed Start','Aware'],
+               orientations=[0,0],
+               trunklength=1.0)
+    sankey.add(flows=[exposed_aware, -exposed_consider],
+               labels=[None,'Consider'],
+               orientations=[0,0],
+               prior=3, connect=(1,0))
+    sankey.add(flows=[exposed_consider, -exposed_purchase],
+               labels=[None,'Purchase'],
+               orientations=[0,0],
+               prior=4, connect=(1,0))
+
+    sankey.finish()
+    plt.title('Vertical Sankey Funnel Diagram (Control vs Exposed)')
+    plt.savefig(path)
+
+
+def draw_funnel_line(path, funnel_data):
+    funnel_data[['Control','Exposed']].plot(marker='o')
+    plt.title('Comparison of KPI Metrics Across the Funnel Stages')
+    plt.xlabel('Funnel Stage')
+    plt.ylabel('Top-Box Percentage')
+    plt.xticks(rotation=0)
+    plt.grid(True)
+    plt.tight_layout()
+    plt.savefig(path)
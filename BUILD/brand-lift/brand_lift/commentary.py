@@ -0,0 +1,122 @@
+"""Step 3's report commentary: chat prompts sent concurrently with bounded retries and a fallback text."""
+import asyncio
+import logging
+import random
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from brand_lift.profiling import RunProfiler
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+COMMENTARY_FALLBACK = (
+    "Unable to generate commentary due to repeated technical issues. "
+    "Please review the results and interpret key metrics manually."
+)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def is_rate_limit(error: Exception) -> bool:
+    """An openai RateLimitError, or any client error carrying HTTP status 429."""
+    if OPENAI_AVAILABLE and isinstance(error, openai.error.RateLimitError):
+        return True
+    return getattr(error, 'http_status', None) == 429
+
+
+def run_async(coro):
+    """Run a coroutine to completion, also from inside a notebook's already-running event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+class CommentaryGenerator:
+    """
+    Sends chat prompts concurrently, at most `concurrency` requests in flight. Each request times
+    out after `timeout` seconds; failures (429s included) are retried with exponential backoff and
+    full jitter between attempts, and a prompt that fails `max_retries` times gets COMMENTARY_FALLBACK.
+    Responses are read from and written to `cache` (a PromptCache) when one is given, and every
+    request is counted as an 'openai' call on the profiler.
+    `create` is the async chat completion call, openai.ChatCompletion.acreate by default.
+    """
+    def __init__(self, model="gpt-4o", system_msg="", max_tokens=2000, temperature=0.7, concurrency=8, timeout=60,
+                 max_retries=5, backoff_base=1.0, backoff_max=30.0, cache=None, create=None, profiler=None):
+        self.model=model
+        self.system_msg=system_msg
+        self.max_tokens=max_tokens
+        self.temperature=temperature
+        self.concurrency=max(1, concurrency)
+        self.timeout=timeout
+        self.max_retries=max_retries
+        self.backoff_base=backoff_base
+        self.backoff_max=backoff_max
+        self.cache=cache
+        self.create=create
+        self.profiler=profiler or RunProfiler()
+        if create is None and not OPENAI_AVAILABLE:
+            raise ImportError("openai is not installed; pass `create` to CommentaryGenerator.")
+
+    async def complete(self, prompt: str, semaphore: asyncio.Semaphore) -> str:
+        cache_key = (self.model, self.system_msg, prompt, self.temperature, self.max_tokens)
+        cached = self.cache.get(*cache_key) if self.cache is not None else None
+        if cached is not None:
+            return cached
+        for attempt in range(self.max_retries):
+            try:
+                # Only the request itself holds a slot; backoff sleeps happen outside the semaphore.
+                async with semaphore:
+                    self.profiler.count('openai')
+                    create = self.create or openai.ChatCompletion.acreate
+                    response = await asyncio.wait_for(
+                        create(
+                            model=self.model,
+                            messages=[
+                                {"role": "system", "content": self.system_msg},
+                                {"role": "user", "content": prompt}
+                            ],
+                            max_tokens=self.max_tokens,
+                            temperature=self.temperature,
+                            request_timeout=self.timeout
+                        ),
+                        self.timeout
+                    )
+                text = response.choices[0].message.content.strip()
+                if self.cache is not None:
+                    self.cache.put(*cache_key, text)
+                return text
+            except asyncio.TimeoutError:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                warnings.warn(f"OpenAI API call attempt {attempt+1} timed out after {self.timeout}s.")
+            except Exception as e:
+                delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                if is_rate_limit(e):
+                    warnings.warn(f"OpenAI rate limit on attempt {attempt+1}, retrying in {delay:.1f}s: {e}")
+                else:
+                    warnings.warn(f"OpenAI API call attempt {attempt+1} failed: {e}")
+            if attempt < self.max_retries - 1:
+                await asyncio.sleep(delay)
+        return COMMENTARY_FALLBACK
+
+    async def _generate(self, prompts: dict) -> dict:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        texts = await asyncio.gather(*(self.complete(prompt, semaphore) for prompt in prompts.values()))
+        logging.info(f"Generated {len(prompts)} commentaries in {time.perf_counter() - start:.1f}s "
+                     f"(concurrency={self.concurrency}).")
+        return dict(zip(prompts, texts))
+
+    def generate(self, prompts: dict) -> dict:
+        """{name: prompt} -> {name: commentary text}, in the same order."""
+        return run_async(self._generate(prompts))
@@ -0,0 +1,70 @@
+"""Outcome and X-learner effect models for the step 3 causal stage, picked by name from CAUSAL_LEARNERS."""
+import numpy as np
+from scipy import sparse
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+
+class ProbabilityRegressor(RegressorMixin, BaseEstimator):
+    """LogisticRegression behind a regressor interface: predict() returns P(y=1). A single-class y predicts that class."""
+    def __init__(self, C=1.0, max_iter=1000):
+        self.C = C
+        self.max_iter = max_iter
+
+    def fit(self, X, y):
+        y = np.asarray(y, dtype=float)
+        self.constant_ = float(y[0]) if len(y) and (y == y[0]).all() else None
+        if self.constant_ is None:
+            self.model_ = LogisticRegression(C=self.C, max_iter=self.max_iter).fit(X, y)
+        return self
+
+    def predict(self, X):
+        if self.constant_ is not None:
+            return np.full(X.shape[0], self.constant_)
+        return self.model_.predict_proba(X)[:, 1]
+
+
+class ClippedRegressor(RegressorMixin, BaseEstimator):
+    """A regressor fitted to a binary outcome whose predictions are clipped to [lower, upper]."""
+    def __init__(self, estimator, lower=0.0, upper=1.0):
+        self.estimator = estimator
+        self.lower = lower
+        self.upper = upper
+
+    def fit(self, X, y):
+        self.estimator_ = clone(self.estimator).fit(X, y)
+        return self
+
+    def predict(self, X):
+        return np.clip(self.estimator_.predict(X), self.lower, self.upper)
+
+
+def _dense(X):
+    return X.toarray() if sparse.issparse(X) else X
+
+
+# name -> factory(target, **options) for outcome models (target='outcome') and X-learner effect models
+# (target='effect'). Factories ignore options they don't use; small_forest reads trees and max_samples.
+CAUSAL_LEARNERS = {
+    'random_forest': lambda target, **options: RandomForestRegressor(n_estimators=100, random_state=123, n_jobs=1),
+    'small_forest': lambda target, trees=30, max_samples=0.3, **options: RandomForestRegressor(
+        n_estimators=trees, max_samples=max_samples, min_samples_leaf=5, random_state=123, n_jobs=1),
+    'hist_gradient_boosting': lambda target, **options: make_pipeline(FunctionTransformer(_dense, accept_sparse=True),
+                                                                      HistGradientBoostingRegressor(max_iter=100, random_state=123)),
+    'ridge': lambda target, **options: Ridge(alpha=1.0),
+    'logistic': lambda target, **options: ProbabilityRegressor() if target == 'outcome' else Ridge(alpha=1.0),
+}
+
+
+def make_learner(name="random_forest", target='outcome', **options):
+    """
+    An unfitted learner from CAUSAL_LEARNERS. Outcome models estimate P(outcome=1), so their
+    predictions are clipped to [0, 1]: ridge and boosting can overshoot on a binary target.
+    """
+    if name not in CAUSAL_LEARNERS:
+        raise ValueError(f"Unknown causal learner {name!r}; choose one of {sorted(CAUSAL_LEARNERS)}")
+    model = CAUSAL_LEARNERS[name](target, **options)
+    return ClippedRegressor(model) if target == 'outcome' else model
@@ -0,0 +1,126 @@
+"""Per-stage run profiling shared by the step 1-3 scripts."""
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB, or NaN where the platform cannot report it."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in KiB on Linux and the BSDs.
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        # Windows tracks the peak working set; elsewhere the current RSS is the best available.
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    return float('nan')
+
+
+def child_cpu_s() -> float:
+    """User + system CPU seconds of terminated, waited-for child processes (0 on Windows)."""
+    times = os.times()
+    return times.children_user + times.children_system
+
+
+class RunProfiler:
+    """
+    Records wall time, CPU time, peak RSS and external call counts per pipeline stage.
+    Stages are opened with `with profiler.stage(name):` or the @profiler.profiled(name) decorator
+    and may nest ("causal/cross_fit"). External calls are tallied with profiler.count(service).
+    With profile_dir set, each top-level stage is also run under cProfile and dumped there.
+    """
+    peak_rss_mb = staticmethod(peak_rss_mb)
+    child_cpu_s = staticmethod(child_cpu_s)
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir=profile_dir
+        self.started=time.time()
+        self.stages=[]
+        self.calls={}
+        self._stack=[]
+        self._lock=threading.Lock()
+
+    def count(self, service: str, n: int = 1):
+        with self._lock:
+            self.calls[service] = self.calls.get(service, 0) + n
+
+    @contextmanager
+    def stage(self, name: str):
+        path = "/".join(self._stack + [name])
+        top_level = not self._stack
+        self._stack.append(name)
+        with self._lock:
+            calls_before = dict(self.calls)
+        rss_before = self.peak_rss_mb()
+        wall, cpu, child_cpu = time.perf_counter(), time.process_time(), self.child_cpu_s()
+        record = {'stage': path}
+        self.stages.append(record)  # appended on entry so the report lists stages in start order
+        prof = cProfile.Profile() if (self.profile_dir and top_level) else None
+        if prof:
+            prof.enable()
+        try:
+            yield
+        finally:
+            if prof:
+                prof.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                prof.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            self._stack.pop()
+            peak = self.peak_rss_mb()
+            with self._lock:
+                calls = {k: v - calls_before.get(k, 0) for k, v in self.calls.items() if v != calls_before.get(k, 0)}
+            record.update({
+                'wall_s': round(time.perf_counter() - wall, 4),
+                'cpu_s': round(time.process_time() - cpu, 4),
+                'child_cpu_s': round(self.child_cpu_s() - child_cpu, 4),
+                'peak_rss_mb': round(peak, 1),
+                'rss_growth_mb': round(peak - rss_before, 1),
+                'calls': calls,
+            })
+
+    def record(self, name: str, wall_s: float):
+        """
+        Add a sub-stage of the current stage that was timed elsewhere, e.g. a chart rendered in a
+        worker process. Only its wall time is known, so CPU, memory and call fields are left out.
+        """
+        with self._lock:
+            self.stages.append({'stage': "/".join(self._stack + [name]), 'wall_s': round(wall_s, 4)})
+
+    def profiled(self, name: str = None):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self) -> dict:
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_wall_s': round(time.time() - self.started, 4),
+            'peak_rss_mb': round(self.peak_rss_mb(), 1),
+            'calls': dict(self.calls),
+            'stages': self.stages,
+        }
+
+    def write_report(self, path: str, **extra) -> str:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({**self.report(), **extra}, f, indent=2, default=str)
+        return path
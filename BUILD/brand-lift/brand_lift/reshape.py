@@ -0,0 +1,369 @@
+"""
+Step 2's wide-to-long reshape of a Cint export. Every mode writes the same long table:
+"rowwise" is the original csv.DictReader loop, kept as the reference implementation;
+"vectorized" resolves the option columns once and reshapes in bulk with NumPy/pandas;
+"streaming" reshapes fixed-size chunks and can resume an interrupted run from a checkpoint;
+"parallel" reshapes line-aligned byte-range shards on a process pool.
+"""
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from brand_lift.profiling import RunProfiler
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+LONG_FIELDNAMES = ["Respondent_ID", "Panel_Group", "Question_ID", "Response_Code"]
+COLUMNAR_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+
+def get_question_id(q_text):
+    match = re.match(r"(Q\d+)_", q_text)
+    if match:
+        return match.group(1)
+    else:
+        return q_text.split('_')[0] if '_' in q_text else q_text
+
+
+def load_mappings(kpi_config_path, code_mapping_path):
+    # Load kpi_config and code_mappings
+    with open(kpi_config_path, 'r', encoding='utf-8') as f:
+        kpi_config = json.load(f)
+
+    with open(code_mapping_path, 'r', encoding='utf-8') as f:
+        full_code_map = json.load(f)
+        code_mapping = full_code_map["code_mappings"]
+
+    return kpi_config, code_mapping
+
+
+def build_question_to_subcols(code_mapping):
+    question_to_subcols = {}
+    for q_text, subs in code_mapping.items():
+        q_id = get_question_id(q_text)
+        question_to_subcols[q_text] = {
+            "question_id": q_id,
+            "options": subs
+        }
+    return question_to_subcols
+
+
+def check_required_columns(fieldnames):
+    # Ensure "Respondent ID" is exactly one of the fieldnames
+    if "Respondent ID" not in fieldnames:
+        raise ValueError("No 'Respondent ID' column found. Check CSV headers or adjust code.")
+    if "Panel_Group" not in fieldnames:
+        raise ValueError("No 'Panel_Group' column found. Check CSV headers or adjust code.")
+
+
+def reshape_rowwise(input_path, output_path, kpi_config, question_to_subcols):
+    with open(input_path, 'r', newline='', encoding='utf-8-sig') as infile, \
+         open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+
+        dict_reader = csv.DictReader(infile, delimiter=',')
+        print("Fieldnames found:", dict_reader.fieldnames)
+        check_required_columns(dict_reader.fieldnames)
+
+        writer = csv.DictWriter(outfile, fieldnames=LONG_FIELDNAMES)
+        writer.writeheader()
+
+        for row in dict_reader:
+            respondent_id = row["Respondent ID"]
+            panel_group = row["Panel_Group"]
+
+            for kpi_category, question_list in kpi_config["kpi_mappings"].items():
+                for q_text in question_list:
+                    if q_text not in question_to_subcols:
+                        continue
+
+                    q_id = question_to_subcols[q_text]["question_id"]
+                    options = question_to_subcols[q_text]["options"]
+
+                    for col_name, label in options.items():
+                        if col_name in row and row[col_name].strip() == '1':
+                            writer.writerow({
+                                "Respondent_ID": respondent_id,
+                                "Panel_Group": panel_group,
+                                "Question_ID": q_id,
+                                "Response_Code": label
+                            })
+
+
+def resolve_option_slots(fieldnames, kpi_config, question_to_subcols):
+    """
+    Flatten kpi_mappings -> questions -> options into the exact order the row-wise loop
+    visits them, keeping only option columns present in the export. Returns the distinct
+    option columns plus, per slot, the index of its column and its (Question_ID, Response_Code).
+    """
+    present = set(fieldnames)
+    columns, column_index = [], {}
+    slot_cols, slot_qids, slot_labels = [], [], []
+    for kpi_category, question_list in kpi_config["kpi_mappings"].items():
+        for q_text in question_list:
+            if q_text not in question_to_subcols:
+                continue
+            q_id = question_to_subcols[q_text]["question_id"]
+            for col_name, label in question_to_subcols[q_text]["options"].items():
+                if col_name not in present:
+                    continue
+                if col_name not in column_index:
+                    column_index[col_name] = len(columns)
+                    columns.append(col_name)
+                slot_cols.append(column_index[col_name])
+                slot_qids.append(q_id)
+                slot_labels.append(label)
+    return (columns,
+            np.asarray(slot_cols, dtype=np.intp),
+            np.asarray(slot_qids, dtype=object),
+            np.asarray(slot_labels, dtype=object))
+
+
+def reshape_frame(wide_df, slots):
+    """Melt one wide DataFrame of string cells into long-format (id, panel, question, response) columns."""
+    columns, slot_cols, slot_qids, slot_labels = slots
+    if len(wide_df) == 0 or len(slot_cols) == 0:
+        return [], [], [], []
+    ticked = np.empty((len(wide_df), len(columns)), dtype=bool)
+    for j, col_name in enumerate(columns):
+        values = wide_df[col_name].to_numpy(dtype=object)
+        hit = values == '1'
+        # Only cells that are neither blank nor an exact '1' need the (slow) per-cell strip.
+        padded = ~hit & (values != '')
+        if padded.any():
+            hit[padded] = [isinstance(v, str) and v.strip() == '1' for v in values[padded]]
+        ticked[:, j] = hit
+    # np.nonzero walks row-major, i.e. respondent by respondent and slot by slot within a
+    # respondent, which is the same emission order as the row-wise loop.
+    rows, hit_slots = np.nonzero(ticked[:, slot_cols])
+    respondent_ids = wide_df["Respondent ID"].to_numpy(dtype=object)[rows]
+    panel_groups = wide_df["Panel_Group"].to_numpy(dtype=object)[rows]
+    return respondent_ids, panel_groups, slot_qids[hit_slots], slot_labels[hit_slots]
+
+
+def read_wide_csv(input_path, **kwargs):
+    # Keep every cell as the raw string the csv module would see, so output stays byte-identical.
+    return pd.read_csv(input_path, dtype=object, keep_default_na=False, na_filter=False,
+                       encoding='utf-8-sig', **kwargs)
+
+
+def read_fieldnames(input_path):
+    with open(input_path, 'r', newline='', encoding='utf-8-sig') as infile:
+        return next(csv.reader(infile), [])
+
+
+def long_output_path(output_csv, output_format):
+    if output_format == "csv":
+        return output_csv
+    return os.path.splitext(output_csv)[0] + COLUMNAR_EXTENSIONS[output_format]
+
+
+def long_cols_to_table(long_cols):
+    respondent_ids, panel_groups, question_ids, response_codes = (
+        pa.array(np.asarray(col, dtype=object), type=pa.string()) for col in long_cols
+    )
+    # Panel, question and response repeat heavily, so store each as a small dictionary plus int codes.
+    return pa.table({
+        "Respondent_ID": respondent_ids,
+        "Panel_Group": panel_groups.dictionary_encode(),
+        "Question_ID": question_ids.dictionary_encode(),
+        "Response_Code": response_codes.dictionary_encode(),
+    })
+
+
+def write_long_columnar(long_cols, output_path, output_format):
+    if not ARROW_AVAILABLE:
+        raise ValueError("pyarrow is required for columnar output. Install it or set OUTPUT_FORMAT = 'csv'.")
+    table = long_cols_to_table(long_cols)
+    if output_format == "parquet":
+        pq.write_table(table, output_path)
+    else:
+        # Uncompressed IPC so step 3 can memory-map the buffers without a decode pass.
+        with pa_ipc.new_file(output_path, table.schema) as writer:
+            writer.write_table(table)
+
+
+def reshape_vectorized(input_path, output_path, kpi_config, question_to_subcols, output_format="csv", profiler=None):
+    profiler = profiler or RunProfiler()
+    fieldnames = read_fieldnames(input_path)
+    print("Fieldnames found:", fieldnames)
+    check_required_columns(fieldnames)
+
+    slots = resolve_option_slots(fieldnames, kpi_config, question_to_subcols)
+    with profiler.stage("read"):
+        # Only parse the id, panel and option columns; exports carry many columns we never read.
+        wide_df = read_wide_csv(input_path, usecols=["Respondent ID", "Panel_Group"] + slots[0])
+    with profiler.stage("reshape_frame"):
+        long_cols = reshape_frame(wide_df, slots)
+
+    with profiler.stage("write"):
+        if output_format != "csv":
+            write_long_columnar(long_cols, output_path, output_format)
+            return
+
+        with open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(LONG_FIELDNAMES)
+            writer.writerows(zip(*long_cols))
+
+
+def iter_long_chunks(input_path, slots, chunk_size, start_chunk=0):
+    """Yield (chunk_index, wide_rows, long_cols) for each chunk_size-row block of the export."""
+    skip = start_chunk * chunk_size
+    reader = read_wide_csv(
+        input_path,
+        usecols=["Respondent ID", "Panel_Group"] + slots[0],
+        chunksize=chunk_size,
+        # A callable keeps resume memory-flat; a range would be materialised as a set.
+        skiprows=(lambda i: 0 < i <= skip) if skip else None,
+    )
+    with reader:
+        for chunk_index, wide_chunk in enumerate(reader, start=start_chunk):
+            yield chunk_index, len(wide_chunk), reshape_frame(wide_chunk, slots)
+
+
+def input_signature(input_path, chunk_size):
+    stat = os.stat(input_path)
+    return {"input": os.path.abspath(input_path), "size": stat.st_size,
+            "mtime": stat.st_mtime, "chunk_size": chunk_size}
+
+
+def load_checkpoint(checkpoint_path, output_path, signature):
+    """Return the saved progress if it belongs to this input and the output is still intact."""
+    if not os.path.exists(checkpoint_path) or not os.path.exists(output_path):
+        return None
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get("signature") != signature or os.path.getsize(output_path) < state["bytes_written"]:
+        return None
+    return state
+
+
+def save_checkpoint(checkpoint_path, state):
+    tmp_path = checkpoint_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def reshape_streaming(input_path, output_path, kpi_config, question_to_subcols, chunk_size=50_000, resume=True):
+    fieldnames = read_fieldnames(input_path)
+    print("Fieldnames found:", fieldnames)
+    check_required_columns(fieldnames)
+    slots = resolve_option_slots(fieldnames, kpi_config, question_to_subcols)
+
+    checkpoint_path = output_path + CHECKPOINT_SUFFIX
+    signature = input_signature(input_path, chunk_size)
+    state = load_checkpoint(checkpoint_path, output_path, signature) if resume else None
+    if state:
+        # Drop anything written after the last completed chunk, then carry on from there.
+        os.truncate(output_path, state["bytes_written"])
+        print(f"Resuming after chunk {state['chunks_done']} ({state['rows_done']} respondents).")
+    else:
+        state = {"signature": signature, "chunks_done": 0, "rows_done": 0, "long_rows": 0, "bytes_written": 0}
+
+    with open(output_path, 'a' if state["chunks_done"] else 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        if not state["chunks_done"]:
+            writer.writerow(LONG_FIELDNAMES)
+        for chunk_index, wide_rows, long_cols in iter_long_chunks(input_path, slots, chunk_size, state["chunks_done"]):
+            writer.writerows(zip(*long_cols))
+            outfile.flush()
+            os.fsync(outfile.fileno())
+            state.update(
+                chunks_done=chunk_index + 1,
+                rows_done=state["rows_done"] + wide_rows,
+                long_rows=state["long_rows"] + len(long_cols[0]),
+                bytes_written=os.path.getsize(output_path),
+            )
+            save_checkpoint(checkpoint_path, state)
+            print(f"Chunk {chunk_index + 1}: {state['rows_done']} respondents -> {state['long_rows']} long rows")
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def plan_shards(input_path, n_shards):
+    """
+    Split the data rows of the export into up to n_shards (start, end) byte ranges, each
+    starting right after a newline. Assumes no quoted cell contains a line break, which holds
+    for Cint exports; use the streaming mode for files where it doesn't.
+    """
+    size = os.path.getsize(input_path)
+    with open(input_path, 'rb') as f:
+        f.readline()
+        bounds = [f.tell()]
+        for i in range(1, n_shards):
+            target = bounds[0] + (size - bounds[0]) * i // n_shards
+            if target <= bounds[-1]:
+                continue
+            # Step back one byte so a target that already sits on a line start isn't skipped.
+            f.seek(target - 1)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def _reshape_shard(input_path, start, end, fieldnames, slots, shard_path):
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    wide_df = read_wide_csv(
+        io.BytesIO(data), header=None, names=fieldnames,
+        usecols=["Respondent ID", "Panel_Group"] + slots[0],
+    )
+    long_cols = reshape_frame(wide_df, slots)
+    with open(shard_path, 'w', newline='', encoding='utf-8') as outfile:
+        csv.writer(outfile).writerows(zip(*long_cols))
+    return len(wide_df), len(long_cols[0])
+
+
+def reshape_parallel(input_path, output_path, kpi_config, question_to_subcols, n_workers=None):
+    n_workers = n_workers or os.cpu_count() or 1
+    fieldnames = read_fieldnames(input_path)
+    print("Fieldnames found:", fieldnames)
+    check_required_columns(fieldnames)
+    slots = resolve_option_slots(fieldnames, kpi_config, question_to_subcols)
+    shards = plan_shards(input_path, n_workers)
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_path))) as tmp:
+        shard_paths = [os.path.join(tmp, f"shard_{i:05d}.csv") for i in range(len(shards))]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [
+                pool.submit(_reshape_shard, input_path, start, end, fieldnames, slots, shard_path)
+                for (start, end), shard_path in zip(shards, shard_paths)
+            ]
+            for i, future in enumerate(futures):
+                wide_rows, long_rows = future.result()
+                print(f"Shard {i + 1}/{len(shards)}: {wide_rows} respondents -> {long_rows} long rows")
+
+        # Concatenating shards in file order keeps the respondent ordering of the input.
+        with open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+            csv.writer(outfile).writerow(LONG_FIELDNAMES)
+            for shard_path in shard_paths:
+                with open(shard_path, 'r', newline='', encoding='utf-8') as shard:
+                    shutil.copyfileobj(shard, outfile)
+
+
+RESHAPERS = {
+    "rowwise": reshape_rowwise,
+    "vectorized": reshape_vectorized,
+    "streaming": reshape_streaming,
+    "parallel": reshape_parallel,
+}
@@ -0,0 +1,165 @@
+"""
+Answer counts over panel, question, response and screener segments, built once per survey,
+and the top-box rates scored from them.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from brand_lift.survey import SurveyFrame
+
+
+class SegmentCube:
+    """
+    Answer counts over panel_group x Question_ID x Response_Code x each segment question (age,
+    gender or any other screener, given as {segment name: Question_ID}), built in one pass over
+    the long table.
+    Only non-empty cells are kept, as int32 per-dimension codes plus int64 counts, so crosstabs,
+    distribution charts and arbitrary segment cuts are sums over this table instead of new scans.
+    A respondent's segment is their first answer to that question; respondents without one fall in
+    a trailing "no answer" slot reported as NaN. Rows missing panel, question or response are left out.
+    """
+    BASE_DIMS = ['panel_group', 'Question_ID', 'Response_Code']
+
+    def __init__(self, survey: SurveyFrame, segments: dict = None):
+        df = survey.df
+        respondent_codes, respondents = pd.factorize(df['Respondent_ID'])
+        panel_codes, panels = pd.factorize(df['panel_group'])
+        q_codes = pd.Categorical(df['Question_ID'], categories=survey.question_ids).codes
+        r_codes, responses = pd.factorize(df['Response_Code'])
+        keep = (panel_codes >= 0) & (q_codes >= 0) & (r_codes >= 0)
+
+        self.labels = {
+            'panel_group': pd.Index(panels),
+            'Question_ID': pd.Index(survey.question_ids),
+            'Response_Code': pd.Index(responses),
+        }
+        codes = [panel_codes[keep], q_codes[keep], r_codes[keep]]
+        for label, q_id in (segments or {}).items():
+            answers = survey.question(q_id)
+            answer_codes, answer_labels = pd.factorize(answers['Response_Code'])
+            by_respondent = np.full(len(respondents), -1)
+            # Assigning in reverse leaves each respondent's first answer in place.
+            by_respondent[respondent_codes[answers.index.to_numpy()][::-1]] = answer_codes[::-1]
+            segment = by_respondent[respondent_codes[keep]]
+            codes.append(np.where(segment < 0, len(answer_labels), segment))
+            self.labels[label] = pd.Index(answer_labels)
+        self.dims = list(self.labels)
+        self.shape = tuple(len(self.labels[d]) + (d not in self.BASE_DIMS) for d in self.dims)
+
+        cells, self.counts = np.unique(np.ravel_multi_index(codes, self.shape), return_counts=True)
+        self.codes = np.vstack(np.unravel_index(cells, self.shape)).astype(np.int32)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __contains__(self, q_id):
+        return q_id in self.labels['Question_ID']
+
+    @property
+    def segments(self):
+        return [d for d in self.dims if d not in self.BASE_DIMS]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.counts.nbytes
+
+    def level_labels(self, dim) -> np.ndarray:
+        """Labels for every code of dim, including the trailing NaN "no answer" slot of segments."""
+        labels = np.asarray(self.labels[dim], dtype=object)
+        return labels if dim in self.BASE_DIMS else np.append(labels, np.nan)
+
+    def _mask(self, where):
+        mask = np.ones(len(self.counts), dtype=bool)
+        for dim, values in (where or {}).items():
+            wanted = self.labels[dim].get_indexer(list(values))
+            mask &= np.isin(self.codes[self.dims.index(dim)], wanted[wanted >= 0])
+        return mask
+
+    def array(self, by, where=None) -> np.ndarray:
+        """Dense counts over the `by` dims (in that order) for cells matching where={dim: labels}, summed over the rest."""
+        mask = self._mask(where)
+        axes = [self.dims.index(d) for d in by]
+        shape = tuple(self.shape[a] for a in axes)
+        flat = np.ravel_multi_index(self.codes[axes][:, mask], shape)
+        return np.bincount(flat, weights=self.counts[mask], minlength=int(np.prod(shape))).astype(np.int64).reshape(shape)
+
+    def counts_by(self, by, where=None) -> pd.Series:
+        """Non-zero counts over the `by` dims as a Series indexed (and sorted) by their labels."""
+        dense = self.array(by, where)
+        cells = np.flatnonzero(dense)
+        levels = [self.level_labels(d)[c] for d, c in zip(by, np.unravel_index(cells, dense.shape))]
+        index = pd.MultiIndex.from_arrays(levels, names=list(by)) if len(by) > 1 else pd.Index(levels[0], name=by[0])
+        return pd.Series(dense.ravel()[cells], index=index, name='count').sort_index()
+
+
+def top_box_keywords(kpi_name: str):
+    """Determine top-box keywords based on KPI name patterns."""
+    if kpi_name is None:
+        return ['yes','very','likely']
+    kpi_name_lower = kpi_name.lower()
+    if 'aware' in kpi_name_lower or 'recall' in kpi_name_lower:
+        return ['aware','yes','recall','very aware','very']
+    elif 'consider' in kpi_name_lower or 'intent' in kpi_name_lower:
+        return ['very likely','likely','somewhat likely']
+    elif 'preference' in kpi_name_lower or 'association' in kpi_name_lower:
+        return ['yes','very','prefer','associate','likely']
+    else:
+        # fallback
+        return ['yes','very','likely']
+
+
+def match_keywords(responses, keywords) -> np.ndarray:
+    """One bool per (lowercased) response: does it contain any of the keywords (substring match)."""
+    pattern = re.compile("|".join(re.escape(kw.lower()) for kw in keywords))
+    return np.fromiter((pattern.search(r) is not None for r in responses), dtype=bool, count=len(responses))
+
+
+def match_options(responses, options) -> np.ndarray:
+    """One bool per response: is it exactly one of the options (ignoring case and surrounding spaces)."""
+    wanted = {str(option).strip().lower() for option in options}
+    return np.fromiter((str(r).strip().lower() in wanted for r in responses), dtype=bool, count=len(responses))
+
+
+class TopBoxScorer:
+    """
+    Top-box rates from a SegmentCube. Each keyword list is compiled into one regex and matched once
+    per distinct (lowercased) Response_Code; rates are then sums of cube counts, so no per-row
+    string work is done.
+    """
+    def __init__(self, segment_cube: SegmentCube):
+        self.segment_cube = segment_cube
+        self.responses = [str(r).lower() for r in segment_cube.labels['Response_Code']]
+        self._flags = {}
+
+    def keyword_flags(self, keywords) -> np.ndarray:
+        """One bool per distinct Response_Code: does it contain any of the keywords (substring match)."""
+        key = tuple(keywords)
+        if key not in self._flags:
+            self._flags[key] = match_keywords(self.responses, keywords)
+        return self._flags[key]
+
+    def cube(self, scores: dict, segments=()) -> pd.DataFrame:
+        """
+        Top-box sums and answer counts for every score in scores ({name: (question_ids, keywords)})
+        by panel_group and the given SegmentCube segment dims (e.g. ['Age', 'Gender']).
+        """
+        by = ['panel_group', *segments]
+        frames = []
+        for name, (question_ids, keywords) in scores.items():
+            dense = self.segment_cube.array([*by, 'Response_Code'], where={'Question_ID': question_ids})
+            top, total = dense[..., self.keyword_flags(keywords)].sum(axis=-1), dense.sum(axis=-1)
+            cells = np.flatnonzero(total)
+            levels = [self.segment_cube.level_labels(d)[c] for d, c in zip(by, np.unravel_index(cells, total.shape))]
+            frames.append(pd.DataFrame({'score': name, 'sum': top.ravel()[cells], 'count': total.ravel()[cells],
+                                        **dict(zip(by, levels))}))
+        if not frames:
+            return pd.DataFrame(columns=['sum', 'count'], index=pd.MultiIndex.from_tuples([], names=['score', *by]))
+        return pd.concat(frames, ignore_index=True).set_index(['score', *by]).sort_index()
+
+    @staticmethod
+    def rates(cube: pd.DataFrame, by) -> pd.Series:
+        """Top-box % from a cube(), rolled up to the `by` levels (rows with a missing segment are left out)."""
+        totals = cube.groupby(level=list(by)).sum()
+        return totals['sum'] / totals['count'] * 100
@@ -0,0 +1,138 @@
+"""Google Slides deck building for step 3: queued requests sent in chunked batchUpdate calls."""
+import itertools
+import logging
+import random
+import time
+import uuid
+
+from brand_lift.profiling import RunProfiler
+from brand_lift.style import BODY_FONT, HEADING_FONT, PRIMARY_COLOR
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """A googleapiclient HttpError (or anything shaped like one) with HTTP status 429."""
+    return getattr(getattr(error, 'resp', None), 'status', None) == 429
+
+
+def slides_batch_update(slides_service, presentation_id, requests, max_retries=5, retry_delay=5, profiler=None):
+    """
+    One presentations().batchUpdate call. 429s are retried up to max_retries times with exponential
+    backoff and full jitter (uniform in [0, retry_delay * 2**attempt] seconds); other errors raise.
+    """
+    profiler = profiler or RunProfiler()
+    for attempt in range(max_retries):
+        try:
+            profiler.count('slides')
+            return slides_service.presentations().batchUpdate(
+                presentationId=presentation_id, body={'requests': requests}
+            ).execute()
+        except Exception as e:
+            if is_rate_limited(e) and attempt < max_retries - 1:
+                # Rate limit exceeded: back off exponentially with full jitter and retry
+                delay = random.uniform(0, retry_delay * (2 ** attempt))
+                logging.warning(f"Slides rate limit exceeded. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+            else:
+                # If it's not a rate limit error or we've hit max retries, raise the error
+                raise
+
+
+def element_properties(page_id, x, y, width, height):
+    return {
+        'pageObjectId': page_id,
+        'size': {
+            'height': {'magnitude': height, 'unit': 'EMU'},
+            'width': {'magnitude': width, 'unit': 'EMU'}
+        },
+        'transform': {
+            'scaleX':1,
+            'scaleY':1,
+            'translateX':x,
+            'translateY':y,
+            'unit':'EMU'
+        }
+    }
+
+
+class DeckBuilder:
+    """
+    Queues Slides API requests for a presentation and sends them in as few batchUpdate calls as
+    possible. Object IDs are generated client-side, so later requests can reference slides and
+    shapes before they exist and nothing has to round-trip until flush(). flush() is timed as the
+    'slides' stage of the profiler.
+    """
+    def __init__(self, slides_service, presentation_id, max_requests=500, max_retries=5, retry_delay=5,
+                 profiler=None):
+        self.slides_service=slides_service
+        self.presentation_id=presentation_id
+        self.max_requests=max_requests
+        self.max_retries=max_retries
+        self.retry_delay=retry_delay
+        self.profiler=profiler or RunProfiler()
+        self.requests=[]
+        self.batch_calls=0
+        self.slide_count=0
+        self._prefix=uuid.uuid4().hex[:8]
+        self._counter=itertools.count()
+
+    def new_id(self, kind: str) -> str:
+        return f"{kind}_{self._prefix}_{next(self._counter)}"
+
+    def add_slide(self) -> str:
+        slide_id = self.new_id('Slide')
+        self.requests.append({
+            'createSlide': {'objectId': slide_id, 'slideLayoutReference': {'predefinedLayout': 'BLANK'}}
+        })
+        self.slide_count += 1
+        return slide_id
+
+    def add_text_box(self, slide_id, text, x=500000, y=500000, width=6000000, height=2000000, heading=False) -> str:
+        text_box_id = self.new_id('TextBox')
+        self.requests.append({
+            'createShape': {
+                'objectId': text_box_id,
+                'shapeType': 'TEXT_BOX',
+                'elementProperties': element_properties(slide_id, x, y, width, height)
+            }
+        })
+        if not text:
+            # insertText/updateTextStyle reject empty text, so leave the box blank
+            return text_box_id
+        font_family = HEADING_FONT if heading else BODY_FONT
+        r, g, b = int(PRIMARY_COLOR[1:3],16)/255.0, int(PRIMARY_COLOR[3:5],16)/255.0, int(PRIMARY_COLOR[5:7],16)/255.0
+        self.requests.append({'insertText': {'objectId': text_box_id, 'insertionIndex':0, 'text': text}})
+        self.requests.append({
+            'updateTextStyle': {
+                'objectId': text_box_id,
+                'fields': 'fontFamily,foregroundColor',
+                'style': {
+                    'fontFamily': font_family,
+                    'foregroundColor': {'opaqueColor': {'rgbColor': {'red':r,'green':g,'blue':b}}}
+                }
+            }
+        })
+        return text_box_id
+
+    def add_image(self, slide_id, image_url, x=1000000, y=1000000, width=4000000, height=3000000):
+        if not image_url:
+            return None
+        image_id = self.new_id('Img')
+        self.requests.append({
+            'createImage': {
+                'objectId': image_id,
+                'url': image_url,
+                'elementProperties': element_properties(slide_id, x, y, width, height)
+            }
+        })
+        return image_id
+
+    def flush(self):
+        """Send all queued requests, at most max_requests per batchUpdate call."""
+        with self.profiler.stage('slides'):
+            for start in range(0, len(self.requests), self.max_requests):
+                slides_batch_update(self.slides_service, self.presentation_id, self.requests[start:start + self.max_requests],
+                                    max_retries=self.max_retries, retry_delay=self.retry_delay, profiler=self.profiler)
+                self.batch_calls += 1
+            logging.info(f"Sent {len(self.requests)} Slides requests ({self.slide_count} slides) "
+                         f"in {self.batch_calls} batchUpdate call(s).")
+            self.requests=[]
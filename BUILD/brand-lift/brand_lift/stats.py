@@ -0,0 +1,160 @@
+"""
+Vectorised significance tests over stacks of zero-padded panel x response tables, and the
+Beta-Binomial posterior of the top-box lift.
+"""
+import os
+import warnings
+
+import numpy as np
+from scipy.special import expit
+from scipy.stats import beta as beta_dist, chi2 as chi2_dist
+
+try:
+    import pymc as pm
+    BAYES_AVAILABLE = True
+except ImportError:
+    BAYES_AVAILABLE = False
+    warnings.warn("pymc not installed. BAYES_METHOD = 'mcmc' will fall back to the conjugate Beta-Binomial lift.")
+
+
+def batched_chi_square(counts: np.ndarray):
+    """
+    Vectorised chi2_contingency over a stack of zero-padded tables: empty rows/columns are
+    ignored, and Yates' correction is applied where dof == 1, exactly as scipy does per table.
+    Returns (chi2, p, dof, min_expected) arrays.
+    """
+    counts = counts.astype(float)
+    row_tot = counts.sum(axis=2, keepdims=True)
+    col_tot = counts.sum(axis=1, keepdims=True)
+    n = counts.sum(axis=(1,2), keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = np.where(n>0, row_tot*col_tot/n, 0.0)
+    # Clamp each factor so an all-zero table gets dof 0 rather than (-1) * (-1).
+    dof = np.maximum((row_tot[:,:,0]>0).sum(axis=1)-1, 0) * np.maximum((col_tot[:,0,:]>0).sum(axis=1)-1, 0)
+    diff = expected - counts
+    yates = (dof==1)[:,None,None]
+    observed = np.where(yates, counts + np.minimum(0.5, np.abs(diff))*np.sign(diff), counts)
+    live = expected > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(live, (observed-expected)**2/np.where(live, expected, 1.0), 0.0)
+    stat = terms.sum(axis=(1,2))
+    p = np.where(dof>0, chi2_dist.sf(stat, np.maximum(dof,1)), 1.0)
+    stat = np.where(dof>0, stat, 0.0)
+    min_expected = np.where(live, expected, np.inf).min(axis=(1,2), initial=np.inf)
+    return stat, p, dof, min_expected
+
+
+def permuted_tables(row_tot: np.ndarray, col_tot: np.ndarray, size: int, rng) -> np.ndarray:
+    """
+    `size` random (rows x cols) tables per question with the given margins, shaped (size, questions,
+    rows, cols). Shuffling panel labels over respondents gives exactly this distribution, and each
+    cell is a hypergeometric draw given the cells before it, so no per-respondent arrays are needed.
+    """
+    q, r = row_tot.shape
+    c = col_tot.shape[1]
+    tables = np.zeros((size, q, r, c), dtype=np.int64)
+    remaining = np.broadcast_to(col_tot, (size, q, c)).copy()
+    for i in range(r - 1):
+        need = np.broadcast_to(row_tot[:, i], (size, q)).copy()
+        left = remaining.sum(axis=2)
+        for j in range(c - 1):
+            left = left - remaining[:, :, j]
+            tables[:, :, i, j] = rng.hypergeometric(remaining[:, :, j], left, need)
+            need -= tables[:, :, i, j]
+        tables[:, :, i, c - 1] = need
+        remaining -= tables[:, :, i]
+    tables[:, :, r - 1] = remaining
+    return tables
+
+
+def permutation_chi_square(counts: np.ndarray, max_permutations=10_000, chunk=500, max_cells=20_000_000,
+                           alpha=0.05, confidence=0.99, seed=123):
+    """
+    Monte Carlo permutation p-values of the Pearson statistic for a stack of zero-padded tables
+    (as from build_contingency_counts). Questions still undecided are permuted together chunk by
+    chunk; each stops once the Clopper-Pearson interval of its p-value excludes alpha.
+    Returns (p, permutations used, observed statistic) arrays; p = (hits + 1) / (permutations + 1).
+    The statistic is uncorrected Pearson chi-square, also for 2x2 tables.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    row_tot, col_tot = counts.sum(axis=2), counts.sum(axis=1)
+    n = row_tot.sum(axis=1)
+    expected = row_tot[:, :, None] * col_tot[:, None, :] / np.maximum(n, 1)[:, None, None]
+    live = expected > 0
+    inv_expected = np.where(live, 1 / np.where(live, expected, 1.0), 0.0)
+    observed = (((counts - expected)**2) * inv_expected).sum(axis=(1, 2))
+    threshold = observed - 1e-9 * np.maximum(observed, 1.0)  # ties with the observed table count as hits
+
+    rng = np.random.default_rng(seed)
+    hits, used = np.zeros(len(counts), dtype=np.int64), np.zeros(len(counts), dtype=np.int64)
+    active = np.flatnonzero(((row_tot > 0).sum(axis=1) > 1) & ((col_tot > 0).sum(axis=1) > 1))
+    tail = (1 - confidence) / 2
+    while active.size:
+        size = int(max(1, min(chunk, max_permutations - used[active].min(), max_cells // max(active.size * counts[0].size, 1))))
+        tables = permuted_tables(row_tot[active], col_tot[active], size, rng)
+        stats = (((tables - expected[active])**2) * inv_expected[active]).sum(axis=(2, 3))
+        hits[active] += (stats >= threshold[active]).sum(axis=0)
+        used[active] += size
+        k, m = hits[active], used[active]
+        lower = np.where(k > 0, beta_dist.ppf(tail, k, m - k + 1), 0.0)
+        upper = np.where(k < m, beta_dist.ppf(1 - tail, k + 1, m - k), 1.0)
+        active = active[(lower <= alpha) & (upper >= alpha) & (m < max_permutations)]
+    p = np.where(used > 0, (hits + 1) / (used + 1), 1.0)
+    return p, used, observed
+
+
+def _conjugate_lift_draws(successes, trials, prior=(1.0, 1.0), draws=20_000, seed=123):
+    """Monte Carlo draws of p_exposed - p_control from the Beta-Binomial posteriors, shape (draws, outcomes)."""
+    a, b = prior
+    rng = np.random.default_rng(seed)
+    p = rng.beta(a + successes, b + trials - successes, size=(draws, *successes.shape))
+    return p[..., 1] - p[..., 0]
+
+
+def _mcmc_lift_draws(successes, trials, draws=1000, tune=1000, chains=4, cores=-1, seed=123):
+    """
+    The same aggregated model fitted with PyMC: per-outcome logit intercept and treatment effect with
+    Binomial likelihoods on the success counts. A starting point for richer (e.g. hierarchical) models.
+    """
+    cores = (os.cpu_count() or 1) if cores in (None, -1) else max(1, cores)
+    k = successes.shape[0]
+    with pm.Model():
+        alpha = pm.Normal('alpha', 0, 5, shape=k)
+        tau = pm.Normal('tau', 0, 5, shape=k)
+        pm.Binomial('control', n=trials[:, 0], p=pm.math.sigmoid(alpha), observed=successes[:, 0])
+        pm.Binomial('exposed', n=trials[:, 1], p=pm.math.sigmoid(alpha + tau), observed=successes[:, 1])
+        trace = pm.sample(draws, tune=tune, chains=chains, cores=min(cores, chains), random_seed=seed,
+                          progressbar=False, return_inferencedata=True)
+    alpha = trace.posterior['alpha'].values.reshape(-1, k)
+    tau = trace.posterior['tau'].values.reshape(-1, k)
+    return expit(alpha + tau) - expit(alpha)
+
+
+def posterior_lift(successes, trials, method="conjugate", prior=(1.0, 1.0), draws=20_000, seed=123,
+                   mcmc=None) -> dict:
+    """
+    Posterior of the lift p_exposed - p_control for each outcome from (Control, Exposed) success and
+    trial counts, each shaped (outcomes, 2). Returns arrays of posterior rates, lift mean, 95% interval
+    and P(lift > 0). `draws` sets the conjugate Monte Carlo draws; `mcmc` holds _mcmc_lift_draws
+    options (draws, tune, chains, cores).
+    """
+    successes = np.asarray(successes, dtype=float).reshape(-1, 2)
+    trials = np.asarray(trials, dtype=float).reshape(-1, 2)
+    if method == "mcmc" and not BAYES_AVAILABLE:
+        warnings.warn("pymc not installed; using the conjugate Beta-Binomial lift instead of MCMC.")
+        method = "conjugate"
+    a, b = prior
+    # Beta(a + successes, b + failures) posterior means; the conjugate lift mean is exact.
+    rates = (a + successes) / (a + b + trials)
+    if method == "mcmc":
+        lift = _mcmc_lift_draws(successes, trials, seed=seed, **(mcmc or {}))
+    else:
+        lift = _conjugate_lift_draws(successes, trials, prior, draws=draws, seed=seed)
+    return {
+        'control_rate': rates[:, 0],
+        'exposed_rate': rates[:, 1],
+        'lift_mean': lift.mean(axis=0) if method == "mcmc" else rates[:, 1] - rates[:, 0],
+        'lift_CI_lower': np.percentile(lift, 2.5, axis=0),
+        'lift_CI_upper': np.percentile(lift, 97.5, axis=0),
+        'prob_positive': (lift > 0).mean(axis=0),
+    }
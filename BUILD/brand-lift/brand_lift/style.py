@@ -0,0 +1,16 @@
+"""Brand fonts, colours and plot styling shared by the report charts and slides."""
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+HEADING_FONT = "Sora"
+BODY_FONT = "Work Sans"
+PRIMARY_COLOR = "#333333"
+SECONDARY_COLOR = "#4A5568"
+ACCENT_COLOR = "#00BFFF"
+WHITE_SMOKE = "#F5F5F5"
+FRENCH_GREY = "#D1D5DB"
+
+
+def apply_style():
+    sns.set(style="whitegrid")
+    plt.rcParams['figure.figsize']=(10,6)
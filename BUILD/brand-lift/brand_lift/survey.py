@@ -0,0 +1,86 @@
+"""Cleaned long-format survey table with a per-question row index."""
+import logging
+import sys
+
+import numpy as np
+import pandas as pd
+
+
+class SurveyFrame:
+    """
+    Long survey table sorted (stably) by Question_ID, with each question's [start, stop) row
+    offsets precomputed so per-question lookups are O(1) slices instead of O(N) boolean scans.
+    Columns added to .df afterwards stay aligned because rows are never reordered again.
+    """
+    def __init__(self, df: pd.DataFrame, key: str = 'Question_ID'):
+        codes, uniques = pd.factorize(df[key])
+        order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        # Rows with a missing Question_ID (code -1) sort first and are left out of the index.
+        start = int((codes < 0).sum())
+        self.offsets = {}
+        for q_id, n in zip(uniques, counts):
+            self.offsets[q_id] = (start, start + int(n))
+            start += int(n)
+        self.df = df.iloc[order].reset_index(drop=True)
+
+    @property
+    def question_ids(self):
+        return list(self.offsets)
+
+    def __contains__(self, q_id):
+        return q_id in self.offsets
+
+    def question(self, q_id) -> pd.DataFrame:
+        start, stop = self.offsets.get(q_id, (0, 0))
+        return self.df.iloc[start:stop]
+
+    def questions(self, q_ids) -> pd.DataFrame:
+        spans = [self.offsets[q] for q in dict.fromkeys(q_ids) if q in self.offsets]
+        if not spans:
+            return self.df.iloc[0:0]
+        return self.df.iloc[np.concatenate([np.arange(a, b) for a, b in spans])]
+
+    def memory_usage(self) -> dict:
+        return {
+            'rows': len(self.df),
+            'questions': len(self.offsets),
+            'data_mb': self.df.memory_usage(deep=True).sum() / 2**20,
+            'index_kb': (sys.getsizeof(self.offsets) + sum(sys.getsizeof(v) for v in self.offsets.values())) / 1024,
+        }
+
+
+class DataCleaner:
+    def __init__(self, df: pd.DataFrame, high_missing_threshold: float, exclude_columns=None):
+        self.df=df
+        self.high_missing_threshold=high_missing_threshold
+        self.exclude_columns=exclude_columns if exclude_columns else []
+        self.survey=None
+
+    def drop_high_missing(self):
+        missing_percent=self.df.isnull().sum()/len(self.df)*100
+        high_missing_cols=missing_percent[missing_percent>self.high_missing_threshold].index.tolist()
+        high_missing_cols=[c for c in high_missing_cols if c not in self.exclude_columns]
+        if high_missing_cols:
+            self.df.drop(columns=high_missing_cols,inplace=True)
+            logging.info(f"Dropped columns with high missingness: {high_missing_cols}")
+
+    def create_purchase_binary(self):
+        q2_data=self.survey.question('Q2').copy()
+        if q2_data.empty:
+            self.df['purchase_binary']=0
+            return
+        q2_data['purchase_binary'] = np.where(q2_data['Response_Code'].str.lower()=='very likely', 1, 0)
+        # One flag per respondent (any "very likely"), mapped in place so the SurveyFrame offsets stay valid.
+        q2_map=q2_data.groupby('Respondent_ID')['purchase_binary'].max()
+        self.df['purchase_binary'] = self.df['Respondent_ID'].map(q2_map).fillna(0).astype(int)
+
+    def run(self):
+        logging.info("=== Data Cleaning Stage ===")
+        self.drop_high_missing()
+        self.survey = SurveyFrame(self.df)
+        self.df = self.survey.df
+        self.create_purchase_binary()
+        if len(self.df)==0:
+            raise SystemExit("No data after cleaning.")
+        return self.df
@@ -0,0 +1,104 @@
+"""Chart image uploads to Google Drive for step 3: deduplicated, threaded, with batched permission grants."""
+import logging
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from brand_lift.cache import file_hash
+from brand_lift.profiling import RunProfiler
+
+try:
+    from googleapiclient.http import MediaFileUpload
+    GOOGLE_API_AVAILABLE = True
+except ImportError:
+    GOOGLE_API_AVAILABLE = False
+
+
+class ImageUploader:
+    """
+    Uploads PNGs to a Drive folder on a bounded thread pool and makes them publicly readable.
+    Images are deduplicated by content hash, within and across upload() calls, so each distinct
+    image is sent once; permission grants go out in Drive batch requests of at most batch_max_calls.
+    `service_factory()` builds a Drive v3 service; it is called once per worker thread.
+    """
+    def __init__(self, folder_id, service_factory, max_workers=8, batch_max_calls=100, profiler=None):
+        if not GOOGLE_API_AVAILABLE:
+            raise ImportError("google-api-python-client is required to upload images to Drive.")
+        self.folder_id=folder_id
+        self.service_factory=service_factory
+        self.max_workers=max_workers
+        self.batch_max_calls=batch_max_calls
+        self.profiler=profiler or RunProfiler()
+        self.urls_by_hash={}
+        self.uploads=0
+        self._local=threading.local()
+
+    def _service(self):
+        # googleapiclient service objects are not thread-safe, so each thread builds its own.
+        if not hasattr(self._local, 'service'):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def _upload_one(self, image_path: str):
+        file_metadata = {'name': os.path.basename(image_path), 'parents': [self.folder_id]}
+        try:
+            # webContentLink comes back with the upload, so no separate files().get is needed.
+            self.profiler.count('drive')
+            return self._service().files().create(
+                body=file_metadata,
+                media_body=MediaFileUpload(image_path, mimetype='image/png'),
+                fields='id,webContentLink'
+            ).execute()
+        except Exception as e:
+            warnings.warn(f"Failed to upload image {image_path}: {e}")
+            return None
+
+    def _make_public(self, uploaded: dict) -> dict:
+        """Grant 'anyone' read access to {hash: (path, file)}; return {hash: url} for the successes."""
+        urls = {}
+        service = self._service()
+
+        def on_response(request_id, response, exception):
+            image_path, info = uploaded[request_id]
+            if exception is not None:
+                warnings.warn(f"Failed to set permission for {image_path}: {exception}")
+            else:
+                urls[request_id] = info.get('webContentLink')
+
+        items = list(uploaded.items())
+        for start in range(0, len(items), self.batch_max_calls):
+            batch = service.new_batch_http_request(callback=on_response)
+            for digest, (_, info) in items[start:start + self.batch_max_calls]:
+                batch.add(service.permissions().create(fileId=info['id'], body={'role': 'reader','type': 'anyone'}),
+                          request_id=digest)
+            self.profiler.count('drive')
+            batch.execute()
+        return urls
+
+    def upload(self, image_paths) -> dict:
+        """Upload every existing image in image_paths; return {path: public URL or None}."""
+        with self.profiler.stage('upload_images'):
+            paths_by_hash = {}
+            for image_path in dict.fromkeys(image_paths):
+                if not image_path:
+                    continue
+                if not os.path.exists(image_path):
+                    warnings.warn(f"Image file '{image_path}' not found. Skipping upload.")
+                    continue
+                paths_by_hash.setdefault(file_hash(image_path), []).append(image_path)
+
+            pending = [digest for digest in paths_by_hash if digest not in self.urls_by_hash]
+            if pending:
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pending)))) as pool:
+                    files = list(pool.map(lambda digest: self._upload_one(paths_by_hash[digest][0]), pending))
+                uploaded = {digest: (paths_by_hash[digest][0], info) for digest, info in zip(pending, files) if info}
+                if uploaded:
+                    self.urls_by_hash.update(self._make_public(uploaded))
+                self.uploads += len(uploaded)
+                logging.info(f"Uploaded {len(uploaded)} of {len(pending)} new image(s) in {time.perf_counter() - start:.1f}s; "
+                             f"{len(paths_by_hash) - len(pending)} already uploaded.")
+            return {image_path: self.urls_by_hash.get(digest)
+                    for digest, image_paths_for_hash in paths_by_hash.items() for image_path in image_paths_for_hash}
@@ -3,6 +3,7 @@
 
 import os
 import json
+import sys
 import openai
 import pandas as pd
 
@@ -14,6 +15,14 @@ import google.auth
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 
+# Shared helpers live in brand_lift/ next to the step scripts. In a notebook, where __file__ is
+# not set, run from (or set CODE_DIR to) the folder holding them.
+CODE_DIR = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+if CODE_DIR not in sys.path:
+    sys.path.insert(0, CODE_DIR)
+from brand_lift.cache import PromptCache
+from brand_lift.profiling import RunProfiler
+
 # ========== CONFIGURATIONS ==========
 # openai.api_key = 
 # TODO: Load API key from a secure source like environment variables or a secrets manager
@@ -31,6 +40,30 @@ LOCAL_SAVE_DIR = "/content/drive/MyDrive/Build! 👷‍♂️/V1 MVP/Survey Crea
 if not os.path.exists(LOCAL_SAVE_DIR):
     os.makedirs(LOCAL_SAVE_DIR)
 
+# Model responses are cached in SQLite under a hash of (model, system message, prompt,
+# temperature, max_tokens), so re-processing a submission reuses the earlier survey draft.
+# Entries expire after PROMPT_CACHE_TTL_DAYS; LRU eviction keeps the cache under PROMPT_CACHE_MAX_MB.
+# PROMPT_CACHE_BYPASS = True always calls the API and leaves the cache untouched.
+# The cache lives on the Colab VM's local disk: SQLite's file locking is unreliable on the Drive
+# FUSE mount. PROMPT_CACHE_ON_DRIVE = True keeps it in LOCAL_SAVE_DIR instead, so it survives a
+# runtime reset, at the risk of "database is locked" errors or a corrupted file.
+PROMPT_CACHE_ON_DRIVE = False
+PROMPT_CACHE_PATH = os.path.join(LOCAL_SAVE_DIR if PROMPT_CACHE_ON_DRIVE else "/content/cache", ".prompt_cache.sqlite")
+PROMPT_CACHE_TTL_DAYS = 30
+PROMPT_CACHE_MAX_MB = 256
+PROMPT_CACHE_BYPASS = False
+
+SURVEY_MODEL = "gpt-4o-mini"
+SURVEY_SYSTEM_MSG = "You are a helpful assistant and a highly skilled marketing strategist."
+SURVEY_MAX_TOKENS = 3000
+SURVEY_TEMPERATURE = 0.7
+
+# Per-stage wall/CPU time, peak RSS and Sheets/Drive/Docs/OpenAI call counts are written to RUN_REPORT_JSON.
+# PROFILE_STAGES = True also dumps a cProfile file per top-level stage into PROFILE_DIR.
+RUN_REPORT_JSON = os.path.join(LOCAL_SAVE_DIR, "survey_run_report.json")
+PROFILE_STAGES = False
+PROFILE_DIR = os.path.join(LOCAL_SAVE_DIR, "profiles")
+
 # Obtain credentials
 creds, _ = google.auth.default(scopes=[
     "https://www.googleapis.com/auth/spreadsheets",
@@ -42,10 +75,16 @@ gc = gspread.authorize(creds)
 drive_service = build('drive', 'v3', credentials=creds)
 docs_service = build('docs', 'v1', credentials=creds)
 
+prompt_cache = PromptCache(PROMPT_CACHE_PATH, PROMPT_CACHE_TTL_DAYS, PROMPT_CACHE_MAX_MB, PROMPT_CACHE_BYPASS)
+
+profiler = RunProfiler(PROFILE_DIR if PROFILE_STAGES else None)
+
+@profiler.profiled('read_sheet')
 def get_gsheet_data(spreadsheet_url: str, worksheet_name: str) -> pd.DataFrame:
     sh = gc.open_by_url(spreadsheet_url)
     worksheet = sh.worksheet(worksheet_name)
     data = worksheet.get_all_values()
+    profiler.count('sheets', 3)  # open_by_url, worksheet and get_all_values each hit the API
     df = pd.DataFrame(data[1:], columns=data[0])
     return df
 
@@ -106,6 +145,7 @@ Main KPI Identified: {main_kpi if main_kpi else 'No Hero KPI explicitly identifi
 
     return campaign_name, brand_name, brand_context_narrative.strip(), main_kpi, kpi_info
 
+@profiler.profiled('generate_survey')
 def generate_survey_and_analysis(brand_context: str, main_kpi: str) -> str:
     main_kpi_note = f"note: the main kpi for this campaign is '{main_kpi}'. ensure robust measurement of this kpi." if main_kpi else "if no hero kpi is identified, treat all kpis equally."
 
@@ -142,17 +182,26 @@ format output with:
 - a section for recommended screening/demographic questions (including the specified age/gender format).
 """
 
+    cache_key = (SURVEY_MODEL, SURVEY_SYSTEM_MSG, prompt, SURVEY_TEMPERATURE, SURVEY_MAX_TOKENS)
+    cached = prompt_cache.get(*cache_key)
+    if cached is not None:
+        return cached
+
+    profiler.count('openai')
     response = openai.ChatCompletion.create(
-        model="gpt-4o-mini",
+        model=SURVEY_MODEL,
         messages=[
-            {"role": "system", "content": "You are a helpful assistant and a highly skilled marketing strategist."},
+            {"role": "system", "content": SURVEY_SYSTEM_MSG},
             {"role": "user", "content": prompt}
         ],
-        max_tokens=3000,
-        temperature=0.7
+        max_tokens=SURVEY_MAX_TOKENS,
+        temperature=SURVEY_TEMPERATURE
     )
-    return response.choices[0].message.content.strip()
+    text = response.choices[0].message.content.strip()
+    prompt_cache.put(*cache_key, text)
+    return text
 
+@profiler.profiled('google_doc')
 def create_google_doc(title: str, campaign_name: str, brand_context: str, survey_and_analysis: str) -> str:
     # Create the document in the specified folder by using the parents field
     file_metadata = {
@@ -160,6 +209,7 @@ def create_google_doc(title: str, campaign_name: str, brand_context: str, survey
         'mimeType': 'application/vnd.google-apps.document',
         'parents': [FOLDER_ID]
     }
+    profiler.count('drive')
     doc = drive_service.files().create(body=file_metadata, fields='id').execute()
     doc_id = doc.get('id')
 
@@ -231,9 +281,11 @@ def create_google_doc(title: str, campaign_name: str, brand_context: str, survey
         }
     ]
 
+    profiler.count('docs')
     docs_service.documents().batchUpdate(documentId=doc_id, body={'requests': requests}).execute()
     return doc_id
 
+@profiler.profiled('save_json')
 def save_json_locally_and_to_drive(filename: str, data: dict) -> str:
     local_path = os.path.join(LOCAL_SAVE_DIR, filename)
     with open(local_path, "w", encoding='utf-8') as f:
@@ -241,6 +293,7 @@ def save_json_locally_and_to_drive(filename: str, data: dict) -> str:
 
     # Upload to the same folder in Google Drive
     file_metadata = {'name': filename, 'parents': [FOLDER_ID]}
+    profiler.count('drive')
     media = MediaFileUpload(local_path, mimetype='application/json')
     uploaded = drive_service.files().create(body=file_metadata, media_body=media, fields='id').execute()
     file_id = uploaded.get('id')
@@ -283,5 +336,11 @@ def main():
     with open(PROCESSED_INDEX_FILE, 'w') as f:
         f.write(str(len(df)))
 
+    print(f"Prompt cache: {prompt_cache.stats()}")
+
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        report_path = profiler.write_report(RUN_REPORT_JSON, prompt_cache={'hits': prompt_cache.hits, 'misses': prompt_cache.misses})
+        print(f"Run report written to {report_path}")
@@ -1,66 +1,61 @@
-import csv
-import json
-import re
-
-# Load kpi_config and code_mappings
-with open('kpi_config.json', 'r', encoding='utf-8') as f:
-    kpi_config = json.load(f)
-
-with open('code_mapping.json', 'r', encoding='utf-8') as f:
-    full_code_map = json.load(f)
-    code_mapping = full_code_map["code_mappings"]
-
-def get_question_id(q_text):
-    match = re.match(r"(Q\d+)_", q_text)
-    if match:
-        return match.group(1)
-    else:
-        return q_text.split('_')[0] if '_' in q_text else q_text
-
-question_to_subcols = {}
-for q_text, subs in code_mapping.items():
-    q_id = get_question_id(q_text)
-    question_to_subcols[q_text] = {
-        "question_id": q_id,
-        "options": subs
-    }
-
-with open('original.csv', 'r', newline='', encoding='utf-8-sig') as infile, \
-     open('survey_responses_long.csv', 'w', newline='', encoding='utf-8') as outfile:
-
-    dict_reader = csv.DictReader(infile, delimiter=',')
-    print("Fieldnames found:", dict_reader.fieldnames)
-
-    # Ensure "Respondent ID" is exactly one of the fieldnames
-    if "Respondent ID" not in dict_reader.fieldnames:
-        raise ValueError("No 'Respondent ID' column found. Check CSV headers or adjust code.")
-    if "Panel_Group" not in dict_reader.fieldnames:
-        raise ValueError("No 'Panel_Group' column found. Check CSV headers or adjust code.")
-
-    fieldnames = ["Respondent_ID", "Panel_Group", "Question_ID", "Response_Code"]
-    writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    for row in dict_reader:
-        respondent_id = row["Respondent ID"]
-        panel_group = row["Panel_Group"]
-
-        for kpi_category, question_list in kpi_config["kpi_mappings"].items():
-            for q_text in question_list:
-                if q_text not in question_to_subcols:
-                    continue
-
-                q_id = question_to_subcols[q_text]["question_id"]
-                options = question_to_subcols[q_text]["options"]
-
-                for col_name, label in options.items():
-                    if col_name in row and row[col_name].strip() == '1':
-                        writer.writerow({
-                            "Respondent_ID": respondent_id,
-                            "Panel_Group": panel_group,
-                            "Question_ID": q_id,
-                            "Response_Code": label
-                        })
-
-print("Conversion complete. 'survey_responses_long.csv' created.")
-
+import os
+import sys
+
+# Shared helpers live in brand_lift/ next to the step scripts. In a notebook, where __file__ is
+# not set, run from (or set CODE_DIR to) the folder holding them.
+CODE_DIR = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+if CODE_DIR not in sys.path:
+    sys.path.insert(0, CODE_DIR)
+from brand_lift.profiling import RunProfiler
+from brand_lift.reshape import RESHAPERS, build_question_to_subcols, load_mappings, long_output_path
+
+# ===================== USER CONFIGURATIONS =====================
+KPI_CONFIG_JSON = 'kpi_config.json'
+CODE_MAPPING_JSON = 'code_mapping.json'
+INPUT_CSV = 'original.csv'
+OUTPUT_CSV = 'survey_responses_long.csv'
+# "csv", or a columnar "parquet" / "arrow" (Arrow IPC) file next to OUTPUT_CSV with
+# dictionary-encoded Panel_Group, Question_ID and Response_Code. Columnar output needs pyarrow
+# and the vectorized reshape mode; step 3's load_data reads either.
+OUTPUT_FORMAT = "csv"
+
+# "vectorized" resolves the option columns once and reshapes in bulk with NumPy/pandas.
+# "streaming" reads the export in CHUNK_SIZE-row chunks and appends each reshaped chunk, so
+# memory stays flat; an interrupted run resumes from its last completed chunk.
+# "parallel" splits the export into line-aligned byte-range shards reshaped on N_WORKERS processes.
+# "rowwise" is the original csv.DictReader loop, kept as the reference implementation.
+# The reshapers live in brand_lift/reshape.py; every mode writes the same long table.
+RESHAPE_MODE = "vectorized"
+CHUNK_SIZE = 50_000
+N_WORKERS = os.cpu_count() or 1
+
+# Per-stage wall/CPU time (including worker processes) and peak RSS are written to RUN_REPORT_JSON
+# next to OUTPUT_CSV. PROFILE_STAGES = True also dumps a cProfile file per top-level stage into PROFILE_DIR.
+RUN_REPORT_JSON = os.path.join(os.path.dirname(OUTPUT_CSV), "reshape_run_report.json")
+PROFILE_STAGES = False
+PROFILE_DIR = os.path.join(os.path.dirname(OUTPUT_CSV), "profiles")
+
+profiler = RunProfiler(PROFILE_DIR if PROFILE_STAGES else None)
+
+def main():
+    with profiler.stage("load_mappings"):
+        kpi_config, code_mapping = load_mappings(KPI_CONFIG_JSON, CODE_MAPPING_JSON)
+        question_to_subcols = build_question_to_subcols(code_mapping)
+    try:
+        with profiler.stage(f"reshape_{RESHAPE_MODE}"):
+            if OUTPUT_FORMAT != "csv" and RESHAPE_MODE != "vectorized":
+                raise ValueError("Columnar OUTPUT_FORMAT is only supported with RESHAPE_MODE = 'vectorized'.")
+            output_path = long_output_path(OUTPUT_CSV, OUTPUT_FORMAT)
+            mode_options = {
+                "vectorized": {"output_format": OUTPUT_FORMAT, "profiler": profiler},
+                "streaming": {"chunk_size": CHUNK_SIZE},
+                "parallel": {"n_workers": N_WORKERS},
+            }
+            RESHAPERS[RESHAPE_MODE](INPUT_CSV, output_path, kpi_config, question_to_subcols,
+                                    **mode_options.get(RESHAPE_MODE, {}))
+    finally:
+        print(f"Run report written to {profiler.write_report(RUN_REPORT_JSON, reshape_mode=RESHAPE_MODE, output_format=OUTPUT_FORMAT)}")
+    print(f"Conversion complete. '{output_path}' created.")
+
+if __name__ == "__main__":
+    main()
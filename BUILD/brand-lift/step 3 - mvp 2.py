@@ -18,10 +18,12 @@ import openai
 import pandas as pd
 import logging
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
 import warnings
 import time
+import sys
+import hashlib
+import glob
+import inspect
 
 from google.colab import auth
 auth.authenticate_user()
@@ -29,22 +31,42 @@ auth.authenticate_user()
 import gspread
 import google.auth
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from scipy.stats import chi2_contingency, fisher_exact
+from scipy.stats import fisher_exact
 from statsmodels.stats.multitest import multipletests
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestRegressor
 
 try:
-    import pymc as pm
-    BAYES_AVAILABLE = True
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+    ARROW_AVAILABLE = True
 except ImportError:
-    BAYES_AVAILABLE = False
-    warnings.warn("pymc not installed. Bayesian inference will be skipped.")
+    ARROW_AVAILABLE = False
+
+# Shared helpers live in brand_lift/ next to the step scripts. In a notebook, where __file__ is
+# not set, run from (or set CODE_DIR to) the folder holding them.
+CODE_DIR = os.path.dirname(os.path.abspath(__file__)) if "__file__" in globals() else os.getcwd()
+if CODE_DIR not in sys.path:
+    sys.path.insert(0, CODE_DIR)
+from brand_lift.profiling import RunProfiler
+from brand_lift.survey import SurveyFrame, DataCleaner
+from brand_lift.segments import SegmentCube, TopBoxScorer, top_box_keywords
+from brand_lift.cache import PromptCache, StageCache, file_hash
+from brand_lift.causal import RespondentMatrix, aipw_interval, aipw_terms, cross_fit_nuisance, fit_nuisance_models
+from brand_lift.learners import make_learner
+from brand_lift.commentary import COMMENTARY_FALLBACK, CommentaryGenerator
+from brand_lift.slides import DeckBuilder
+from brand_lift.uploads import ImageUploader
+from brand_lift.stats import BAYES_AVAILABLE, batched_chi_square, permutation_chi_square, posterior_lift
+from brand_lift.style import apply_style
+from brand_lift.charts import (chart_job, render_charts, run_artifacts, draw_panel_distribution, draw_kpi_distribution,
+                               draw_aipw_distribution, draw_ate_methods, draw_ps_distribution, draw_main_kpi,
+                               draw_summary_table, draw_ate_ci, draw_funnel_comparison, draw_top_box_by_segment,
+                               draw_sankey_funnel, draw_funnel_line)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
 
 # ===================== USER CONFIGURATIONS =====================
+# May also point at the columnar ".parquet" / ".arrow" long table written by step 2 (needs pyarrow).
 SURVEY_CSV = "survey_responses_long.csv"
 KPI_CONFIG_JSON = "kpi_config.json"
 CAMPAIGN_JSON = "MyCampaign_campaign_data.json"
@@ -60,6 +82,139 @@ BRAND_LIFT_LOCAL_DIR = "/content/drive/MyDrive/Build! 👷‍♂️/V1 MVP/Brand
 HIGH_MISSING_THRESHOLD = 90.0
 EXCLUDE_COLUMNS = []
 
+# Screener questions results can be cut by ({segment name: Question_ID}). Counts over
+# panel x question x response x these segments are built once (SegmentCube); the stat tests,
+# distribution charts and segment breakdowns all read from it.
+SEGMENT_QUESTIONS = {"Age": "Q9", "Gender": "Q10"}
+
+# Contingency tests use chi-square, with Fisher's exact test for sparse 2x2 tables. With
+# PERMUTATION_TESTS = "sparse", larger tables with an expected count under 5 get a Monte Carlo
+# permutation p-value instead ("all" does this for every non-Fisher table, "off" keeps chi-square).
+# Permuted tables for all questions are drawn together in chunks of PERMUTATION_CHUNK (at most
+# PERMUTATION_MAX_CELLS table cells per chunk); a question stops once the PERMUTATION_CONFIDENCE
+# interval of its p-value lies wholly above or below PERMUTATION_ALPHA, or after PERMUTATION_MAX draws.
+PERMUTATION_TESTS = "sparse"
+PERMUTATION_MAX = 10_000
+PERMUTATION_CHUNK = 500
+PERMUTATION_MAX_CELLS = 20_000_000
+PERMUTATION_ALPHA = 0.05
+PERMUTATION_CONFIDENCE = 0.99
+PERMUTATION_SEED = 123
+
+# The stage and prompt caches live in CACHE_DIR on the Colab VM's local disk, not on Drive:
+# SQLite's file locking is unreliable on the Drive FUSE mount, and stage cache entries are pickles,
+# which run code when loaded, so a cache in a shared Drive folder would execute whatever anyone
+# with write access to it put there. CACHE_ON_DRIVE = True keeps both caches in
+# BRAND_LIFT_LOCAL_DIR so they survive a runtime reset; only use it for a folder nobody else can write.
+CACHE_ON_DRIVE = False
+CACHE_DIR = BRAND_LIFT_LOCAL_DIR if CACHE_ON_DRIVE else "/content/cache"
+
+# Stage outputs (cleaning, stat tests, causal inference, charts, commentary) are cached under a
+# hash of each stage's inputs, so a re-run only recomputes stages whose inputs changed. Keys
+# include a fingerprint of the pipeline code, so editing a stage also invalidates its old
+# entries. Least-recently-used entries are evicted once the cache exceeds STAGE_CACHE_MAX_MB.
+STAGE_CACHE_ENABLED = True
+STAGE_CACHE_DIR = os.path.join(CACHE_DIR, ".stage_cache")
+STAGE_CACHE_MAX_MB = 2048
+
+# Wall/CPU time, peak RSS and external call counts (OpenAI, Drive, Slides) per stage and sub-step
+# are written to RUN_REPORT_JSON at the end of every run. PROFILE_STAGES also dumps a cProfile
+# .prof file per top-level stage into PROFILE_DIR (inspect with pstats or snakeviz).
+RUN_REPORT_JSON = os.path.join(BRAND_LIFT_LOCAL_DIR, "run_report.json")
+PROFILE_STAGES = False
+PROFILE_DIR = os.path.join(BRAND_LIFT_LOCAL_DIR, "profiles")
+
+# Individual OpenAI responses are cached in SQLite under a hash of (model, system message, prompt,
+# temperature, max_tokens), so retried or re-run reports reuse earlier commentary. Entries expire
+# after PROMPT_CACHE_TTL_DAYS; LRU eviction keeps the stored text under PROMPT_CACHE_MAX_MB.
+# PROMPT_CACHE_BYPASS = True always calls the API and leaves the cache untouched.
+PROMPT_CACHE_PATH = os.path.join(CACHE_DIR, ".prompt_cache.sqlite")
+PROMPT_CACHE_TTL_DAYS = 30
+PROMPT_CACHE_MAX_MB = 256
+PROMPT_CACHE_BYPASS = False
+
+# AIPW confidence intervals: AIPW_VARIANCE = "bootstrap" (percentile CI over BOOTSTRAP_B resamples,
+# for final reports) or "influence" (normal CI from the variance of the per-respondent AIPW terms:
+# closed form, no resampling, for quick reads and large segment sweeps). Bootstrap resample indices
+# are drawn as (chunk x n) matrices from a seeded Generator, with each chunk capped at
+# BOOTSTRAP_MAX_CELLS indices to keep memory bounded.
+AIPW_VARIANCE = "bootstrap"
+BOOTSTRAP_B = 500
+BOOTSTRAP_SEED = 123
+BOOTSTRAP_MAX_CELLS = 20_000_000
+
+# Nuisance models (propensity, T-/X-learner outcome models) are fitted concurrently on a thread
+# pool of NUISANCE_N_JOBS workers (-1 = all cores). Propensity and outcome predictions used by
+# AIPW are cross-fitted over CROSS_FIT_FOLDS stratified folds (set to 1 for in-sample fits).
+NUISANCE_N_JOBS = -1
+CROSS_FIT_FOLDS = 5
+
+# Outcome (T-learner mu0/mu1) and X-learner effect models come from the CAUSAL_LEARNERS registry in
+# brand_lift/learners.py, picked by CAUSAL_LEARNER: "random_forest" (100 full-depth trees), "small_forest"
+# (SMALL_FOREST_TREES trees, each grown on a SMALL_FOREST_MAX_SAMPLES share of respondents),
+# "hist_gradient_boosting", "ridge" (linear probability model) or "logistic" (X-learner effects use
+# ridge). ridge and logistic fit the sparse one-hot matrix as is. Outcome predictions are clipped to [0, 1].
+CAUSAL_LEARNER = "random_forest"
+SMALL_FOREST_TREES = 30
+SMALL_FOREST_MAX_SAMPLES = 0.3
+
+# Questions whose answers become respondent-level covariates in the causal stage. None means
+# every question not mapped to a KPI (screeners/demographics): KPI answers are themselves
+# affected by exposure, so using them as covariates would bias the ATE.
+COVARIATE_QUESTIONS = None
+
+# Per-KPI causal outcomes: every KPI's top-box answer becomes a binary outcome per respondent, derived
+# alongside purchase_binary in one pass over the KPI answers. Unlike the substring match behind the
+# report's top-box rates, an answer only counts when it is exactly one of the KPI's top_box_keywords,
+# so "Not likely" or "Unlikely" never count as top-box. All outcomes share the cross-fitted
+# propensity model, their outcome models are fitted on the same pool, and the AIPW ATE and CI for
+# each KPI land in one table, KPI_CAUSAL_CSV.
+CAUSAL_KPI_OUTCOMES = True
+KPI_CAUSAL_CSV = "causal_inference_by_kpi.csv"
+
+# Bayesian lift works on sufficient statistics (Control/Exposed successes and trials), so it runs for
+# purchase_binary and for the top-box share of every KPI question. "conjugate" uses Beta-Binomial
+# posteriors with a Beta(BAYES_PRIOR) prior and BAYES_DRAWS vectorised Monte Carlo draws for the
+# interval; "mcmc" fits the equivalent logit model with PyMC (BAYES_MCMC_CHAINS chains on up to
+# BAYES_MCMC_CORES processes, -1 = all cores) as a base for richer models.
+BAYES_METHOD = "conjugate"
+BAYES_PRIOR = (1.0, 1.0)
+BAYES_DRAWS = 20_000
+BAYES_SEED = 123
+BAYES_MCMC_DRAWS = 1000
+BAYES_MCMC_TUNE = 1000
+BAYES_MCMC_CHAINS = 4
+BAYES_MCMC_CORES = -1
+BAYES_LIFT_CSV = "bayesian_lift_by_question.csv"
+
+# Commentary prompts are sent concurrently, at most COMMENTARY_CONCURRENCY in flight. Each request
+# times out after COMMENTARY_TIMEOUT seconds; failures (429s included) are retried with exponential
+# backoff and full jitter, starting at COMMENTARY_BACKOFF_BASE and capped at COMMENTARY_BACKOFF_MAX.
+COMMENTARY_CONCURRENCY = 8
+COMMENTARY_TIMEOUT = 60
+COMMENTARY_MAX_RETRIES = 5
+COMMENTARY_BACKOFF_BASE = 1.0
+COMMENTARY_BACKOFF_MAX = 30.0
+COMMENTARY_MODEL = "gpt-4o"
+COMMENTARY_MAX_TOKENS = 2000
+COMMENTARY_TEMPERATURE = 0.7
+
+# The slide deck is assembled client-side and sent in batchUpdate calls of at most
+# SLIDES_BATCH_MAX_REQUESTS requests each. 429s are retried up to SLIDES_MAX_RETRIES times with
+# jittered exponential backoff from SLIDES_RETRY_DELAY seconds.
+SLIDES_BATCH_MAX_REQUESTS = 500
+SLIDES_MAX_RETRIES = 5
+SLIDES_RETRY_DELAY = 5
+
+# Chart PNGs are uploaded to Drive on UPLOAD_MAX_WORKERS threads once they are rendered;
+# permission grants are sent in Drive batch requests (the API allows up to 100 calls per batch).
+UPLOAD_MAX_WORKERS = 8
+DRIVE_BATCH_MAX_CALLS = 100
+
+# Figures are built as chart jobs (a pure draw function plus precomputed data, see brand_lift/charts.py)
+# and rendered under the Agg backend on CHART_WORKERS processes (-1 = all cores, 1 = in-process).
+CHART_WORKERS = -1
+
 from google.colab import userdata
 api_key = userdata.get('OPENAI_API_KEY')
 if not api_key:
@@ -77,19 +232,11 @@ drive_service = build('drive', 'v3', credentials=creds)
 docs_service = build('docs', 'v1', credentials=creds)
 slides_service = build('slides', 'v1', credentials=creds)
 
-sns.set(style="whitegrid")
-plt.rcParams['figure.figsize']=(10,6)
-
-HEADING_FONT = "Sora"
-BODY_FONT = "Work Sans"
-PRIMARY_COLOR = "#333333"
-SECONDARY_COLOR = "#4A5568"
-ACCENT_COLOR = "#00BFFF"
-WHITE_SMOKE = "#F5F5F5"
-FRENCH_GREY = "#D1D5DB"
+apply_style()
 
 def verify_folder_id(folder_id: str):
     try:
+        profiler.count('drive')
         folder = drive_service.files().get(fileId=folder_id, fields='id,name').execute()
         logging.info(f"Verified folder ID {folder_id}: {folder.get('name')}")
     except Exception as e:
@@ -101,17 +248,69 @@ def create_subfolder(folder_name, parent_id):
         'mimeType': 'application/vnd.google-apps.folder',
         'parents': [parent_id]
     }
+    profiler.count('drive')
     folder = drive_service.files().create(body=file_metadata, fields='id').execute()
     return folder.get('id')
 
+def load_columnar(file_path: str) -> pd.DataFrame:
+    """
+    Read step 2's Parquet / Arrow IPC long table. Dictionary-encoded columns come back as
+    pandas categoricals, so each repeated label is stored once rather than copied per row.
+    The load is not zero-copy: Parquet is decoded into memory, and to_pandas copies Arrow's
+    buffers into pandas blocks for both formats. split_blocks keeps that to one copy per column
+    (no consolidation into 2-D blocks) and self_destruct frees each Arrow column once converted,
+    so peak memory stays near one copy of the table rather than two.
+    """
+    if not ARROW_AVAILABLE:
+        raise SystemExit(f"pyarrow is required to load '{file_path}'.")
+    if file_path.lower().endswith('.parquet'):
+        table = pq.read_table(file_path, memory_map=True)
+    else:
+        # Arrow IPC written uncompressed by step 2: buffers are mapped straight from disk.
+        with pa.memory_map(file_path, 'r') as source:
+            table = pa_ipc.open_file(source).read_all()
+    # self_destruct leaves the table unusable, so nothing else may hold a reference to it.
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
 def load_data(file_path: str) -> pd.DataFrame:
     if not os.path.exists(file_path):
         raise SystemExit(f"Data file '{file_path}' not found.")
-    df = pd.read_csv(file_path)
+    if os.path.splitext(file_path)[1].lower() in ('.parquet', '.arrow'):
+        df = load_columnar(file_path)
+    else:
+        df = pd.read_csv(file_path, dtype={'Respondent_ID': str})
     if 'Respondent_ID' not in df.columns or 'Question_ID' not in df.columns:
         raise SystemExit("Data must have 'Respondent_ID' and 'Question_ID'.")
+    # Respondent IDs are labels: keep them as strings (leading zeros included) whatever the file
+    # format, so CSV and columnar inputs give the same dtype, joins and stage cache keys.
+    ids = df['Respondent_ID']
+    if not pd.api.types.is_string_dtype(ids):
+        df['Respondent_ID'] = ids.astype(str).where(ids.notna())
     return df
 
+profiler = RunProfiler(PROFILE_DIR if PROFILE_STAGES else None)
+
+def code_fingerprint() -> str:
+    """
+    Hash of the pipeline code: this script (or, in a notebook, the source of every function and
+    class defined in it) plus the shared brand_lift modules.
+    """
+    h = hashlib.sha256()
+    if "__file__" in globals():
+        h.update(file_hash(__file__).encode('utf-8'))
+    else:
+        for name, obj in sorted(globals().items()):
+            if (inspect.isfunction(obj) or inspect.isclass(obj)) and obj.__module__ == __name__:
+                try:
+                    h.update(inspect.getsource(obj).encode('utf-8'))
+                except (OSError, TypeError):
+                    h.update(name.encode('utf-8'))
+    for path in sorted(glob.glob(os.path.join(CODE_DIR, 'brand_lift', '*.py'))):
+        h.update(file_hash(path).encode('utf-8'))
+    return h.hexdigest()
+
+prompt_cache = PromptCache(PROMPT_CACHE_PATH, PROMPT_CACHE_TTL_DAYS, PROMPT_CACHE_MAX_MB, PROMPT_CACHE_BYPASS)
+
 def load_json(file_path:str):
     if not os.path.exists(file_path):
         raise SystemExit(f"JSON file '{file_path}' not found.")
@@ -159,38 +358,6 @@ def verify_panel_group(df: pd.DataFrame) -> str:
         logging.info(f"Renamed '{panel_group_col}' to 'panel_group'.")
     return 'panel_group'
 
-class DataCleaner:
-    def __init__(self, df: pd.DataFrame, high_missing_threshold: float, exclude_columns=None):
-        self.df=df
-        self.high_missing_threshold=high_missing_threshold
-        self.exclude_columns=exclude_columns if exclude_columns else []
-
-    def drop_high_missing(self):
-        missing_percent=self.df.isnull().sum()/len(self.df)*100
-        high_missing_cols=missing_percent[missing_percent>self.high_missing_threshold].index.tolist()
-        high_missing_cols=[c for c in high_missing_cols if c not in self.exclude_columns]
-        if high_missing_cols:
-            self.df.drop(columns=high_missing_cols,inplace=True)
-            logging.info(f"Dropped columns with high missingness: {high_missing_cols}")
-
-    def create_purchase_binary(self):
-        q2_data=self.df[self.df['Question_ID']=='Q2'].copy()
-        if q2_data.empty:
-            self.df['purchase_binary']=0
-            return
-        q2_data['purchase_binary'] = np.where(q2_data['Response_Code'].str.lower()=='very likely', 1, 0)
-        q2_map=q2_data[['Respondent_ID','purchase_binary']].drop_duplicates()
-        self.df = pd.merge(self.df,q2_map,on='Respondent_ID',how='left')
-        self.df['purchase_binary'] = self.df['purchase_binary'].fillna(0)
-
-    def run(self):
-        logging.info("=== Data Cleaning Stage ===")
-        self.drop_high_missing()
-        self.create_purchase_binary()
-        if len(self.df)==0:
-            raise SystemExit("No data after cleaning.")
-        return self.df
-
 def verify_question_ids(df: pd.DataFrame, kpi_dict: dict):
     unique_qs = df['Question_ID'].unique()
     results=[]
@@ -204,42 +371,78 @@ def verify_question_ids(df: pd.DataFrame, kpi_dict: dict):
     summary_df=pd.DataFrame(results)
     return assigned, summary_df
 
-def plot_kpi_distribution(df:pd.DataFrame, question_id:str, panel_col='panel_group', output_dir=BRAND_LIFT_LOCAL_DIR, prefix=""):
-    subset=df[df['Question_ID']==question_id]
-    if subset.empty:
+def kpi_distribution_job(segment_cube: SegmentCube, question_id:str, output_dir:str, prefix=""):
+    counts = segment_cube.counts_by(['Response_Code', 'panel_group'], where={'Question_ID': [question_id]})
+    if counts.empty:
         return None
-    plt.figure(figsize=(10,6))
-    order = subset['Response_Code'].value_counts().index
-    hue_order = ['Control','Exposed'] if {'Control','Exposed'}.issubset(subset[panel_col].unique()) else None
-    sns.countplot(x='Response_Code', hue=panel_col, data=subset, order=order, palette=[SECONDARY_COLOR, ACCENT_COLOR], hue_order=hue_order)
-    plt.title(f"{question_id} by {panel_col}")
-    plt.xticks(rotation=45,ha='right')
-    plt.tight_layout()
+    order = list(counts.groupby(level='Response_Code').sum().sort_values(ascending=False, kind='stable').index)
+    hue_order = ['Control','Exposed'] if {'Control','Exposed'}.issubset(counts.index.get_level_values('panel_group')) else None
     filename = f"{prefix}_{question_id}_distribution.png"
-    plt.savefig(os.path.join(output_dir,filename))
-    plt.close()
-    return filename
-
-def run_stat_tests(df: pd.DataFrame, kpi_dict:dict):
+    return chart_job(draw_kpi_distribution, os.path.join(output_dir,filename), counts=counts.reset_index(),
+                     question_id=question_id, panel_col='panel_group', order=order, hue_order=hue_order)
+
+def build_contingency_counts(segment_cube: SegmentCube, question_ids):
+    """
+    Panel x response tables for every question, read from the SegmentCube.
+    Returns (question_ids, counts) with counts shaped (questions, panels, max responses per question);
+    a question's responses occupy its first columns and the remaining columns are zero padding.
+    """
+    q_ids = [q for q in dict.fromkeys(question_ids) if q in segment_cube]
+    dense = segment_cube.array(['Question_ID', 'panel_group', 'Response_Code'])
+    dense = dense[segment_cube.labels['Question_ID'].get_indexer(q_ids)]
+    # Move each question's observed responses to the front so the width is the largest per-question count.
+    observed = dense.sum(axis=1) > 0
+    order = np.argsort(~observed, axis=1, kind='stable')
+    width = int(observed.sum(axis=1).max(initial=0))
+    counts = np.take_along_axis(dense, order[:, None, :], axis=2)[:, :, :width]
+    return q_ids, counts
+
+def run_stat_tests(segment_cube: SegmentCube, kpi_dict:dict, permutation=PERMUTATION_TESTS):
     all_questions=[q for v in kpi_dict.values() for q in v]
+    q_ids, counts = build_contingency_counts(segment_cube, all_questions)
+    stats, chi_p, dofs, min_expected = batched_chi_square(counts)
+    # Fisher only for the 2x2 tables whose expected counts are too small for chi-square; the
+    # permutation test covers the other sparse tables (or every other table with "all").
+    shapes = np.stack([(counts.sum(axis=2)>0).sum(axis=1), (counts.sum(axis=1)>0).sum(axis=1)], axis=1)
+    fisher = (min_expected<5) & (shapes==2).all(axis=1)
+    if permutation == "all":
+        permute = ~fisher & (dofs>0)
+    elif permutation == "sparse":
+        permute = ~fisher & (dofs>0) & (min_expected<5)
+    else:
+        permute = np.zeros(len(q_ids), dtype=bool)
+    perm_p, perm_stats = np.full(len(q_ids), np.nan), np.full(len(q_ids), np.nan)
+    if permute.any():
+        start = time.perf_counter()
+        perm_p[permute], used, perm_stats[permute] = permutation_chi_square(
+            counts[permute], max_permutations=PERMUTATION_MAX, chunk=PERMUTATION_CHUNK, max_cells=PERMUTATION_MAX_CELLS,
+            alpha=PERMUTATION_ALPHA, confidence=PERMUTATION_CONFIDENCE, seed=PERMUTATION_SEED)
+        logging.info(f"Permutation tests: {int(permute.sum())} question(s), {int(used.sum())} permuted tables "
+                     f"(max {int(used.max())} per question) in {time.perf_counter()-start:.2f}s")
+
+    batched = {}
+    for i, q_id in enumerate(q_ids):
+        tbl = counts[i]
+        tbl = tbl[tbl.sum(axis=1)>0][:, tbl.sum(axis=0)>0]
+        if tbl.size == 0:
+            continue
+        test_used, stat, p = "Chi-Square", stats[i], chi_p[i]
+        if fisher[i]:
+            odds,p=fisher_exact(tbl)
+            test_used="Fisher"
+        elif permute[i]:
+            # Report the (Yates-free) Pearson statistic the permutation p-value was computed from.
+            test_used, stat, p = "Permutation", perm_stats[i], perm_p[i]
+        batched[q_id] = (test_used, stat, p)
+
     results=[]
     pvals=[]
     for q_id in all_questions:
-        subset=df[df['Question_ID']==q_id]
-        if subset.empty:
-            results.append((q_id,"None",np.nan,np.nan,np.nan))
-            pvals.append(np.nan)
-            continue
-        tbl=pd.crosstab(subset['panel_group'],subset['Response_Code'])
-        if tbl.empty:
+        if q_id not in batched:
             results.append((q_id,"None",np.nan,np.nan,np.nan))
             pvals.append(np.nan)
             continue
-        chi2,p,dof,expected=chi2_contingency(tbl)
-        test_used="Chi-Square"
-        if (expected<5).any() and tbl.shape==(2,2):
-            odds,p=fisher_exact(tbl)
-            test_used="Fisher"
+        test_used, chi2, p = batched[q_id]
         results.append((q_id,test_used,chi2,p,np.nan))
         pvals.append(p)
 
@@ -258,70 +461,93 @@ def run_stat_tests(df: pd.DataFrame, kpi_dict:dict):
     else:
         return results
 
-def advanced_causal_inference(df: pd.DataFrame, bayes_available=True):
-    W = (df['panel_group']=='Exposed').astype(int)
-    Y = df['purchase_binary']
-
-    excluded_cols = ['panel_group','purchase_binary','Respondent_ID','Question_ID','Response_Code','ps','propensity_score']
-    covariates = [c for c in df.columns if c not in excluded_cols]
-
-    if len(covariates)==0:
-        df['dummy_cov']=0.0
-        covariates=['dummy_cov']
-
-    X=df[covariates]
-    if any(X.dtypes=='object') or any(str(dt).startswith('category') for dt in X.dtypes):
-        X=pd.get_dummies(X, drop_first=True)
-    if X.shape[1]==0:
-        X=pd.DataFrame({'dummy_cov': np.zeros(len(df))})
-
-    ps_model = LogisticRegression(solver='lbfgs', max_iter=1000)
-    ps_model.fit(X,W)
-    df['ps'] = ps_model.predict_proba(X)[:,1]
-    ps = df['ps']
-
-    y_model_t1 = RandomForestRegressor(n_estimators=100, random_state=123).fit(X[W==1], Y[W==1])
-    y_model_t0 = RandomForestRegressor(n_estimators=100, random_state=123).fit(X[W==0], Y[W==0])
-    mu1 = y_model_t1.predict(X)
-    mu0 = y_model_t0.predict(X)
-
-    aipw_terms = W*(Y - mu1)/ps - (1-W)*(Y - mu0)/(1-ps) + (mu1 - mu0)
-    ate_aipw = aipw_terms.mean()
-
-    B=500
-    n=len(df)
-    aipw_bs=[]
-    for _ in range(B):
-        idx = np.random.choice(n, n, replace=True)
-        bs_W = W.iloc[idx]
-        bs_Y = Y.iloc[idx]
-        bs_ps = ps.iloc[idx]
-        bs_mu1=mu1[idx]
-        bs_mu0=mu0[idx]
-        bs_aipw = np.mean(bs_W*(bs_Y-bs_mu1)/bs_ps - (1-bs_W)*(bs_Y-bs_mu0)/(1-bs_ps) + (bs_mu1-bs_mu0))
-        aipw_bs.append(bs_aipw)
-    aipw_ci = (np.percentile(aipw_bs,2.5), np.percentile(aipw_bs,97.5))
+def learner_options() -> dict:
+    """make_learner keyword arguments from the SMALL_FOREST_* settings."""
+    return {'trees': SMALL_FOREST_TREES, 'max_samples': SMALL_FOREST_MAX_SAMPLES}
+
+def bayes_options(method=BAYES_METHOD) -> dict:
+    """posterior_lift keyword arguments from the BAYES_* settings."""
+    return {'method': method, 'prior': BAYES_PRIOR, 'draws': BAYES_DRAWS, 'seed': BAYES_SEED,
+            'mcmc': {'draws': BAYES_MCMC_DRAWS, 'tune': BAYES_MCMC_TUNE, 'chains': BAYES_MCMC_CHAINS,
+                     'cores': BAYES_MCMC_CORES}}
+
+def bayesian_lift_by_question(segment_cube: SegmentCube, kpi_dict: dict, method=BAYES_METHOD) -> pd.DataFrame:
+    """Top-box lift posterior for every KPI question, with all questions in one vectorised call."""
+    columns = ['KPI', 'Question_ID', 'control_n', 'exposed_n', 'control_rate', 'exposed_rate',
+               'lift_mean', 'lift_CI_lower', 'lift_CI_upper', 'prob_positive']
+    panels = segment_cube.labels['panel_group'].get_indexer(['Control', 'Exposed'])
+    if (panels < 0).any():
+        return pd.DataFrame(columns=columns)
+    scorer = TopBoxScorer(segment_cube)
+    labels, successes, trials = [], [], []
+    for kpi_name, q_list in kpi_dict.items():
+        flags = scorer.keyword_flags(top_box_keywords(kpi_name))
+        for q_id in q_list:
+            if q_id not in segment_cube:
+                continue
+            table = segment_cube.array(['panel_group', 'Response_Code'], where={'Question_ID': [q_id]})[panels]
+            labels.append((kpi_name, q_id))
+            successes.append(table[:, flags].sum(axis=1))
+            trials.append(table.sum(axis=1))
+    if not labels:
+        return pd.DataFrame(columns=columns)
+    trials = np.array(trials)
+    posterior = posterior_lift(np.array(successes), trials, **bayes_options(method))
+    return pd.DataFrame({'KPI': [k for k, _ in labels], 'Question_ID': [q for _, q in labels],
+                         'control_n': trials[:, 0], 'exposed_n': trials[:, 1], **posterior}, columns=columns)
+
+def advanced_causal_inference(matrix: RespondentMatrix, bayes_available=True, learner=CAUSAL_LEARNER, variance=AIPW_VARIANCE):
+    X, W, Y = matrix.X, matrix.W, matrix.Y
+    logging.info(f"Causal design matrix: {X.shape[0]} respondents x {X.shape[1]} features ({X.nnz} non-zeros), "
+                 f"{learner} outcome models")
+
+    # Column 0 is the headline outcome Y; the rest are the per-KPI top-box outcomes.
+    Y_all = np.column_stack([Y, matrix.outcomes.to_numpy()])
+    ps_values, mu0_all, mu1_all, fit_times = cross_fit_nuisance(X, W, Y_all, folds=CROSS_FIT_FOLDS, n_jobs=NUISANCE_N_JOBS,
+                                                                outcome_names=['Y', *matrix.outcomes.columns], learner=learner,
+                                                                learner_options=learner_options(), profiler=profiler)
+    matrix.ps = ps_values
+
+    ate_all, lower_all, upper_all, aipw_bs_all = aipw_interval(
+        aipw_terms(Y_all, W, ps_values, mu0_all, mu1_all), method=variance, B=BOOTSTRAP_B, seed=BOOTSTRAP_SEED,
+        max_cells=BOOTSTRAP_MAX_CELLS, profiler=profiler)
+
+    mu0, mu1 = mu0_all[:, 0], mu1_all[:, 0]
+    ate_aipw, aipw_ci = ate_all[0], (lower_all[0], upper_all[0])
+    aipw_bs = aipw_bs_all[:, 0] if aipw_bs_all is not None else None
+    kpi_results = pd.DataFrame({
+        'KPI': matrix.outcomes.columns,
+        'control_rate': Y_all[W==0, 1:].mean(axis=0),
+        'exposed_rate': Y_all[W==1, 1:].mean(axis=0),
+        'ATE_AIPW': ate_all[1:],
+        'ATE_AIPW_CI_lower': lower_all[1:],
+        'ATE_AIPW_CI_upper': upper_all[1:],
+        'ATE_T_learner': (mu1_all[:, 1:] - mu0_all[:, 1:]).mean(axis=0),
+        'ATE_AIPW_CI_method': variance,
+    })
 
     ate_t_learner = (mu1 - mu0).mean()
 
+    # X-learner imputed effects reuse the T-learner's mu0/mu1 rather than refitting them.
     po_t = Y[W==1] - mu0[W==1]
     po_c = mu1[W==0] - Y[W==0]
-    x_model_t = RandomForestRegressor(n_estimators=100, random_state=123).fit(X[W==1], po_t)
-    x_model_c = RandomForestRegressor(n_estimators=100, random_state=123).fit(X[W==0], po_c)
-    tau_estimates = np.where(W==1, x_model_c.predict(X), x_model_t.predict(X))
+    with profiler.stage('x_learner'):
+        x_models, x_fit_times = fit_nuisance_models({
+            'x_model_t': (make_learner(learner, 'effect', **learner_options()), X[W==1], po_t),
+            'x_model_c': (make_learner(learner, 'effect', **learner_options()), X[W==0], po_c),
+        }, n_jobs=NUISANCE_N_JOBS)
+    fit_times.update(x_fit_times)
+    tau_estimates = np.where(W==1, x_models['x_model_c'].predict(X), x_models['x_model_t'].predict(X))
     ate_x_learner = tau_estimates.mean()
+    logging.info(f"Nuisance model fit time: {sum(fit_times.values()):.2f}s across {len(fit_times)} models")
 
-    if bayes_available and BAYES_AVAILABLE:
+    if bayes_available:
         try:
-            with pm.Model() as bayes_model:
-                alpha = pm.Normal('alpha',0,5)
-                tau = pm.Normal('tau',0,5)
-                p = pm.math.sigmoid(alpha + tau*W.values)
-                pm.Bernoulli('Y_obs', p, observed=Y.values)
-                trace=pm.sample(500, tune=500, chains=2, cores=1, random_seed=123, return_inferencedata=True)
-            tau_samples=trace.posterior['tau'].values.flatten()
-            bayes_mean=np.mean(tau_samples)
-            bayes_ci=(np.percentile(tau_samples,2.5), np.percentile(tau_samples,97.5))
+            with profiler.stage('bayes'):
+                control, exposed = Y[W==0], Y[W==1]
+                bayes = posterior_lift([[control.sum(), exposed.sum()]], [[len(control), len(exposed)]], **bayes_options())
+            bayes_mean = bayes['lift_mean'][0]
+            bayes_ci = (bayes['lift_CI_lower'][0], bayes['lift_CI_upper'][0])
         except Exception as e:
             warnings.warn(f"Bayesian estimation failed: {e}")
             bayes_mean, bayes_ci = np.nan, (np.nan, np.nan)
@@ -336,70 +562,189 @@ def advanced_causal_inference(df: pd.DataFrame, bayes_available=True):
         'ATE_X_learner': ate_x_learner,
         'Bayes_mean': bayes_mean,
         'Bayes_CI_lower': bayes_ci[0],
-        'Bayes_CI_upper': bayes_ci[1]
+        'Bayes_CI_upper': bayes_ci[1],
+        'ATE_AIPW_CI_method': variance,
     }
 
-    pd.DataFrame([results_dict]).to_csv(os.path.join(BRAND_LIFT_LOCAL_DIR,"causal_inference_results.csv"), index=False)
+    return results_dict, aipw_bs, kpi_results
 
-    return results_dict, aipw_bs
+def save_causal_results(results_dict: dict, out_dir: str, kpi_results: pd.DataFrame = None):
+    pd.DataFrame([results_dict]).to_csv(os.path.join(out_dir,"causal_inference_results.csv"), index=False)
+    if kpi_results is not None and len(kpi_results):
+        kpi_results.to_csv(os.path.join(out_dir, KPI_CAUSAL_CSV), index=False)
 
-def openai_commentary(prompt_instructions: str):
-    system_msg = (
-        "You are a highly skilled marketing strategist with top-level expertise in brand lift studies, "
-        "causal inference, Bayesian methods, and strategic narrative development. "
-        "Use British English, simple vocabulary. Commentary must be succinct yet insightful, focusing on KPIs and campaign goals. "
-        "No mention of platform/creator performance. "
-        "Focus strictly on data-driven results. Avoid repetition."
-    )
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt_instructions}
-                ],
-                max_tokens=2000,
-                temperature=0.7,
-                timeout=60
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            warnings.warn(f"OpenAI API call attempt {attempt+1} failed: {e}")
-            time.sleep(3)
+def prepare_survey_data(survey_file: str, kpi_dict: dict) -> SurveyFrame:
+    df = load_data(survey_file)
+    summarize_data_structure(df)
+    check_missingness(df,HIGH_MISSING_THRESHOLD)
+    verify_panel_group(df)
+    verify_question_ids(df,kpi_dict)
+    cleaner=DataCleaner(df,HIGH_MISSING_THRESHOLD,exclude_columns=EXCLUDE_COLUMNS)
+    cleaner.run()
+    return cleaner.survey
+
+def run_causal_stage(survey: SurveyFrame, kpi_dict: dict):
+    covariate_questions = COVARIATE_QUESTIONS if COVARIATE_QUESTIONS is not None else \
+        [q for q in survey.question_ids if q not in set(q for v in kpi_dict.values() for q in v)]
+    outcomes = {kpi_name: (questions, top_box_keywords(kpi_name)) for kpi_name, questions in kpi_dict.items()} \
+        if CAUSAL_KPI_OUTCOMES else {}
+    with profiler.stage('respondent_matrix'):
+        respondent_matrix = RespondentMatrix(survey, covariate_questions, outcomes=outcomes)
+    results, aipw_bs, kpi_results = advanced_causal_inference(respondent_matrix, bayes_available=True)
+    return results, aipw_bs, respondent_matrix, kpi_results
+
+def render_core_charts(segment_cube: SegmentCube, kpi_dict: dict, results: dict, aipw_bs, respondent_matrix: RespondentMatrix,
+                       campaign_name: str, out_dir: str) -> dict:
+    prefix = campaign_name.replace(' ','_')
+    all_questions = [q for v in kpi_dict.values() for q in v]
+    jobs = []
 
-    # Fallback if all attempts fail
-    fallback_message = (
-        "Unable to generate commentary due to repeated technical issues. "
-        "Please review the results and interpret key metrics manually."
-    )
-    return fallback_message
+    panel_dist_path = f"{prefix}_panel_group_distribution.png"
+    jobs.append(chart_job(draw_panel_distribution, os.path.join(out_dir,panel_dist_path),
+                          panel_counts=segment_cube.counts_by(['panel_group']).sort_values(ascending=False, kind='stable')))
 
-def upload_image_to_drive_and_make_public(image_path: str, folder_id: str):
-    if not os.path.exists(image_path):
-        warnings.warn(f"Image file '{image_path}' not found. Skipping upload.")
-        return None, None
-    file_metadata = {'name': os.path.basename(image_path), 'parents': [folder_id]}
-    try:
-        uploaded = drive_service.files().create(
-            body=file_metadata,
-            media_body=MediaFileUpload(image_path, mimetype='image/png'),
-            fields='id'
-        ).execute()
-        file_id = uploaded.get('id')
-    except Exception as e:
-        warnings.warn(f"Failed to upload image {image_path}: {e}")
-        return None, None
-    permission = {'role': 'reader','type': 'anyone'}
-    try:
-        drive_service.permissions().create(fileId=file_id, body=permission).execute()
-        file_info = drive_service.files().get(fileId=file_id, fields='webContentLink').execute()
-        public_url = file_info.get('webContentLink', None)
-    except Exception as e:
-        warnings.warn(f"Failed to set permission or retrieve URL for {image_path}: {e}")
-        return file_id, None
-    return file_id, public_url
+    q_ids_sorted = sorted(set(all_questions), key=lambda x: int(x.strip('Qq')) if x.strip('Qq').isdigit() else x)
+    kpi_images=[]
+    for q_id in q_ids_sorted:
+        job = kpi_distribution_job(segment_cube, q_id, output_dir=out_dir, prefix=prefix)
+        if job:
+            jobs.append(job)
+            kpi_images.append(os.path.basename(job['path']))
+
+    # Influence-function CIs have no resamples to plot.
+    aipw_dist_path = None
+    if aipw_bs is not None:
+        aipw_dist_path=f"{prefix}_aipw_bootstrap_distribution.png"
+        jobs.append(chart_job(draw_aipw_distribution, os.path.join(out_dir,aipw_dist_path), aipw_bs=np.asarray(aipw_bs)))
+
+    ate_methods = {
+        'AIPW': results['ATE_AIPW'],
+        'T-learner': results['ATE_T_learner'],
+        'X-learner': results['ATE_X_learner']
+    }
+    if not np.isnan(results['Bayes_mean']):
+        ate_methods['Bayes'] = results['Bayes_mean']
+    ate_methods_png=f"{prefix}_ate_methods_comparison.png"
+    jobs.append(chart_job(draw_ate_methods, os.path.join(out_dir, ate_methods_png), ate_methods=ate_methods))
+
+    ps_dist_path=f"{prefix}_ps_distribution.png"
+    jobs.append(chart_job(draw_ps_distribution, os.path.join(out_dir,ps_dist_path),
+                          ps_exposed=respondent_matrix.ps[respondent_matrix.W==1],
+                          ps_control=respondent_matrix.ps[respondent_matrix.W==0]))
+
+    causal_images = [p for p in (aipw_dist_path, ate_methods_png, ps_dist_path) if p]
+
+    q2_counts = segment_cube.counts_by(['panel_group','Response_Code'], where={'Question_ID': ['Q2']})
+    main_kpi_png = None
+    if not q2_counts.empty:
+        q2_counts = q2_counts.unstack()
+        q2_counts = q2_counts.apply(lambda r: r/r.sum()*100,axis=1)
+        main_kpi_png = f"{prefix}_main_kpi_purchase_intent.png"
+        jobs.append(chart_job(draw_main_kpi, os.path.join(out_dir, main_kpi_png), q2_counts=q2_counts))
+        kpi_images.append(main_kpi_png)
+
+    written = {os.path.basename(path) for path in render_charts(jobs, n_workers=CHART_WORKERS, profiler=profiler)}
+    drawn = lambda name: name if name in written else None
+
+    # Charts that failed to render are left out, and listed under 'failed' so the result is not cached.
+    return {
+        'out_dir': out_dir,
+        'panel_dist_path': drawn(panel_dist_path),
+        'kpi_images': [name for name in kpi_images if name in written],
+        'causal_images': [name for name in causal_images if name in written],
+        'main_kpi_png': drawn(main_kpi_png),
+        'failed': [os.path.basename(job['path']) for job in jobs if os.path.basename(job['path']) not in written],
+    }
+
+def core_chart_files(charts: dict):
+    names = [charts['panel_dist_path'], *charts['kpi_images'], *charts['causal_images']]
+    return [os.path.join(charts['out_dir'], name) for name in names if name]
+
+def report_artifacts(kpi_dict: dict, results: dict, significance_map: dict, campaign_name: str,
+                     kpi_results: pd.DataFrame = None) -> list:
+    """
+    Declare the KPI reporting artifacts as (name, artifact) pairs. An artifact is either a chart
+    job or a zero-argument callable; run_artifacts produces each of them exactly once.
+    """
+    prefix = campaign_name.replace(' ','_')
+    aipw_est = results['ATE_AIPW']*100
+    aipw_lower = results['ATE_AIPW_CI_lower']*100
+    aipw_upper = results['ATE_AIPW_CI_upper']*100
+
+    # Each KPI reports its own top-box AIPW lift when the causal stage estimated it, else the headline one.
+    kpi_lift = {} if kpi_results is None else {
+        row.KPI: (row.ATE_AIPW*100, row.ATE_AIPW_CI_lower*100, row.ATE_AIPW_CI_upper*100)
+        for row in kpi_results.itertuples(index=False)
+    }
+
+    # Summarize significance and AIPW estimates for each KPI
+    summary_rows = []
+    for kpi_name, questions in kpi_dict.items():
+        sig_list = [significance_map.get(q,"No data") for q in questions]
+        sig_text = "; ".join([f"{q}:{s}" for q,s in zip(questions, sig_list)])
+        est, lower, upper = kpi_lift.get(kpi_name, (aipw_est, aipw_lower, aipw_upper))
+        summary_rows.append({
+            'KPI': kpi_name,
+            'Questions': ", ".join(questions),
+            'Significance Summary': sig_text,
+            'ATE_AIPW (%)': f"{est:.2f}",
+            'ATE_95%_CI': f"[{lower:.2f}, {upper:.2f}]"
+        })
+    summary_df = pd.DataFrame(summary_rows, columns=['KPI','Questions','Significance Summary','ATE_AIPW (%)','ATE_95%_CI'])
+
+    # ATE with CI chart
+    methods = ['AIPW']
+    estimates = [aipw_est]
+    cis_lower = [aipw_est - aipw_lower]
+    cis_upper = [aipw_upper - aipw_est]
+    if not np.isnan(results['Bayes_mean']):
+        bayes_est = results['Bayes_mean'] * 100
+        methods.append('Bayesian')
+        estimates.append(bayes_est)
+        cis_lower.append(bayes_est - results['Bayes_CI_lower'] * 100)
+        cis_upper.append(results['Bayes_CI_upper'] * 100 - bayes_est)
+
+    def final_results_csv():
+        final_rows = []
+        for kpi_name, questions in kpi_dict.items():
+            sig_details = [f"{q}: {significance_map.get(q, 'No data')}" for q in questions]
+            est, lower, upper = kpi_lift.get(kpi_name, (aipw_est, aipw_lower, aipw_upper))
+            interpretation_note = "Positive lift observed" if est > 0 else "No clear lift"
+            final_rows.append({
+                "KPI": kpi_name,
+                "Associated_Questions": ", ".join(questions),
+                "Significance_Results": "; ".join(sig_details),
+                "ATE_AIPW_(%)": f"{est:.2f}",
+                "CI_95%": f"[{lower:.2f}, {upper:.2f}]",
+                "Interpretation": interpretation_note
+            })
+        final_results_df = pd.DataFrame(final_rows, columns=["KPI","Associated_Questions","Significance_Results","ATE_AIPW_(%)","CI_95%","Interpretation"])
+        final_csv_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{prefix}_final_results_summary.csv")
+        final_results_df.to_csv(final_csv_path, index=False)
+        logging.info(f"Final results CSV generated at: {final_csv_path}")
+        return final_csv_path
+
+    return [
+        ('summary_table', chart_job(draw_summary_table, os.path.join(BRAND_LIFT_LOCAL_DIR, f"{prefix}_aggregate_summary_table.png"),
+                                    summary_df=summary_df)),
+        ('ate_ci_chart', chart_job(draw_ate_ci, os.path.join(BRAND_LIFT_LOCAL_DIR, f"{prefix}_ate_with_ci.png"),
+                                   methods=methods, estimates=estimates, cis_lower=cis_lower, cis_upper=cis_upper)),
+        ('final_results_csv', final_results_csv),
+    ]
+
+COMMENTARY_SYSTEM_MSG = (
+    "You are a highly skilled marketing strategist with top-level expertise in brand lift studies, "
+    "causal inference, Bayesian methods, and strategic narrative development. "
+    "Use British English, simple vocabulary. Commentary must be succinct yet insightful, focusing on KPIs and campaign goals. "
+    "No mention of platform/creator performance. "
+    "Focus strictly on data-driven results. Avoid repetition."
+)
+commentary_generator = CommentaryGenerator(
+    model=COMMENTARY_MODEL, system_msg=COMMENTARY_SYSTEM_MSG, max_tokens=COMMENTARY_MAX_TOKENS,
+    temperature=COMMENTARY_TEMPERATURE, concurrency=COMMENTARY_CONCURRENCY, timeout=COMMENTARY_TIMEOUT,
+    max_retries=COMMENTARY_MAX_RETRIES, backoff_base=COMMENTARY_BACKOFF_BASE, backoff_max=COMMENTARY_BACKOFF_MAX,
+    cache=prompt_cache, profiler=profiler
+)
 
 def create_slides_presentation(title: str, folder_id: str) -> str:
     file_metadata = {
@@ -408,123 +753,12 @@ def create_slides_presentation(title: str, folder_id: str) -> str:
         'parents': [folder_id]
     }
     try:
+        profiler.count('drive')
         presentation = drive_service.files().create(body=file_metadata, fields='id').execute()
         return presentation.get('id')
     except Exception as e:
         raise SystemExit(f"Failed to create Google Slides: {e}")
 
-def create_slide(slides_service, presentation_id):
-    requests = [
-        {'createSlide': {'slideLayoutReference': {'predefinedLayout': 'BLANK'}}}
-    ]
-    response = slides_service.presentations().batchUpdate(
-        presentationId=presentation_id, body={'requests': requests}).execute()
-    slide_id = response['replies'][0]['createSlide']['objectId']
-    return slide_id
-
-def update_text_style(slides_service, presentation_id, object_id, heading=False):
-    font_family = HEADING_FONT if heading else BODY_FONT
-    r, g, b = int(PRIMARY_COLOR[1:3],16)/255.0, int(PRIMARY_COLOR[3:5],16)/255.0, int(PRIMARY_COLOR[5:7],16)/255.0
-    requests = [
-        {
-            'updateTextStyle': {
-                'objectId': object_id,
-                'fields': 'fontFamily,foregroundColor',
-                'style': {
-                    'fontFamily': font_family,
-                    'foregroundColor': {'opaqueColor': {'rgbColor': {'red':r,'green':g,'blue':b}}}
-                }
-            }
-        }
-    ]
-    slides_service.presentations().batchUpdate(
-        presentationId=presentation_id, body={'requests': requests}).execute()
-
-from googleapiclient.errors import HttpError
-
-MAX_RETRIES = 5
-RETRY_DELAY = 5  # seconds delay on retry
-
-def slides_batch_update(slides_service, presentation_id, requests):
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = slides_service.presentations().batchUpdate(
-                presentationId=presentation_id, body={'requests': requests}
-            ).execute()
-            # Add a delay after a successful call to avoid rapid consecutive requests
-            time.sleep(2)
-            return response
-        except HttpError as e:
-            if e.resp.status == 429 and attempt < MAX_RETRIES - 1:
-                # Rate limit exceeded: wait longer and retry
-                print("Rate limit exceeded. Waiting before retry...")
-                time.sleep(RETRY_DELAY * (attempt + 1))
-            else:
-                # If it's not a rate limit error or we've hit max retries, raise the error
-                raise
-
-def add_text_box(slides_service, presentation_id, slide_id, text, x=500000, y=500000, width=6000000, height=2000000, heading=False):
-    text_box_id = 'MyTextBox_' + str(np.random.randint(1000000))
-    requests = [
-        {
-            'createShape': {
-                'objectId': text_box_id,
-                'shapeType': 'TEXT_BOX',
-                'elementProperties': {
-                    'pageObjectId': slide_id,
-                    'size': {
-                        'height': {'magnitude': height, 'unit': 'EMU'},
-                        'width': {'magnitude': width, 'unit': 'EMU'}
-                    },
-                    'transform': {
-                        'scaleX':1,
-                        'scaleY':1,
-                        'translateX':x,
-                        'translateY':y,
-                        'unit':'EMU'
-                    }
-                }
-            }
-        },
-        {
-            'insertText': {
-                'objectId': text_box_id,
-                'insertionIndex':0,
-                'text': text
-            }
-        }
-    ]
-    slides_batch_update(slides_service, presentation_id, requests)
-    update_text_style(slides_service, presentation_id, text_box_id, heading=heading)
-
-def add_image(slides_service, presentation_id, slide_id, image_url, x=1000000, y=1000000, width=4000000, height=3000000):
-    if not image_url:
-        return
-    image_id = "Img_" + str(np.random.randint(1000000))
-    requests = [
-        {
-            'createImage': {
-                'objectId': image_id,
-                'url': image_url,
-                'elementProperties': {
-                    'pageObjectId': slide_id,
-                    'size': {
-                        'height': {'magnitude': height, 'unit': 'EMU'},
-                        'width': {'magnitude': width, 'unit': 'EMU'}
-                    },
-                    'transform': {
-                        'scaleX':1,
-                        'scaleY':1,
-                        'translateX':x,
-                        'translateY':y,
-                        'unit':'EMU'
-                    }
-                }
-            }
-        }
-    ]
-    slides_batch_update(slides_service, presentation_id, requests)
-
 def main():
     logging.info("=== STEP 1: DATA LOADING ===")
     survey_file = os.path.join(DATA_LOCAL_DIR, SURVEY_CSV)
@@ -536,7 +770,6 @@ def main():
         if not os.path.exists(f):
             raise SystemExit(f"Required file '{f}' not found.")
 
-    df = load_data(survey_file)
     code_mapping = load_json(code_map_file)
     kpi_dict,version,last_updated = load_kpi_config(kpi_file)
     campaign_data = load_campaign_json(campaign_file)
@@ -545,15 +778,23 @@ def main():
     brand_context = campaign_data["brand_context"]
     brand_goals = campaign_data["brand_goals"]
 
-    summarize_data_structure(df)
-    check_missingness(df,HIGH_MISSING_THRESHOLD)
-    panel_col = verify_panel_group(df)
-    assigned,summary_df = verify_question_ids(df,kpi_dict)
+    stage_cache = StageCache(STAGE_CACHE_DIR, STAGE_CACHE_MAX_MB, STAGE_CACHE_ENABLED, code_version=code_fingerprint(),
+                             profiler=profiler)
 
     logging.info("=== STEP 2: DATA PREPARATION & ANALYSIS ===")
-    cleaner=DataCleaner(df,HIGH_MISSING_THRESHOLD,exclude_columns=EXCLUDE_COLUMNS)
-    df=cleaner.run()
-    test_results = run_stat_tests(df,kpi_dict)
+    clean_key = stage_cache.key('cleaning', file_hash(survey_file), file_hash(code_map_file), kpi_dict, HIGH_MISSING_THRESHOLD, EXCLUDE_COLUMNS)
+    survey = stage_cache.run('cleaning', clean_key, lambda: prepare_survey_data(survey_file, kpi_dict))
+    df = survey.df
+    mem=survey.memory_usage()
+    logging.info(f"SurveyFrame: {mem['rows']} rows, {mem['questions']} questions, "
+                 f"{mem['data_mb']:.1f} MB data, {mem['index_kb']:.1f} KB question index")
+    cube_key = stage_cache.key('segment_cube', clean_key, SEGMENT_QUESTIONS)
+    segment_cube = stage_cache.run('segment_cube', cube_key, lambda: SegmentCube(survey, SEGMENT_QUESTIONS))
+    logging.info(f"SegmentCube: {len(segment_cube)} non-empty cells over "
+                 f"{' x '.join(f'{d} ({len(segment_cube.labels[d])})' for d in segment_cube.dims)}, {segment_cube.nbytes/1024:.1f} KB")
+    tests_key = stage_cache.key('stat_tests', cube_key, kpi_dict, PERMUTATION_TESTS, PERMUTATION_MAX, PERMUTATION_CHUNK,
+                                PERMUTATION_MAX_CELLS, PERMUTATION_ALPHA, PERMUTATION_CONFIDENCE, PERMUTATION_SEED)
+    test_results = stage_cache.run('stat_tests', tests_key, lambda: run_stat_tests(segment_cube,kpi_dict))
     significance_map = {}
     for (q,tu,st,p,p_c) in test_results:
         if pd.isna(p_c):
@@ -565,7 +806,19 @@ def main():
                 significance_map[q] = "Not significant after correction"
 
     logging.info("=== STEP 3: CAUSAL INFERENCE MODELING ===")
-    results, aipw_bs = advanced_causal_inference(df, bayes_available=True)
+    # Every posterior_lift setting, BAYES_MCMC_CORES included, so no sampler change can reuse a stale entry.
+    bayes_params = (bayes_options(), BAYES_AVAILABLE)
+    causal_key = stage_cache.key('causal', clean_key, kpi_dict, COVARIATE_QUESTIONS, CROSS_FIT_FOLDS,
+                                 AIPW_VARIANCE, BOOTSTRAP_B, BOOTSTRAP_SEED, bayes_params, CAUSAL_KPI_OUTCOMES,
+                                 CAUSAL_LEARNER, SMALL_FOREST_TREES, SMALL_FOREST_MAX_SAMPLES)
+    results, aipw_bs, respondent_matrix, kpi_results = stage_cache.run('causal', causal_key, lambda: run_causal_stage(survey, kpi_dict))
+    save_causal_results(results, BRAND_LIFT_LOCAL_DIR, kpi_results)
+    if len(kpi_results):
+        logging.info("Top-box AIPW lift by KPI:\n" + kpi_results.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    bayes_key = stage_cache.key('bayes_lift', cube_key, kpi_dict, bayes_params)
+    bayes_lift = stage_cache.run('bayes_lift', bayes_key, lambda: bayesian_lift_by_question(segment_cube, kpi_dict))
+    bayes_lift.to_csv(os.path.join(BRAND_LIFT_LOCAL_DIR, BAYES_LIFT_CSV), index=False)
+    logging.info(f"Bayesian top-box lift for {len(bayes_lift)} KPI questions written to {BAYES_LIFT_CSV}")
     all_questions = [q for v in kpi_dict.values() for q in v]
 
     logging.info("=== STEP 4: SUBFOLDER CREATION FOR RESULTS ===")
@@ -573,309 +826,29 @@ def main():
     subfolder_id = create_subfolder(campaign_name, BRAND_LIFT_FOLDER_ID)
 
     logging.info("=== STEP 5: VISUAL OUTPUTS & ARTIFACTS ===")
-    W = (df['panel_group']=='Exposed').astype(int)
-    panel_counts = df['panel_group'].value_counts()
-    plt.figure()
-    panel_counts.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
-    plt.title('Panel Group Distribution')
-    plt.xlabel('Group')
-    plt.ylabel('Count')
-    panel_dist_path = f"{campaign_name.replace(' ','_')}_panel_group_distribution.png"
-    plt.tight_layout()
-    plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR,panel_dist_path))
-    plt.close()
-
-    q_ids_sorted = sorted(set(all_questions), key=lambda x: int(x.strip('Qq')) if x.strip('Qq').isdigit() else x)
-    kpi_images=[]
-    for q_id in q_ids_sorted:
-        imgname = plot_kpi_distribution(df,q_id, panel_col='panel_group', output_dir=BRAND_LIFT_LOCAL_DIR, prefix=campaign_name.replace(' ','_'))
-        if imgname:
-            kpi_images.append(imgname)
-
-    plt.figure()
-    plt.hist(aipw_bs, color='blue', bins=20)
-    plt.title('AIPW Bootstrap Distribution')
-    plt.xlabel('ATE (AIPW)')
-    plt.ylabel('Frequency')
-    aipw_dist_path=f"{campaign_name.replace(' ','_')}_aipw_bootstrap_distribution.png"
-    plt.tight_layout()
-    plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR,aipw_dist_path))
-    plt.close()
-
-    ate_methods = {
-        'AIPW': results['ATE_AIPW'],
-        'T-learner': results['ATE_T_learner'],
-        'X-learner': results['ATE_X_learner']
-    }
-    if not np.isnan(results['Bayes_mean']):
-        ate_methods['Bayes'] = results['Bayes_mean']
-
-    plt.figure()
-    plt.bar(ate_methods.keys(), [v*100 for v in ate_methods.values()], color='steelblue')
-    plt.title("ATE Estimates by Method")
-    plt.ylabel("ATE (percentage points)")
-    ate_methods_png=f"{campaign_name.replace(' ','_')}_ate_methods_comparison.png"
-    plt.tight_layout()
-    plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, ate_methods_png))
-    plt.close()
-
-    plt.figure()
-    plt.hist(df[W==1]['ps'], bins=20, color=ACCENT_COLOR, alpha=0.5, density=True, label='Exposed')
-    plt.hist(df[W==0]['ps'], bins=20, color=SECONDARY_COLOR, alpha=0.5, density=True, label='Control')
-    plt.title('Propensity Score Distribution by Group')
-    plt.legend()
-    ps_dist_path=os.path.join(BRAND_LIFT_LOCAL_DIR,f"{campaign_name.replace(' ','_')}_ps_distribution.png")
-    plt.tight_layout()
-    plt.savefig(ps_dist_path)
-    plt.close()
-
-    causal_images = [os.path.basename(aipw_dist_path), os.path.basename(ate_methods_png), os.path.basename(ps_dist_path)]
-
-    q2_data = df[df['Question_ID']=='Q2']
-    main_kpi_png = None
-    if not q2_data.empty:
-        q2_counts = q2_data.groupby(['panel_group','Response_Code']).size().unstack()
-        q2_counts = q2_counts.apply(lambda r: r/r.sum()*100,axis=1)
-        plt.figure()
-        q2_counts.plot(kind='bar', stacked=True, colormap='viridis')
-        plt.title('Purchase Intent (Q2) Breakdown')
-        plt.ylabel('Percentage')
-        main_kpi_png = f"{campaign_name.replace(' ','_')}_main_kpi_purchase_intent.png"
-        plt.tight_layout()
-        plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, main_kpi_png))
-        plt.close()
-        kpi_images.append(main_kpi_png)
-
-    ###########################################################################
-    # STEP 5.1: Extra Fixes
-    ###########################################################################
-
-    summary_rows = []
-    for kpi_name, questions in kpi_dict.items():
-        sig_list = [significance_map.get(q,"No data") for q in questions]
-        sig_text = "; ".join([f"{q}:{s}" for q,s in zip(questions, sig_list)])
-        ate = results['ATE_AIPW']*100
-        ci_lower = results['ATE_AIPW_CI_lower']*100
-        ci_upper = results['ATE_AIPW_CI_upper']*100
-        summary_rows.append({
-            'KPI': kpi_name,
-            'Questions': ", ".join(questions),
-            'Significance Summary': sig_text,
-            'ATE_AIPW (%)': f"{ate:.2f}",
-            'ATE_95%_CI': f"[{ci_lower:.2f}, {ci_upper:.2f}]"
-        })
-
-    summary_df = pd.DataFrame(summary_rows, columns=['KPI','Questions','Significance Summary','ATE_AIPW (%)','ATE_95%_CI'])
-    fig, ax = plt.subplots(figsize=(15, len(summary_df)*0.6+1))
-    ax.axis('off')
-    table = ax.table(cellText=summary_df.values, colLabels=summary_df.columns, loc='center')
-    table.auto_set_font_size(False)
-    table.set_fontsize(8)
-    table.auto_set_column_width(col=list(range(len(summary_df.columns))))
-    plt.tight_layout()
-    summary_table_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{campaign_name.replace(' ','_')}_aggregate_summary_table.png")
-    plt.savefig(summary_table_path, dpi=300)
-    plt.close()
-
-    total_respondents = df['Respondent_ID'].nunique()
-    control_count = df[df['panel_group']=='Control']['Respondent_ID'].nunique()
-    exposed_count = df[df['panel_group']=='Exposed']['Respondent_ID'].nunique()
-
-    kpi_questions_list = [q for v in kpi_dict.values() for q in v]
-    answered_kpi = df[df['Question_ID'].isin(kpi_questions_list)]['Respondent_ID'].nunique()
-    completion_rate = (answered_kpi / total_respondents)*100 if total_respondents>0 else 0
-    dropped_columns = []
-    dropped_info = ", ".join(dropped_columns) if dropped_columns else "None"
-
-    data_quality_text = f"""
-Data Quality Summary:
-- Total Respondents: {total_respondents}
-- Control Group Count: {control_count}
-- Exposed Group Count: {exposed_count}
-- Completion Rate (answered at least one KPI question): {completion_rate:.2f}%
-- Columns Dropped (high missingness): {dropped_info}
-
-Caveats:
-- Sample sizes vary by KPI question.
-- Results may not fully represent all demographics if some subgroups have low counts.
-- Some responses may be self-reported and subject to recall bias.
-"""
-
-    # CIs slide
-    aipw_est = results['ATE_AIPW'] * 100
-    aipw_lower = results['ATE_AIPW_CI_lower'] * 100
-    aipw_upper = results['ATE_AIPW_CI_upper'] * 100
-
-    methods = ['AIPW']
-    estimates = [aipw_est]
-    cis_lower = [aipw_est - aipw_lower]
-    cis_upper = [aipw_upper - aipw_est]
-
-    if not np.isnan(results['Bayes_mean']):
-        bayes_est = results['Bayes_mean'] * 100
-        bayes_lower = results['Bayes_CI_lower'] * 100
-        bayes_upper = results['Bayes_CI_upper'] * 100
-
-        methods.append('Bayesian')
-        estimates.append(bayes_est)
-        cis_lower.append(bayes_est - bayes_lower)
-        cis_upper.append(bayes_upper - bayes_est)
-
-    plt.figure(figsize=(8,6))
-    x_positions = np.arange(len(methods))
-    plt.bar(x_positions, estimates, yerr=[cis_lower, cis_upper], capsize=5, color='skyblue', edgecolor='black')
-    plt.xticks(x_positions, methods)
-    plt.ylabel("ATE (%)")
-    plt.title("ATE Estimates with 95% Confidence Intervals")
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-
-    ci_image_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{campaign_name.replace(' ','_')}_ate_with_ci.png")
-    plt.savefig(ci_image_path, dpi=300)
-    plt.close()
-
-    f_id, p_url = upload_image_to_drive_and_make_public(ci_image_path, subfolder_id)
-
-    final_rows = []
-    for kpi_name, questions in kpi_dict.items():
-        sig_details = [f"{q}: {significance_map.get(q, 'No data')}" for q in questions]
-        sig_summary = "; ".join(sig_details)
-        aipw_est = results['ATE_AIPW']*100
-        aipw_ci_lower = results['ATE_AIPW_CI_lower']*100
-        aipw_ci_upper = results['ATE_AIPW_CI_upper']*100
-        interpretation_note = "Positive lift observed" if aipw_est > 0 else "No clear lift"
-        final_rows.append({
-            "KPI": kpi_name,
-            "Associated_Questions": ", ".join(questions),
-            "Significance_Results": sig_summary,
-            "ATE_AIPW_(%)": f"{aipw_est:.2f}",
-            "CI_95%": f"[{aipw_ci_lower:.2f}, {aipw_ci_upper:.2f}]",
-            "Interpretation": interpretation_note
-        })
-
-    final_results_df = pd.DataFrame(final_rows, columns=["KPI","Associated_Questions","Significance_Results","ATE_AIPW_(%)","CI_95%","Interpretation"])
-    final_csv_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{campaign_name.replace(' ','_')}_final_results_summary.csv")
-    final_results_df.to_csv(final_csv_path, index=False)
-    logging.info(f"Final results CSV generated at: {final_csv_path}")
-
-    ###########################################################################
-    # STEP 5.2: ADDITIONAL DETAILED GRAPHS (with skipping Sankey if needed)
-    ###########################################################################
+    charts_key = stage_cache.key('charts', causal_key, cube_key, campaign_name, BRAND_LIFT_LOCAL_DIR)
+    charts = stage_cache.run(
+        'charts', charts_key,
+        lambda: render_core_charts(segment_cube, kpi_dict, results, aipw_bs, respondent_matrix, campaign_name, BRAND_LIFT_LOCAL_DIR),
+        files=core_chart_files,
+        cacheable=lambda charts: not charts['failed'],
+    )
+    panel_dist_path = charts['panel_dist_path']
+    kpi_images = list(charts['kpi_images'])
+    causal_images = charts['causal_images']
+    main_kpi_png = charts['main_kpi_png']
 
-    logging.info("=== STEP 5.2: CREATING ADDITIONAL DETAILED GRAPHS ===")
+    logging.info("=== STEP 5.0: IMAGE UPLOAD ===")
+    uploader = ImageUploader(subfolder_id, lambda: build('drive', 'v3', credentials=creds), max_workers=UPLOAD_MAX_WORKERS,
+                             batch_max_calls=DRIVE_BATCH_MAX_CALLS, profiler=profiler)
+    image_urls = uploader.upload(core_chart_files(charts))
 
     ###########################################################################
-    # STEP 5.1: Extra Fixes and Summaries (AFTER all basic graphs and results)
+    # STEP 5.1: REPORT ARTIFACTS (summary table, CI chart, final results CSV)
     ###########################################################################
 
-    # Summarize significance and AIPW estimates for each KPI
-    summary_rows = []
-    for kpi_name, questions in kpi_dict.items():
-        sig_list = [significance_map.get(q,"No data") for q in questions]
-        sig_text = "; ".join([f"{q}:{s}" for q,s in zip(questions, sig_list)])
-        ate = results['ATE_AIPW']*100
-        ci_lower = results['ATE_AIPW_CI_lower']*100
-        ci_upper = results['ATE_AIPW_CI_upper']*100
-        summary_rows.append({
-            'KPI': kpi_name,
-            'Questions': ", ".join(questions),
-            'Significance Summary': sig_text,
-            'ATE_AIPW (%)': f"{ate:.2f}",
-            'ATE_95%_CI': f"[{ci_lower:.2f}, {ci_upper:.2f}]"
-        })
-
-    summary_df = pd.DataFrame(summary_rows, columns=['KPI','Questions','Significance Summary','ATE_AIPW (%)','ATE_95%_CI'])
-    fig, ax = plt.subplots(figsize=(15, len(summary_df)*0.6+1))
-    ax.axis('off')
-    table = ax.table(cellText=summary_df.values, colLabels=summary_df.columns, loc='center')
-    table.auto_set_font_size(False)
-    table.set_fontsize(8)
-    table.auto_set_column_width(col=list(range(len(summary_df.columns))))
-    plt.tight_layout()
-    summary_table_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{campaign_name.replace(' ','_')}_aggregate_summary_table.png")
-    plt.savefig(summary_table_path, dpi=300)
-    plt.close()
-
-    total_respondents = df['Respondent_ID'].nunique()
-    control_count = df[df['panel_group']=='Control']['Respondent_ID'].nunique()
-    exposed_count = df[df['panel_group']=='Exposed']['Respondent_ID'].nunique()
-
-    kpi_questions_list = [q for v in kpi_dict.values() for q in v]
-    answered_kpi = df[df['Question_ID'].isin(kpi_questions_list)]['Respondent_ID'].nunique()
-    completion_rate = (answered_kpi / total_respondents)*100 if total_respondents>0 else 0
-    dropped_columns = []
-    dropped_info = ", ".join(dropped_columns) if dropped_columns else "None"
-
-    data_quality_text = f"""
-Data Quality Summary:
-- Total Respondents: {total_respondents}
-- Control Group Count: {control_count}
-- Exposed Group Count: {exposed_count}
-- Completion Rate (answered at least one KPI question): {completion_rate:.2f}%
-- Columns Dropped (high missingness): {dropped_info}
-
-Caveats:
-- Sample sizes vary by KPI question.
-- Results may not fully represent all demographics if some subgroups have low counts.
-- Some responses may be self-reported and subject to recall bias.
-"""
-
-    # Create and save an ATE with CI chart
-    aipw_est = results['ATE_AIPW'] * 100
-    aipw_lower = results['ATE_AIPW_CI_lower'] * 100
-    aipw_upper = results['ATE_AIPW_CI_upper'] * 100
-
-    methods = ['AIPW']
-    estimates = [aipw_est]
-    cis_lower = [aipw_est - aipw_lower]
-    cis_upper = [aipw_upper - aipw_est]
-
-    if not np.isnan(results['Bayes_mean']):
-        bayes_est = results['Bayes_mean'] * 100
-        bayes_lower = results['Bayes_CI_lower'] * 100
-        bayes_upper = results['Bayes_CI_upper'] * 100
-
-        methods.append('Bayesian')
-        estimates.append(bayes_est)
-        cis_lower.append(bayes_est - bayes_lower)
-        cis_upper.append(bayes_upper - bayes_est)
-
-    plt.figure(figsize=(8,6))
-    x_positions = np.arange(len(methods))
-    plt.bar(x_positions, estimates, yerr=[cis_lower, cis_upper], capsize=5, color='skyblue', edgecolor='black')
-    plt.xticks(x_positions, methods)
-    plt.ylabel("ATE (%)")
-    plt.title("ATE Estimates with 95% Confidence Intervals")
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-
-    ci_image_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{campaign_name.replace(' ','_')}_ate_with_ci.png")
-    plt.savefig(ci_image_path, dpi=300)
-    plt.close()
-
-    f_id, p_url = upload_image_to_drive_and_make_public(ci_image_path, subfolder_id)
-
-    final_rows = []
-    for kpi_name, questions in kpi_dict.items():
-        sig_details = [f"{q}: {significance_map.get(q, 'No data')}" for q in questions]
-        sig_summary = "; ".join(sig_details)
-        aipw_est = results['ATE_AIPW']*100
-        aipw_ci_lower = results['ATE_AIPW_CI_lower']*100
-        aipw_ci_upper = results['ATE_AIPW_CI_upper']*100
-        interpretation_note = "Positive lift observed" if aipw_est > 0 else "No clear lift"
-        final_rows.append({
-            "KPI": kpi_name,
-            "Associated_Questions": ", ".join(questions),
-            "Significance_Results": sig_summary,
-            "ATE_AIPW_(%)": f"{aipw_est:.2f}",
-            "CI_95%": f"[{aipw_ci_lower:.2f}, {aipw_ci_upper:.2f}]",
-            "Interpretation": interpretation_note
-        })
-
-    final_results_df = pd.DataFrame(final_rows, columns=["KPI","Associated_Questions","Significance_Results","ATE_AIPW_(%)","CI_95%","Interpretation"])
-    final_csv_path = os.path.join(BRAND_LIFT_LOCAL_DIR, f"{campaign_name.replace(' ','_')}_final_results_summary.csv")
-    final_results_df.to_csv(final_csv_path, index=False)
-    logging.info(f"Final results CSV generated at: {final_csv_path}")
+    # Artifacts are declared here and in STEP 5.2, then each is produced once at the end of STEP 5.
+    artifacts = report_artifacts(kpi_dict, results, significance_map, campaign_name, kpi_results)
 
     ###########################################################################
     # STEP 5.2: ADDITIONAL DETAILED GRAPHS USING KPI_EXPLANATION.CSV
@@ -908,174 +881,54 @@ Caveats:
     mid_kpi_questions = kpi_dict.get(mid_kpi_name, [])
     bottom_kpi_questions = kpi_dict.get(bottom_kpi_name, [])
 
-    def get_top_box_keywords(kpi_name: str):
-        """Determine top-box keywords based on KPI name patterns."""
-        if kpi_name is None:
-            return ['yes','very','likely']
-        kpi_name_lower = kpi_name.lower()
-        if 'aware' in kpi_name_lower or 'recall' in kpi_name_lower:
-            return ['aware','yes','recall','very aware','very']
-        elif 'consider' in kpi_name_lower or 'intent' in kpi_name_lower:
-            return ['very likely','likely','somewhat likely']
-        elif 'preference' in kpi_name_lower or 'association' in kpi_name_lower:
-            return ['yes','very','prefer','associate','likely']
-        else:
-            # fallback
-            return ['yes','very','likely']
-
-    def calculate_top_box(df, questions, kpi_name):
-        """Calculate top-box percentages for a given KPI and its questions."""
-        if not questions:
-            return None
-        subset = df[df['Question_ID'].isin(questions)].copy()
-        if subset.empty:
-            return None
-        keywords = get_top_box_keywords(kpi_name)
-        subset['top_box'] = subset['Response_Code'].str.lower().apply(
-            lambda x: 1 if any(kw in x for kw in keywords) else 0
-        )
-        grouped = subset.groupby(['panel_group'])['top_box'].mean()*100
-        return grouped.to_dict()
-
-    top_box_top = calculate_top_box(df, top_kpi_questions, top_kpi_name) if top_kpi_name else None
-    top_box_mid = calculate_top_box(df, mid_kpi_questions, mid_kpi_name) if mid_kpi_name else None
-    top_box_bottom = calculate_top_box(df, bottom_kpi_questions, bottom_kpi_name) if bottom_kpi_name else None
+    # All funnel, segment and Sankey top-box rates are scored from the SegmentCube in one go.
+    top_box_cube = TopBoxScorer(segment_cube).cube({
+        **{kpi_name: (kpi_dict.get(kpi_name, []), top_box_keywords(kpi_name))
+           for kpi_name in dict.fromkeys([top_kpi_name, mid_kpi_name, bottom_kpi_name]) if kpi_name},
+        'sankey_aware': (top_kpi_questions, ['very aware']),
+        'sankey_consider': (mid_kpi_questions, ['very likely']),
+        'sankey_purchase': (bottom_kpi_questions, ['very likely']),
+    }, segments=[s for s in ('Age', 'Gender') if s in segment_cube.segments])
+    top_box_rates = TopBoxScorer.rates(top_box_cube, ['score', 'panel_group']).unstack('panel_group')
 
     funnel_data = pd.DataFrame({
-        top_kpi_name if top_kpi_name else 'KPI1': top_box_top if top_box_top else {'Control':0,'Exposed':0},
-        mid_kpi_name if mid_kpi_name else 'KPI2': top_box_mid if top_box_mid else {'Control':0,'Exposed':0},
-        bottom_kpi_name if bottom_kpi_name else 'KPI3': top_box_bottom if top_box_bottom else {'Control':0,'Exposed':0}
+        kpi_name if kpi_name else placeholder:
+            top_box_rates.loc[kpi_name].dropna().to_dict() if kpi_name in top_box_rates.index else {'Control':0,'Exposed':0}
+        for kpi_name, placeholder in [(top_kpi_name, 'KPI1'), (mid_kpi_name, 'KPI2'), (bottom_kpi_name, 'KPI3')]
     }).T
 
-    plt.figure(figsize=(10,6))
-    funnel_data.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
-    plt.title('Comparison of Selected KPIs by Funnel Stage (Control vs Exposed)')
-    plt.xlabel('KPI')
-    plt.ylabel('Top-Box Percentage')
-    plt.xticks(rotation=0)
-    plt.legend(title='Panel Group')
-    plt.tight_layout()
     all_kpis_graph_path = f"{campaign_name.replace(' ','_')}_all_kpis_comparison.png"
-    plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, all_kpis_graph_path))
-    plt.close('all')
-
-    q9_data = df[df['Question_ID']=='Q9'][['Respondent_ID','Response_Code']].rename(columns={'Response_Code':'Age'})
-    q10_data = df[df['Question_ID']=='Q10'][['Respondent_ID','Response_Code']].rename(columns={'Response_Code':'Gender'})
-
-    if top_kpi_name and top_kpi_questions:
-        top_kpi_sub = df[df['Question_ID'].isin(top_kpi_questions)].copy()
-        if not top_kpi_sub.empty:
-            top_keywords = get_top_box_keywords(top_kpi_name)
-            top_kpi_sub['top_box'] = top_kpi_sub['Response_Code'].str.lower().apply(
-                lambda x: 1 if any(kw in x for kw in top_keywords) else 0
-            )
-            demo_merged = pd.merge(top_kpi_sub[['Respondent_ID','top_box','panel_group']], q9_data, on='Respondent_ID', how='left')
-            demo_merged = pd.merge(demo_merged, q10_data, on='Respondent_ID', how='left')
-
-            # By Age
-            if 'Age' in demo_merged.columns and 'panel_group' in demo_merged.columns:
-                age_awareness = demo_merged.groupby(['Age','panel_group'])['top_box'].mean()*100
-                age_awareness = age_awareness.unstack('panel_group').fillna(0)
-                plt.figure(figsize=(10,6))
-                age_awareness.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
-                plt.title(f'{top_kpi_name} by Age (Control vs Exposed)')
-                plt.xlabel('Age Range')
-                plt.ylabel('Top-Box Percentage')
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                age_path = f"{campaign_name.replace(' ','_')}_{top_kpi_name.lower().replace(' ','_')}_by_age.png"
-                plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, age_path))
-                plt.close('all')
-
-            # By Gender
-            if 'Gender' in demo_merged.columns and 'panel_group' in demo_merged.columns:
-                gender_awareness = demo_merged.groupby(['Gender','panel_group'])['top_box'].mean()*100
-                gender_awareness = gender_awareness.unstack('panel_group').fillna(0)
-                plt.figure(figsize=(10,6))
-                gender_awareness.plot(kind='bar', color=[SECONDARY_COLOR,ACCENT_COLOR])
-                plt.title(f'{top_kpi_name} by Gender (Control vs Exposed)')
-                plt.xlabel('Gender')
-                plt.ylabel('Top-Box Percentage')
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                gender_path = f"{campaign_name.replace(' ','_')}_{top_kpi_name.lower().replace(' ','_')}_by_gender.png"
-                plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, gender_path))
-                plt.close('all')
-
-    # Before creating the Sankey diagram, define the control_aware, control_consider, control_purchase,
-    # exposed_aware, exposed_consider, exposed_purchase if they haven't been defined yet.
-    def get_top_box_count(panel, q_list, pos_keyword='very'):
-        if not q_list:
-            return 0
-        sub = df[(df['panel_group']==panel)&(df['Question_ID'].isin(q_list))]
-        if sub.empty:
-            return 0
-        return (sub['Response_Code'].str.lower().str.contains(pos_keyword)).mean()*100
-
-    control_aware = get_top_box_count('Control', top_kpi_questions, 'very aware') if top_kpi_questions else 0
-    control_consider = get_top_box_count('Control', mid_kpi_questions, 'very likely') if mid_kpi_questions else 0
-    control_purchase = get_top_box_count('Control', bottom_kpi_questions, 'very likely') if bottom_kpi_questions else 0
-    exposed_aware = get_top_box_count('Exposed', top_kpi_questions, 'very aware') if top_kpi_questions else 0
-    exposed_consider = get_top_box_count('Exposed', mid_kpi_questions, 'very likely') if mid_kpi_questions else 0
-    exposed_purchase = get_top_box_count('Exposed', bottom_kpi_questions, 'very likely') if bottom_kpi_questions else 0
-
-    from matplotlib.sankey import Sankey
-    epsilon = 0.1
-    flows = [control_aware, control_consider, control_purchase, exposed_aware, exposed_consider, exposed_purchase]
+    artifacts.append(('funnel_comparison', chart_job(draw_funnel_comparison, os.path.join(BRAND_LIFT_LOCAL_DIR, all_kpis_graph_path), funnel_data=funnel_data)))
+
+    if top_kpi_name and top_kpi_questions and top_kpi_name in top_box_rates.index:
+        top_kpi_cube = top_box_cube.xs(top_kpi_name, level='score')
+        for segment, xlabel in [('Age', 'Age Range'), ('Gender', 'Gender')]:
+            if segment not in segment_cube.segments:
+                continue
+            segment_top_box = TopBoxScorer.rates(top_kpi_cube, [segment, 'panel_group']).unstack('panel_group').fillna(0)
+            if segment_top_box.empty:
+                continue
+            segment_path = f"{campaign_name.replace(' ','_')}_{top_kpi_name.lower().replace(' ','_')}_by_{segment.lower()}.png"
+            artifacts.append((f'top_box_by_{segment.lower()}', chart_job(draw_top_box_by_segment, os.path.join(BRAND_LIFT_LOCAL_DIR, segment_path),
+                                         top_box=segment_top_box, kpi_name=top_kpi_name, segment=segment, xlabel=xlabel)))
+
+    # Sankey flows: share of "very aware" / "very likely" answers per funnel stage and panel.
+    sankey_stages = ['sankey_aware', 'sankey_consider', 'sankey_purchase']
+    sankey_rates = top_box_rates.reindex(index=sankey_stages, columns=['Control', 'Exposed']).fillna(0)
+    flows = [sankey_rates.at[stage, panel] for panel in ('Control', 'Exposed') for stage in sankey_stages]
 
     if any(f <= 0 for f in flows):
         print("Insufficient data for Sankey diagram, skipping...")
     else:
-        try:
-            plt.figure(figsize=(10,8))
-            sankey = Sankey(unit=None, gap=0.5, scale=1.0)
-            sankey.add(flows=[100, -control_aware],
-                       labels=['Control Start','Aware'],
-                       orientations=[0,0],
-                       trunklength=1.0)
-            sankey.add(flows=[control_aware, -control_consider],
-                       labels=[None,'Consider'],
-                       orientations=[0,0],
-                       prior=0, connect=(1,0))
-            sankey.add(flows=[control_consider, -control_purchase],
-                       labels=[None,'Purchase'],
-                       orientations=[0,0],
-                       prior=1, connect=(1,0))
-
-            sankey.add(flows=[100, -exposed_aware],
-                       labels=['Exposed Start','Aware'],
-                       orientations=[0,0],
-                       trunklength=1.0, dx=2)
-            sankey.add(flows=[exposed_aware, -exposed_consider],
-                       labels=[None,'Consider'],
-                       orientations=[0,0],
-                       prior=3, connect=(1,0))
-            sankey.add(flows=[exposed_consider, -exposed_purchase],
-                       labels=[None,'Purchase'],
-                       orientations=[0,0],
-                       prior=4, connect=(1,0))
-
-            sankey.finish()
-            plt.title('Vertical Sankey Funnel Diagram (Control vs Exposed)')
-            sankey_path = f"{campaign_name.replace(' ','_')}_vertical_sankey_funnel.png"
-            plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, sankey_path))
-        except ValueError as e:
-            warnings.warn(f"Sankey diagram could not be drawn: {e}")
-        plt.close('all')
-
-    plt.figure(figsize=(10,6))
-    funnel_data[['Control','Exposed']].plot(marker='o')
-    plt.title('Comparison of KPI Metrics Across the Funnel Stages')
-    plt.xlabel('Funnel Stage')
-    plt.ylabel('Top-Box Percentage')
-    plt.xticks(rotation=0)
-    plt.grid(True)
-    plt.tight_layout()
-    funnel_line_path = f"{campaign_name.replace(' ','_')}_funnel_line_comparison.png"
-    plt.savefig(os.path.join(BRAND_LIFT_LOCAL_DIR, funnel_line_path))
-    plt.close('all')
+        sankey_path = f"{campaign_name.replace(' ','_')}_vertical_sankey_funnel.png"
+        artifacts.append(('sankey_funnel', chart_job(draw_sankey_funnel, os.path.join(BRAND_LIFT_LOCAL_DIR, sankey_path), flows=flows)))
 
+    funnel_line_path = f"{campaign_name.replace(' ','_')}_funnel_line_comparison.png"
+    artifacts.append(('funnel_line', chart_job(draw_funnel_line, os.path.join(BRAND_LIFT_LOCAL_DIR, funnel_line_path), funnel_data=funnel_data)))
 
+    logging.info("=== STEP 5.3: PRODUCING REPORT ARTIFACTS ===")
+    artifact_outputs = run_artifacts(artifacts, n_workers=CHART_WORKERS, profiler=profiler)
+    image_urls.update(uploader.upload([artifact_outputs['ate_ci_chart']]))
 
     ###########################################################################
     # STEP 6: COMMENTARY & NARRATIVE GENERATION (unchanged)
@@ -1083,7 +936,9 @@ Caveats:
 
     logging.info("=== STEP 6: COMMENTARY & NARRATIVE GENERATION ===")
 
-    # We create commentary with deeper prompts referencing KPIs and brand goals:
+    # We create commentary with deeper prompts referencing KPIs and brand goals.
+    # Prompts are collected first and generated together as one cacheable stage.
+    commentary_prompts = {}
 
     # Overarching commentary (global_commentary)
     global_prompt = f"""
@@ -1093,7 +948,7 @@ Reference causal results simply, showing the campaign's net effect.
 No platform/creator detail.
 Succinct, data-driven.
 """
-    global_commentary = openai_commentary(global_prompt)
+    commentary_prompts['global'] = global_prompt
 
     # Panel explanation (panel_comment)
     panel_prompt = f"""
@@ -1103,11 +958,10 @@ Stress that Exposed group saw the ad, Control did not.
 No platform/creator detail.
 Succinct.
 """
-    panel_comment = openai_commentary(panel_prompt)
+    commentary_prompts['panel'] = panel_prompt
 
     # Question-level commentary focusing on KPIs (question_commentaries)
     # For each KPI, we summarise rather than each question. We have KPI dict, so let's produce commentary per KPI:
-    kpi_focus_commentaries = {}
     for kpi_name, q_list in kpi_dict.items():
         # Summarise significance and direction:
         kpi_significance = []
@@ -1126,7 +980,7 @@ Suggest improvement.
 No platform/creator detail.
 Very succinct, insightful.
 """
-        kpi_focus_commentaries[kpi_name] = openai_commentary(q_prompt)
+        commentary_prompts[f'kpi:{kpi_name}'] = q_prompt
 
     # Causal commentary
     causal_prompt = """
@@ -1137,7 +991,7 @@ One strategic hint from these methods.
 No platform/creator detail.
 Succinct.
 """
-    causal_comment = openai_commentary(causal_prompt)
+    commentary_prompts['causal'] = causal_prompt
 
     # Limitations commentary
     limitations_prompt = """
@@ -1147,7 +1001,7 @@ Suggest improved future measurement.
 No platform/creator detail.
 Succinct.
 """
-    limitations_comment = openai_commentary(limitations_prompt)
+    commentary_prompts['limitations'] = limitations_prompt
 
     # Section-specific commentaries:
 
@@ -1160,7 +1014,7 @@ Set stage for why brand lift matters.
 No platform/creator detail.
 Simple, succinct.
 """
-    background_comment = openai_commentary(background_prompt)
+    commentary_prompts['background'] = background_prompt
 
     # 2. Methodology
     methodology_prompt = """
@@ -1171,7 +1025,7 @@ How this isolates true impact.
 No platform/creator detail.
 Succinct.
 """
-    methodology_comment = openai_commentary(methodology_prompt)
+    commentary_prompts['methodology'] = methodology_prompt
 
     # 3. Executive Summary
     exec_summary_prompt = """
@@ -1182,7 +1036,7 @@ Causal methods confirm effect.
 No platform/creator detail.
 Succinct.
 """
-    exec_summary_comment = openai_commentary(exec_summary_prompt)
+    commentary_prompts['exec_summary'] = exec_summary_prompt
 
     # 4. Study Objectives
     study_obj_prompt = """
@@ -1192,7 +1046,7 @@ Understand if campaign shifts brand perceptions.
 No platform/creator detail.
 Succinct.
 """
-    study_obj_comment = openai_commentary(study_obj_prompt)
+    commentary_prompts['study_objectives'] = study_obj_prompt
 
     # 5. Campaign Impact
     campaign_impact_prompt = """
@@ -1202,7 +1056,7 @@ Demographics: highlight key segments reacting better.
 No platform/creator detail.
 Succinct, data-driven.
 """
-    campaign_impact_comment = openai_commentary(campaign_impact_prompt)
+    commentary_prompts['campaign_impact'] = campaign_impact_prompt
 
     # 6. Additional Analysis: Driving ROI
     driving_roi_prompt = """
@@ -1212,7 +1066,7 @@ Suggest refining messaging to capture competitor share.
 No platform/creator detail.
 Succinct.
 """
-    driving_roi_comment = openai_commentary(driving_roi_prompt)
+    commentary_prompts['driving_roi'] = driving_roi_prompt
 
     # 7. Insights and Recommendations
     insights_reco_prompt = """
@@ -1223,7 +1077,7 @@ Future tests: more granular measurement.
 No platform/creator detail.
 Succinct, actionable.
 """
-    insights_reco_comment = openai_commentary(insights_reco_prompt)
+    commentary_prompts['insights_recommendations'] = insights_reco_prompt
 
     # 8. Appendix
     appendix_prompt = """
@@ -1232,7 +1086,7 @@ Glossary, KPI definitions, question list, extra charts.
 No platform/creator detail.
 Succinct reference note.
 """
-    appendix_comment = openai_commentary(appendix_prompt)
+    commentary_prompts['appendix'] = appendix_prompt
 
     # Extra "deep dive summary" as if Rory Steadman had reviewed it
     rory_prompt = f"""
@@ -1243,54 +1097,75 @@ Highlight subtle insights from causal analysis.
 No platform/creator detail.
 Simple, insightful.
 """
-    rory_comment = openai_commentary(rory_prompt)
+    commentary_prompts['rory'] = rory_prompt
+
+    commentary_key = stage_cache.key('commentary', commentary_prompts, COMMENTARY_MODEL, COMMENTARY_MAX_TOKENS, COMMENTARY_TEMPERATURE)
+    # A fallback text means the API call failed; leave it uncached so the next run retries it.
+    commentaries = stage_cache.run('commentary', commentary_key, lambda: commentary_generator.generate(commentary_prompts),
+                                   cacheable=lambda texts: COMMENTARY_FALLBACK not in texts.values())
+    global_commentary = commentaries['global']
+    panel_comment = commentaries['panel']
+    kpi_focus_commentaries = {kpi_name: commentaries[f'kpi:{kpi_name}'] for kpi_name in kpi_dict}
+    causal_comment = commentaries['causal']
+    limitations_comment = commentaries['limitations']
+    background_comment = commentaries['background']
+    methodology_comment = commentaries['methodology']
+    exec_summary_comment = commentaries['exec_summary']
+    study_obj_comment = commentaries['study_objectives']
+    campaign_impact_comment = commentaries['campaign_impact']
+    driving_roi_comment = commentaries['driving_roi']
+    insights_reco_comment = commentaries['insights_recommendations']
+    appendix_comment = commentaries['appendix']
+    rory_comment = commentaries['rory']
 
     # === GOOGLE SLIDES CREATION (30 slides) ===
     logging.info("=== STEP 7: GOOGLE SLIDES PRESENTATION CREATION ===")
     presentation_title = f"{campaign_name} - Brand Lift Study"
     presentation_id = create_slides_presentation(presentation_title, subfolder_id)
+    deck = DeckBuilder(slides_service, presentation_id, max_requests=SLIDES_BATCH_MAX_REQUESTS,
+                       max_retries=SLIDES_MAX_RETRIES, retry_delay=SLIDES_RETRY_DELAY, profiler=profiler)
 
     # We'll create multiple slides per section to reach ~30 slides total.
     # Title Slide (1)
-    title_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, title_slide_id, f"{campaign_name}\nBrand Lift Study Results", x=1000000, y=1000000, width=6000000, height=2000000, heading=True)
+    title_slide_id = deck.add_slide()
+    deck.add_text_box(title_slide_id, f"{campaign_name}\nBrand Lift Study Results", x=1000000, y=1000000, width=6000000, height=2000000, heading=True)
 
     # 1. Background (2 slides)
     # Slide 1: background_comment
-    background_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, background_slide_id, background_comment, x=500000, y=500000, width=7000000, height=3000000)
+    background_slide_id = deck.add_slide()
+    deck.add_text_box(background_slide_id, background_comment, x=500000, y=500000, width=7000000, height=3000000)
 
     # Additional background slide with brand goals
-    background_slide_2 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, background_slide_2, f"Brand Goals:\n{brand_goals}", x=500000, y=500000, width=7000000, height=3000000)
+    background_slide_2 = deck.add_slide()
+    deck.add_text_box(background_slide_2, f"Brand Goals:\n{brand_goals}", x=500000, y=500000, width=7000000, height=3000000)
 
     # 2. Methodology (3 slides)
-    methodology_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, methodology_slide_id, methodology_comment, x=500000, y=500000, width=7000000, height=3000000)
+    methodology_slide_id = deck.add_slide()
+    deck.add_text_box(methodology_slide_id, methodology_comment, x=500000, y=500000, width=7000000, height=3000000)
     # Add panel distribution image for clarity (Slide 2)
-    panel_img_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, panel_img_slide_id, "Control vs Exposed Group Distribution", x=500000, y=200000, width=7000000, height=3000000)
-    f_id, p_url = upload_image_to_drive_and_make_public(os.path.join(BRAND_LIFT_LOCAL_DIR, panel_dist_path), subfolder_id)
+    panel_img_slide_id = deck.add_slide()
+    deck.add_text_box(panel_img_slide_id, "Control vs Exposed Group Distribution", x=500000, y=200000, width=7000000, height=3000000)
+    p_url = image_urls.get(os.path.join(BRAND_LIFT_LOCAL_DIR, panel_dist_path)) if panel_dist_path else None
     if p_url:
-        add_image(slides_service, presentation_id, panel_img_slide_id, p_url, x=1000000, y=1000000, width=4000000, height=3000000)
+        deck.add_image(panel_img_slide_id, p_url, x=1000000, y=1000000, width=4000000, height=3000000)
     # Slide 3 for Methodology: panel_comment
-    panel_method_slide = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, panel_method_slide, panel_comment, x=500000, y=500000, width=7000000, height=3000000)
+    panel_method_slide = deck.add_slide()
+    deck.add_text_box(panel_method_slide, panel_comment, x=500000, y=500000, width=7000000, height=3000000)
 
     # 3. Executive Summary (2 slides)
-    exec_summary_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, exec_summary_slide_id, exec_summary_comment, x=500000, y=500000, width=7000000, height=3000000)
-    global_summary_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, global_summary_slide_id, global_commentary, x=500000, y=500000, width=7000000, height=4000000)
+    exec_summary_slide_id = deck.add_slide()
+    deck.add_text_box(exec_summary_slide_id, exec_summary_comment, x=500000, y=500000, width=7000000, height=3000000)
+    global_summary_slide_id = deck.add_slide()
+    deck.add_text_box(global_summary_slide_id, global_commentary, x=500000, y=500000, width=7000000, height=4000000)
 
     # 4. Study Objectives (2 slides)
-    study_obj_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, study_obj_slide_id, study_obj_comment, x=500000, y=500000, width=7000000, height=3000000)
+    study_obj_slide_id = deck.add_slide()
+    deck.add_text_box(study_obj_slide_id, study_obj_comment, x=500000, y=500000, width=7000000, height=3000000)
 
     # Add a second Objectives slide listing KPIs from the KPI config
     kpis_list = ", ".join(list(kpi_dict.keys()))
-    study_obj_slide_2 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, study_obj_slide_2, f"KPI Focus: {kpis_list}", x=500000, y=500000, width=7000000, height=3000000)
+    study_obj_slide_2 = deck.add_slide()
+    deck.add_text_box(study_obj_slide_2, f"KPI Focus: {kpis_list}", x=500000, y=500000, width=7000000, height=3000000)
 
     # Now show KPI-level slides (6 slides total - one per KPI)
     # Assuming we have at least 3 KPIs, we create 2 slides per KPI for depth
@@ -1302,8 +1177,8 @@ Simple, insightful.
         if kpi_slides_count >= 6:
             break
         # KPI commentary slide
-        kpi_slide_id = create_slide(slides_service, presentation_id)
-        add_text_box(slides_service, presentation_id, kpi_slide_id, kpi_focus_commentaries[kpi_name], x=500000, y=500000, width=7000000, height=3000000)
+        kpi_slide_id = deck.add_slide()
+        deck.add_text_box(kpi_slide_id, kpi_focus_commentaries[kpi_name], x=500000, y=500000, width=7000000, height=3000000)
         kpi_slides_count+=1
         # KPI image slide if an image from one of the questions is available
         for q_id in q_list:
@@ -1313,58 +1188,58 @@ Simple, insightful.
                     q_img = img
                     break
             if q_img and os.path.exists(os.path.join(BRAND_LIFT_LOCAL_DIR, q_img)):
-                kpi_img_slide = create_slide(slides_service, presentation_id)
-                add_text_box(slides_service, presentation_id, kpi_img_slide, f"{kpi_name} - {q_id} Distribution", x=500000, y=500000, width=7000000, height=3000000)
-                f_id, p_url = upload_image_to_drive_and_make_public(os.path.join(BRAND_LIFT_LOCAL_DIR, q_img), subfolder_id)
+                kpi_img_slide = deck.add_slide()
+                deck.add_text_box(kpi_img_slide, f"{kpi_name} - {q_id} Distribution", x=500000, y=500000, width=7000000, height=3000000)
+                p_url = image_urls.get(os.path.join(BRAND_LIFT_LOCAL_DIR, q_img))
                 if p_url:
-                    add_image(slides_service, presentation_id, kpi_img_slide, p_url, x=1000000, y=1000000, width=4000000, height=3000000)
+                    deck.add_image(kpi_img_slide, p_url, x=1000000, y=1000000, width=4000000, height=3000000)
                 kpi_slides_count+=1
                 break
 
     # 5. Campaign Impact (2 slides)
-    campaign_impact_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, campaign_impact_slide_id, campaign_impact_comment, x=500000, y=500000, width=7000000, height=3000000)
+    campaign_impact_slide_id = deck.add_slide()
+    deck.add_text_box(campaign_impact_slide_id, campaign_impact_comment, x=500000, y=500000, width=7000000, height=3000000)
     # Add main KPI (Purchase Intent) image if available
     if main_kpi_png and os.path.exists(os.path.join(BRAND_LIFT_LOCAL_DIR, main_kpi_png)):
-        camp_impact_img_slide = create_slide(slides_service, presentation_id)
-        add_text_box(slides_service, presentation_id, camp_impact_img_slide, "Purchase Intent Shift", x=500000, y=500000, width=7000000, height=3000000)
-        f_id, p_url = upload_image_to_drive_and_make_public(os.path.join(BRAND_LIFT_LOCAL_DIR, main_kpi_png), subfolder_id)
+        camp_impact_img_slide = deck.add_slide()
+        deck.add_text_box(camp_impact_img_slide, "Purchase Intent Shift", x=500000, y=500000, width=7000000, height=3000000)
+        p_url = image_urls.get(os.path.join(BRAND_LIFT_LOCAL_DIR, main_kpi_png))
         if p_url:
-            add_image(slides_service, presentation_id, camp_impact_img_slide, p_url, x=1000000, y=1000000, width=4000000, height=3000000)
+            deck.add_image(camp_impact_img_slide, p_url, x=1000000, y=1000000, width=4000000, height=3000000)
 
     # 6. Additional Analysis: Driving ROI (3 slides)
-    driving_roi_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, driving_roi_slide_id, driving_roi_comment, x=500000, y=500000, width=7000000, height=3000000)
+    driving_roi_slide_id = deck.add_slide()
+    deck.add_text_box(driving_roi_slide_id, driving_roi_comment, x=500000, y=500000, width=7000000, height=3000000)
     # Causal slide commentary
-    causal_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, causal_slide_id, causal_comment, x=500000, y=200000, width=7000000, height=3000000)
+    causal_slide_id = deck.add_slide()
+    deck.add_text_box(causal_slide_id, causal_comment, x=500000, y=200000, width=7000000, height=3000000)
     # Add causal images (AIPW dist, ATE methods, PS dist) on a separate slide
-    causal_images_slide = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, causal_images_slide, "Causal Diagnostics", x=500000, y=200000, width=7000000, height=3000000)
+    causal_images_slide = deck.add_slide()
+    deck.add_text_box(causal_images_slide, "Causal Diagnostics", x=500000, y=200000, width=7000000, height=3000000)
     for cimg in causal_images:
         cpath = os.path.join(BRAND_LIFT_LOCAL_DIR, cimg)
         if os.path.exists(cpath):
-            f_id, p_url = upload_image_to_drive_and_make_public(cpath, subfolder_id)
+            p_url = image_urls.get(cpath)
             if p_url:
-                add_image(slides_service, presentation_id, causal_images_slide, p_url, x=1000000, y=1000000, width=2000000, height=1500000)
+                deck.add_image(causal_images_slide, p_url, x=1000000, y=1000000, width=2000000, height=1500000)
                 # Move images horizontally to fit multiple
                 # Just a simple offset for demonstration
                 x=1000000+np.random.randint(0,2000000)
                 y=1000000+np.random.randint(0,500000)
 
     # 7. Insights and Recommendations (2 slides)
-    insights_reco_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, insights_reco_slide_id, insights_reco_comment, x=500000, y=500000, width=7000000, height=3000000)
-    limitations_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, limitations_slide_id, limitations_comment, x=500000, y=500000, width=7000000, height=4000000)
+    insights_reco_slide_id = deck.add_slide()
+    deck.add_text_box(insights_reco_slide_id, insights_reco_comment, x=500000, y=500000, width=7000000, height=3000000)
+    limitations_slide_id = deck.add_slide()
+    deck.add_text_box(limitations_slide_id, limitations_comment, x=500000, y=500000, width=7000000, height=4000000)
 
     # 8. Appendix (2 slides)
-    appendix_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, appendix_slide_id, appendix_comment, x=500000, y=500000, width=7000000, height=3000000)
+    appendix_slide_id = deck.add_slide()
+    deck.add_text_box(appendix_slide_id, appendix_comment, x=500000, y=500000, width=7000000, height=3000000)
 
     # Add the deep dive summary by Rory Steadman as a concluding Appendix slide
-    rory_slide_id = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, rory_slide_id, rory_comment, x=500000, y=500000, width=7000000, height=4000000)
+    rory_slide_id = deck.add_slide()
+    deck.add_text_box(rory_slide_id, rory_comment, x=500000, y=500000, width=7000000, height=4000000)
 
     # Count how many slides we have roughly:
     # 1 (Title) + 2 (Background) + 3 (Methodology) + 2 (Exec Summary) + 2 (Objectives) + ~6 (KPIs)
@@ -1372,27 +1247,33 @@ Simple, insightful.
     # Need a few more to reach ~30. Add some filler slides with short texts referencing additional detail:
 
     # Extra slides to reach ~30:
-    extra_slide_1 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, extra_slide_1, "Extra Deep-Dive: Demographic Breakdown (Placeholder)", x=500000, y=500000, width=7000000, height=3000000)
+    extra_slide_1 = deck.add_slide()
+    deck.add_text_box(extra_slide_1, "Extra Deep-Dive: Demographic Breakdown (Placeholder)", x=500000, y=500000, width=7000000, height=3000000)
 
-    extra_slide_2 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, extra_slide_2, "Extra Analysis: Specific Message Resonance (Placeholder)", x=500000, y=500000, width=7000000, height=3000000)
+    extra_slide_2 = deck.add_slide()
+    deck.add_text_box(extra_slide_2, "Extra Analysis: Specific Message Resonance (Placeholder)", x=500000, y=500000, width=7000000, height=3000000)
 
-    extra_slide_3 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, extra_slide_3, "Q&A / Contact Details (Placeholder)", x=500000, y=500000, width=7000000, height=3000000)
+    extra_slide_3 = deck.add_slide()
+    deck.add_text_box(extra_slide_3, "Q&A / Contact Details (Placeholder)", x=500000, y=500000, width=7000000, height=3000000)
 
-    extra_slide_4 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, extra_slide_4, "Thank You", x=500000, y=500000, width=7000000, height=3000000)
+    extra_slide_4 = deck.add_slide()
+    deck.add_text_box(extra_slide_4, "Thank You", x=500000, y=500000, width=7000000, height=3000000)
 
     # Now we have ~29 slides. Add one more:
-    extra_slide_5 = create_slide(slides_service, presentation_id)
-    add_text_box(slides_service, presentation_id, extra_slide_5, "End of Presentation", x=500000, y=500000, width=7000000, height=3000000)
+    extra_slide_5 = deck.add_slide()
+    deck.add_text_box(extra_slide_5, "End of Presentation", x=500000, y=500000, width=7000000, height=3000000)
 
-    # We have now a large deck (~30+ slides).
+    # We have now a large deck (~30+ slides). Nothing has been sent yet: push it in a few calls.
+    deck.flush()
 
     logging.info("=== STEP 8: FINAL DELIVERABLE ===")
+    logging.info(f"Prompt cache: {prompt_cache.stats()}")
     logging.info("All steps complete. Presentation created successfully with images and commentary in the specified subfolder.")
     logging.info("All data, images, narrative text, and final presentation are neatly organised.")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        report_path = profiler.write_report(RUN_REPORT_JSON, prompt_cache={'hits': prompt_cache.hits, 'misses': prompt_cache.misses})
+        logging.info(f"Run report written to {report_path}")
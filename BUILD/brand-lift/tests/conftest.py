@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The step scripts are notebooks; tests import the shared brand_lift package next to them.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,146 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from brand_lift import cache as cache_module
+from brand_lift.cache import PromptCache, StageCache, content_hash
+from brand_lift.profiling import RunProfiler
+
+
+class Counter:
+    def __init__(self, value):
+        self.value, self.calls = value, 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_content_hash_is_order_free_for_dicts_and_content_based_for_frames():
+    df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+    assert content_hash({'a': 1, 'b': 2}) == content_hash({'b': 2, 'a': 1})
+    assert content_hash(df) == content_hash(df.copy())
+    assert content_hash(df) != content_hash(df.assign(a=[1, 3]))
+    assert content_hash(np.arange(3)) != content_hash(np.arange(4))
+    assert content_hash('ab', 'c') != content_hash('a', 'bc')
+
+
+def test_stage_cache_hit_restores_value_and_files(tmp_path):
+    profiler = RunProfiler()
+    cache = StageCache(str(tmp_path / 'cache'), code_version='v1', profiler=profiler)
+    artifact = tmp_path / 'chart.png'
+
+    def compute():
+        artifact.write_bytes(b'png bytes')
+        return {'path': str(artifact)}
+
+    key = cache.key('charts', 'inputs')
+    first = cache.run('charts', key, compute, files=lambda value: [value['path']])
+    artifact.unlink()
+    compute_again = Counter(None)
+    assert cache.run('charts', key, compute_again, files=lambda value: [value['path']]) == first
+    assert compute_again.calls == 0
+    assert artifact.read_bytes() == b'png bytes'
+    assert [s['stage'] for s in profiler.report()['stages']] == ['charts', 'charts']
+
+
+def test_stage_cache_keys_change_with_code_version(tmp_path):
+    old = StageCache(str(tmp_path), code_version='v1')
+    assert old.key('stage', 1) == StageCache(str(tmp_path), code_version='v1').key('stage', 1)
+    assert old.key('stage', 1) != StageCache(str(tmp_path), code_version='v2').key('stage', 1)
+    assert old.key('stage', 1) != old.key('other', 1)
+
+
+def test_stage_cache_skips_values_that_are_not_cacheable(tmp_path):
+    cache = StageCache(str(tmp_path))
+    compute = Counter({'text': 'fallback'})
+    for _ in range(2):
+        cache.run('commentary', 'k', compute, cacheable=lambda value: value['text'] != 'fallback')
+    assert compute.calls == 2
+    assert not os.listdir(tmp_path)
+
+
+def test_stage_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = StageCache(str(tmp_path), max_mb=1)
+    blob = b'x' * 400_000
+    for i, key in enumerate(['a', 'b']):
+        cache.run('stage', key, lambda: blob)
+        os.utime(tmp_path / f'stage-{key}.pkl', (1_000 + i, 1_000 + i))
+    cache.run('stage', 'a', Counter(None))  # a hit marks 'a' as recently used
+    cache.run('stage', 'c', lambda: blob)
+    assert sorted(os.listdir(tmp_path)) == ['stage-a.pkl', 'stage-c.pkl']
+
+
+def test_stage_cache_recomputes_unreadable_entries(tmp_path):
+    cache = StageCache(str(tmp_path))
+    (tmp_path / 'stage-k.pkl').write_bytes(b'not a pickle')
+    with pytest.warns(UserWarning, match="unreadable cache entry"):
+        assert cache.run('stage', 'k', lambda: 42) == 42
+    assert cache.run('stage', 'k', Counter(None)) == 42
+
+
+def test_disabled_stage_cache_writes_nothing(tmp_path):
+    cache = StageCache(str(tmp_path / 'cache'), enabled=False)
+    compute = Counter(1)
+    cache.run('stage', 'k', compute)
+    cache.run('stage', 'k', compute)
+    assert compute.calls == 2 and not (tmp_path / 'cache').exists()
+
+
+PROMPT = ('gpt-4o', 'system', 'prompt', 0.7, 2000)
+
+
+def test_prompt_cache_round_trip_and_counts(tmp_path):
+    cache = PromptCache(str(tmp_path / 'prompts.sqlite'))
+    assert cache.get(*PROMPT) is None
+    cache.put(*PROMPT, 'commentary')
+    assert cache.get(*PROMPT) == 'commentary'
+    assert cache.get('gpt-4o', 'system', 'prompt', 0.2, 2000) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    # A second instance (a later run) reads the same file.
+    assert PromptCache(str(tmp_path / 'prompts.sqlite')).get(*PROMPT) == 'commentary'
+
+
+def test_prompt_cache_expires_entries_after_ttl(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    cache = PromptCache(str(tmp_path / 'prompts.sqlite'), ttl_days=1)
+    cache.put(*PROMPT, 'old')
+    now[0] += 86_400 - 1
+    assert cache.get(*PROMPT) == 'old'
+    now[0] += 2
+    assert cache.get(*PROMPT) is None
+
+
+def test_prompt_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(cache_module.time, 'time', lambda: now[0])
+    cache = PromptCache(str(tmp_path / 'prompts.sqlite'), max_mb=2_500 / 2**20)
+    for prompt in ['a', 'b']:
+        now[0] += 1
+        cache.put('gpt-4o', 'system', prompt, 0.7, 2000, 'x' * 1_000)
+    now[0] += 1
+    cache.get('gpt-4o', 'system', 'a', 0.7, 2000)  # 'b' is now the least recently used
+    now[0] += 1
+    cache.put('gpt-4o', 'system', 'c', 0.7, 2000, 'x' * 1_000)
+    assert [cache.get('gpt-4o', 'system', p, 0.7, 2000) is not None for p in 'abc'] == [True, False, True]
+
+
+def test_prompt_cache_bypass_neither_reads_nor_writes(tmp_path):
+    path = tmp_path / 'prompts.sqlite'
+    PromptCache(str(path)).put(*PROMPT, 'commentary')
+    bypassed = PromptCache(str(path), bypass=True)
+    assert bypassed.get(*PROMPT) is None
+    bypassed.put('gpt-4o', 'system', 'other', 0.7, 2000, 'text')
+    assert PromptCache(str(path)).get('gpt-4o', 'system', 'other', 0.7, 2000) is None
+    assert bypassed.stats() == "0 hits, 0 misses (bypassed)"
+
+
+def test_prompt_cache_failures_are_soft(tmp_path):
+    cache = PromptCache(str(tmp_path))  # a directory, so sqlite cannot open it
+    with pytest.warns(UserWarning, match="Prompt cache write failed"):
+        cache.put(*PROMPT, 'commentary')
+    with pytest.warns(UserWarning, match="Prompt cache read failed"):
+        assert cache.get(*PROMPT) is None
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from scipy.stats import norm
+from sklearn.base import BaseEstimator, RegressorMixin
+
+from brand_lift import learners
+from brand_lift.causal import RespondentMatrix, aipw_interval, aipw_terms, bootstrap_mean, cross_fit_nuisance
+from brand_lift.profiling import RunProfiler
+from brand_lift.segments import match_options, top_box_keywords
+from brand_lift.survey import SurveyFrame
+
+
+def test_bootstrap_mean_matches_one_resample_at_a_time():
+    terms = np.random.default_rng(0).normal(size=37)
+    rng = np.random.default_rng(11)
+    expected = np.array([terms[rng.integers(0, len(terms), size=len(terms))].mean() for _ in range(50)])
+    np.testing.assert_allclose(bootstrap_mean(terms, B=50, seed=11), expected)
+
+
+def test_bootstrap_mean_chunking_does_not_change_draws():
+    terms = np.random.default_rng(1).normal(size=(64, 3))
+    whole = bootstrap_mean(terms, B=101, seed=4)
+    # 64 rows x 3 columns per resample: a 500-cell budget forces chunks of two resamples.
+    np.testing.assert_array_equal(bootstrap_mean(terms, B=101, seed=4, max_cells=500), whole)
+    assert whole.shape == (101, 3)
+
+
+def test_bootstrap_mean_resamples_columns_jointly():
+    terms = np.random.default_rng(2).normal(size=(80, 2))
+    joint = bootstrap_mean(terms, B=200, seed=7)
+    for j in range(terms.shape[1]):
+        np.testing.assert_allclose(joint[:, j], bootstrap_mean(terms[:, j], B=200, seed=7))
+
+
+def test_bootstrap_mean_spread_matches_standard_error():
+    terms = np.random.default_rng(3).exponential(size=400)
+    draws = bootstrap_mean(terms, B=4000, seed=5)
+    assert draws.mean() == pytest.approx(terms.mean(), abs=0.01)
+    assert draws.std() == pytest.approx(terms.std() / np.sqrt(len(terms)), rel=0.05)
+
+
+def simulated_trial(n, rng):
+    """Randomised exposure with a known propensity and a true ATE of 0.1 on a binary outcome."""
+    x = rng.uniform(size=n)
+    ps = 0.3 + 0.4 * x
+    W = (rng.uniform(size=n) < ps).astype(float)
+    mu0 = 0.2 + 0.5 * x
+    mu1 = mu0 + 0.1
+    Y = (rng.uniform(size=n) < np.where(W == 1, mu1, mu0)).astype(float)
+    return Y, W, ps, mu0, mu1
+
+
+def test_aipw_terms_reduce_to_the_outcome_model_difference_with_perfect_fits():
+    W = np.array([1.0, 0.0, 1.0, 0.0])
+    ps = np.array([0.5, 0.5, 0.25, 0.75])
+    mu0, mu1 = np.array([0.2, 0.3, 0.4, 0.1]), np.array([0.5, 0.6, 0.4, 0.9])
+    Y = np.where(W == 1, mu1, mu0)
+    np.testing.assert_allclose(aipw_terms(Y, W, ps, mu0, mu1), mu1 - mu0)
+    stacked = aipw_terms(np.stack([Y, 1 - Y], axis=1), W, ps, np.stack([mu0, 1 - mu0], axis=1),
+                         np.stack([mu1, 1 - mu1], axis=1))
+    np.testing.assert_allclose(stacked[:, 0], mu1 - mu0)
+    np.testing.assert_allclose(stacked[:, 1], mu0 - mu1)
+
+
+def test_influence_interval_is_the_normal_interval_of_the_terms():
+    terms = np.random.default_rng(4).normal(0.1, 2.0, size=(500, 2))
+    estimate, lower, upper, draws = aipw_interval(terms, method="influence")
+    se = terms.std(axis=0, ddof=1) / np.sqrt(len(terms))
+    assert draws is None
+    np.testing.assert_allclose(estimate, terms.mean(axis=0))
+    np.testing.assert_allclose(upper - estimate, norm.ppf(0.975) * se)
+    np.testing.assert_allclose(estimate - lower, norm.ppf(0.975) * se)
+
+
+def test_influence_interval_agrees_with_bootstrap():
+    Y, W, ps, mu0, mu1 = simulated_trial(4000, np.random.default_rng(5))
+    terms = aipw_terms(Y, W, ps, mu0, mu1)
+    _, lower, upper, _ = aipw_interval(terms, method="influence")
+    _, boot_lower, boot_upper, draws = aipw_interval(terms, method="bootstrap", B=2000, seed=6)
+    assert draws.shape == (2000,)
+    assert lower == pytest.approx(boot_lower, abs=0.01) and upper == pytest.approx(boot_upper, abs=0.01)
+
+
+def test_influence_interval_covers_the_true_ate():
+    rng = np.random.default_rng(8)
+    covered = 0
+    for _ in range(400):
+        _, lower, upper, _ = aipw_interval(aipw_terms(*simulated_trial(800, rng)), method="influence")
+        covered += lower <= 0.1 <= upper
+    # 95% nominal coverage; 400 trials put the observed rate within about +/-3.3% with 99.9% probability.
+    assert 0.91 <= covered / 400 <= 0.99
+
+
+def test_aipw_interval_rejects_unknown_methods():
+    with pytest.raises(ValueError, match="Unknown AIPW_VARIANCE"):
+        aipw_interval(np.ones(10), method="jackknife")
+
+
+def test_respondent_matrix_matches_get_dummies():
+    rows = [
+        ('R1', 'Control', 'Q9', '18-24', 0),
+        ('R1', 'Control', 'Q10', 'Female', 0),
+        ('R1', 'Control', 'Q2', 'Very likely', 0),
+        ('R2', 'Exposed', 'Q9', '25-34', 1),
+        ('R2', 'Exposed', 'Q9', '18-24', 1),   # multi-answer respondent
+        ('R2', 'Exposed', 'Q9', '25-34', 1),   # repeated answer counts once
+        ('R2', 'Exposed', 'Q2', 'Very likely', 1),
+        ('R3', 'Exposed', 'Q10', 'Male', 0),
+        ('R3', 'Exposed', 'Q10', 'Female', 0),
+        ('R4', 'Control', 'Q2', 'Not likely', 0),
+    ]
+    df = pd.DataFrame(rows, columns=['Respondent_ID', 'panel_group', 'Question_ID', 'Response_Code', 'purchase_binary'])
+    survey = SurveyFrame(df)
+    matrix = RespondentMatrix(survey, ['Q9', 'Q10'])
+
+    answers = df[df['Question_ID'].isin(['Q9', 'Q10'])]
+    dummies = pd.get_dummies(answers['Question_ID'] + '=' + answers['Response_Code'], dtype=float)
+    expected = dummies.groupby(answers['Respondent_ID']).max().reindex(matrix.respondent_ids, fill_value=0.0)
+    actual = pd.DataFrame(matrix.X.toarray(), index=matrix.respondent_ids, columns=matrix.feature_names)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_names=False)
+    assert sorted(matrix.feature_names) == sorted(expected.columns)
+
+    first = df.drop_duplicates('Respondent_ID').set_index('Respondent_ID').loc[matrix.respondent_ids]
+    np.testing.assert_array_equal(matrix.W, (first['panel_group'] == 'Exposed').astype(int))
+    np.testing.assert_array_equal(matrix.Y, df.groupby('Respondent_ID')['purchase_binary'].max().loc[matrix.respondent_ids])
+    assert len(matrix) == 4
+
+
+def test_respondent_matrix_one_hot_encodes_extra_columns():
+    df = pd.DataFrame({
+        'Respondent_ID': ['R1', 'R1', 'R2', 'R3'],
+        'panel_group': ['Control', 'Control', 'Exposed', 'Exposed'],
+        'Question_ID': ['Q9', 'Q2', 'Q9', 'Q9'],
+        'Response_Code': ['18-24', 'Yes', '25-34', '18-24'],
+        'purchase_binary': [0, 0, 1, 0],
+        'Region': ['North', 'North', 'South', 'East'],
+    })
+    matrix = RespondentMatrix(SurveyFrame(df), ['Q9'])
+    region = df.drop_duplicates('Respondent_ID').set_index('Respondent_ID')[['Region']].loc[matrix.respondent_ids]
+    expected = pd.get_dummies(region.reset_index(drop=True), drop_first=True, dtype=float)
+    actual = pd.DataFrame(matrix.X.toarray(), columns=matrix.feature_names)
+    pd.testing.assert_frame_equal(actual[list(expected.columns)], expected)
+
+
+def test_top_box_outcomes_match_whole_options_only():
+    df = pd.DataFrame({
+        'Respondent_ID': ['R1', 'R2', 'R3', 'R4', 'R5', 'R5', 'R6'],
+        'panel_group': ['Control', 'Exposed', 'Exposed', 'Control', 'Exposed', 'Exposed', 'Control'],
+        'Question_ID': ['Q2', 'Q2', 'Q2', 'Q2', 'Q2', 'Q3', 'Q3'],
+        'Response_Code': ['Very likely', 'Unlikely', 'Not likely', ' LIKELY ', 'Somewhat unlikely', 'Likely', 'Likely'],
+        'purchase_binary': 0,
+    })
+    scores = {'Purchase Intent': (['Q2'], top_box_keywords('Purchase Intent'))}
+    matrix = RespondentMatrix(SurveyFrame(df), [], outcomes=scores)
+    outcome = pd.Series(matrix.outcomes['Purchase Intent'].to_numpy(), index=matrix.respondent_ids)
+    # "Unlikely", "Not likely" and "Somewhat unlikely" contain the keyword "likely" but are not top-box
+    # options; Q3 answers don't belong to the score.
+    assert outcome.to_dict() == {'R1': 1.0, 'R2': 0.0, 'R3': 0.0, 'R4': 1.0, 'R5': 0.0, 'R6': 0.0}
+    assert match_options(['Unlikely', 'not likely', 'Very Likely '], ['very likely', 'likely']).tolist() == [False, False, True]
+
+
+class Memorise(RegressorMixin, BaseEstimator):
+    """Predicts 1 for respondents it was trained on and 0 for any other (one-hot row identity X)."""
+    def fit(self, X, y):
+        self.seen_ = set(np.asarray(X.argmax(axis=1)).ravel())
+        return self
+
+    def predict(self, X):
+        return np.isin(np.asarray(X.argmax(axis=1)).ravel(), list(self.seen_)).astype(float)
+
+
+def test_cross_fit_predicts_each_respondent_out_of_fold(monkeypatch):
+    monkeypatch.setitem(learners.CAUSAL_LEARNERS, 'memorise', lambda target, **options: Memorise())
+    n = 60
+    X = sparse.identity(n, format='csr')  # every respondent has a feature of their own
+    w = np.tile([0, 1], n // 2)
+    y = np.column_stack([np.random.default_rng(0).integers(0, 2, n), np.ones(n)])
+    profiler = RunProfiler()
+    ps, mu0, mu1, fit_times = cross_fit_nuisance(X, w, y, folds=5, learner='memorise', n_jobs=2, profiler=profiler)
+    # No outcome model has seen the respondents it predicts for.
+    assert mu0.shape == mu1.shape == (n, 2)
+    assert (mu0 == 0).all() and (mu1 == 0).all()
+    # Propensity: a respondent's own feature is unseen by their fold's model, so ps is each fold's
+    # intercept only, never a fit to their own exposure.
+    assert len(np.unique(ps.round(12))) <= 5
+    assert abs(ps[w == 1].mean() - ps[w == 0].mean()) < 0.05
+    assert len(fit_times) == 5 * (1 + 2 * 2)
+    assert [r['stage'] for r in profiler.stages] == ['cross_fit']
+
+    # With folds=1 the models are fitted in-sample, which this check would catch.
+    _, mu0_in_sample, _, _ = cross_fit_nuisance(X, w, y, folds=1, learner='memorise')
+    assert (mu0_in_sample[w == 0] == 1).all()
+
+
+def test_cross_fit_is_the_same_on_one_or_many_threads():
+    rng = np.random.default_rng(3)
+    n = 200
+    X = sparse.random(n, 15, density=0.3, format='csr', random_state=4)
+    w = rng.integers(0, 2, n)
+    y = rng.integers(0, 2, (n, 3)).astype(float)
+    serial = cross_fit_nuisance(X, w, y, learner='small_forest', learner_options={'trees': 8}, n_jobs=1)
+    threaded = cross_fit_nuisance(X, w, y, learner='small_forest', learner_options={'trees': 8}, n_jobs=4)
+    for a, b in zip(serial[:3], threaded[:3]):
+        np.testing.assert_array_equal(a, b)
+    assert serial[3].keys() == threaded[3].keys()
@@ -0,0 +1,97 @@
+import os
+
+import pandas as pd
+import pytest
+
+from brand_lift.cache import StageCache
+from brand_lift.charts import chart_job, draw_panel_distribution, render_charts, run_artifacts
+from brand_lift.profiling import RunProfiler
+
+
+def jobs(tmp_path):
+    good = chart_job(draw_panel_distribution, str(tmp_path / 'good.png'),
+                     panel_counts=pd.Series({'Control': 40, 'Exposed': 60}))
+    bad = chart_job(draw_panel_distribution, str(tmp_path / 'bad.png'), panel_counts=None)
+    return good, bad
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_failing_chart_is_left_out_and_the_other_is_written(tmp_path, n_workers):
+    good, bad = jobs(tmp_path)
+    timings, profiler = {}, RunProfiler()
+    with pytest.warns(UserWarning, match="bad.png could not be drawn: AttributeError"):
+        written = render_charts([bad, good], n_workers=n_workers, timings=timings, profiler=profiler)
+
+    assert written == [good['path']]
+    assert os.path.getsize(good['path']) > 0 and not os.path.exists(bad['path'])
+    assert set(timings) == {good['path'], bad['path']} and all(t >= 0 for t in timings.values())
+    assert [s['stage'] for s in profiler.stages] == ['render_charts']
+
+
+def test_later_job_for_the_same_file_wins(tmp_path):
+    good, bad = jobs(tmp_path)
+    retry = dict(good, path=bad['path'])
+    assert render_charts([bad, retry], n_workers=1) == [bad['path']]
+    assert render_charts([], n_workers=1) == []
+
+
+def test_failed_charts_are_never_cached(tmp_path):
+    good, bad = jobs(tmp_path)
+    cache = StageCache(str(tmp_path / 'cache'), code_version='v1')
+    renders = []
+
+    def charts_stage(chart_jobs):
+        # As step 3's charts stage: the written files plus the ones that failed.
+        renders.append(len(chart_jobs))
+        written = render_charts(chart_jobs, n_workers=1)
+        return {'written': written, 'failed': [job['path'] for job in chart_jobs if job['path'] not in written]}
+
+    run = lambda chart_jobs: cache.run('charts', cache.key('charts', 'inputs'), lambda: charts_stage(chart_jobs),
+                                       files=lambda charts: charts['written'], cacheable=lambda charts: not charts['failed'])
+    for _ in range(2):
+        with pytest.warns(UserWarning, match="could not be drawn"):
+            assert run([good, bad])['failed'] == [bad['path']]
+    assert renders == [2, 2]
+    assert not any(name.endswith('.pkl') for name in os.listdir(cache.cache_dir))
+
+    # Once every chart draws, the result is stored, and a hit restores the PNG without rendering.
+    fixed = dict(good, path=bad['path'])
+    assert run([good, fixed])['failed'] == []
+    os.remove(fixed['path'])
+    assert run([good, fixed])['written'] == [good['path'], fixed['path']]
+    assert renders == [2, 2, 2] and os.path.exists(fixed['path'])
+
+
+def test_run_artifacts_produces_each_artifact_once_and_profiles_it(tmp_path):
+    good, bad = jobs(tmp_path)
+    calls = []
+    artifacts = [
+        ('summary_table', good),
+        ('final_results_csv', lambda: calls.append('csv') or str(tmp_path / 'final.csv')),
+        ('ate_ci_chart', bad),
+        ('notes', lambda: calls.append('notes') or "notes"),
+    ]
+    profiler = RunProfiler()
+    with pytest.warns(UserWarning, match="bad.png"):
+        outputs = run_artifacts(artifacts, n_workers=1, profiler=profiler)
+
+    assert outputs == {'summary_table': good['path'], 'ate_ci_chart': None,
+                       'final_results_csv': str(tmp_path / 'final.csv'), 'notes': "notes"}
+    assert calls == ['csv', 'notes']
+    stages = {s['stage']: s for s in profiler.stages}
+    assert list(stages) == ['report_artifacts', 'report_artifacts/render_charts', 'report_artifacts/summary_table',
+                            'report_artifacts/ate_ci_chart', 'report_artifacts/final_results_csv', 'report_artifacts/notes']
+    assert stages['report_artifacts/summary_table']['wall_s'] > 0
+    assert 'peak_rss_mb' in stages['report_artifacts/notes']
+
+
+def test_run_artifacts_rejects_duplicate_names_and_chart_files(tmp_path):
+    good, bad = jobs(tmp_path)
+    calls = []
+    build = lambda: calls.append(1)
+    with pytest.raises(ValueError, match="declared more than once: a, b"):
+        run_artifacts([('b', good), ('a', build), ('b', bad), ('a', build), ('c', build)], n_workers=1)
+    with pytest.raises(ValueError, match="same file"):
+        run_artifacts([('table', good), ('retry', dict(good))], n_workers=1)
+    # Nothing is produced when the declaration is rejected.
+    assert calls == [] and not os.path.exists(good['path'])
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from brand_lift.cache import PromptCache
+from brand_lift.commentary import COMMENTARY_FALLBACK, CommentaryGenerator, backoff_delay, run_async
+from brand_lift.profiling import RunProfiler
+
+
+class RateLimited(Exception):
+    http_status = 429
+
+
+class StubChat:
+    """Async stand-in for openai.ChatCompletion.acreate. `failures[prompt]` lists what each attempt does first."""
+    def __init__(self, failures=None, latency=0.01):
+        self.failures = {prompt: list(steps) for prompt, steps in (failures or {}).items()}
+        self.latency = latency
+        self.calls = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, model, messages, max_tokens, temperature, request_timeout):
+        prompt = messages[1]['content']
+        self.calls[prompt] = self.calls.get(prompt, 0) + 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            step = self.failures.get(prompt, []).pop(0) if self.failures.get(prompt) else None
+            if step == '429':
+                raise RateLimited("rate limited")
+            await asyncio.sleep(10 if step == 'hang' else self.latency)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f" commentary on {prompt} "))])
+        finally:
+            self.in_flight -= 1
+
+
+def generator(chat, **options):
+    options = {'concurrency': 3, 'timeout': 0.2, 'max_retries': 3, 'backoff_base': 0.0, **options}
+    return CommentaryGenerator(system_msg="system", create=chat, **options)
+
+
+def test_concurrency_cap_is_reached_but_never_exceeded():
+    chat = StubChat(latency=0.02)
+    prompts = {f"kpi {i}": f"prompt {i}" for i in range(12)}
+    texts = generator(chat).generate(prompts)
+    assert chat.max_in_flight == 3
+    assert list(texts) == list(prompts)
+    assert texts['kpi 4'] == "commentary on prompt 4"
+
+
+def test_rate_limits_and_timeouts_are_retried_then_fall_back():
+    chat = StubChat(failures={'flaky': ['429', 'hang'], 'broken': ['429', 'hang', '429', '429']})
+    profiler = RunProfiler()
+    with pytest.warns(UserWarning) as warned:
+        texts = generator(chat, profiler=profiler).generate({'a': 'flaky', 'b': 'broken', 'c': 'fine'})
+
+    assert texts == {'a': "commentary on flaky", 'b': COMMENTARY_FALLBACK, 'c': "commentary on fine"}
+    assert chat.calls == {'flaky': 3, 'broken': 3, 'fine': 1}
+    assert profiler.calls['openai'] == 7
+    messages = [str(w.message) for w in warned]
+    assert sum('rate limit' in m for m in messages) == 3
+    assert sum('timed out' in m for m in messages) == 2
+
+
+def test_cached_prompts_skip_the_api_and_fallbacks_are_not_cached(tmp_path):
+    cache = PromptCache(str(tmp_path / 'prompts.sqlite'))
+    chat = StubChat(failures={'broken': ['429'] * 3})
+    with pytest.warns(UserWarning):
+        generator(chat, cache=cache).generate({'a': 'fine', 'b': 'broken'})
+    chat = StubChat()
+    texts = generator(chat, cache=cache).generate({'a': 'fine', 'b': 'broken'})
+    assert texts == {'a': "commentary on fine", 'b': "commentary on broken"}
+    assert chat.calls == {'broken': 1}
+    assert cache.hits == 1
+
+
+def test_backoff_delay_is_jittered_below_a_capped_exponential():
+    delays = [backoff_delay(attempt, base=1.0, cap=5.0) for attempt in range(6) for _ in range(50)]
+    assert all(0 <= d <= 5.0 for d in delays)
+    assert all(0 <= backoff_delay(1, base=1.0, cap=30.0) <= 2.0 for _ in range(50))
+    assert len(set(delays)) > 1
+
+
+def test_run_async_works_inside_a_running_event_loop():
+    async def outer():
+        return run_async(asyncio.sleep(0, result='done'))
+    assert asyncio.run(outer()) == 'done'
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from brand_lift.learners import CAUSAL_LEARNERS, make_learner
+
+
+def binary_data(n=300, seed=0):
+    """Sparse one-hot answers with a binary outcome extreme enough to push linear fits outside [0, 1]."""
+    rng = np.random.default_rng(seed)
+    answers = rng.integers(0, 4, size=(n, 3))
+    X = sparse.csr_matrix((np.ones(answers.size), (np.repeat(np.arange(n), 3), (answers + [0, 4, 8]).ravel())),
+                          shape=(n, 12))
+    y = (rng.random(n) < np.where(answers[:, 0] == 0, 0.98, 0.02) * np.where(answers[:, 1] == 0, 1.0, 0.9)).astype(float)
+    return X, y
+
+
+@pytest.mark.parametrize("name", sorted(CAUSAL_LEARNERS))
+def test_outcome_learners_predict_probabilities(name):
+    X, y = binary_data()
+    model = make_learner(name, trees=10, max_samples=0.5).fit(X, y)
+    predictions = model.predict(X)
+    assert predictions.shape == (X.shape[0],)
+    assert np.isfinite(predictions).all()
+    assert predictions.min() >= 0 and predictions.max() <= 1
+    # The fit carries signal: the near-certain group scores well above the rest.
+    group = X[:, 0].toarray().ravel() == 1
+    assert predictions[group].mean() > predictions[~group].mean() + 0.5
+
+
+@pytest.mark.parametrize("name", sorted(CAUSAL_LEARNERS))
+def test_effect_learners_fit_signed_targets(name):
+    X, y = binary_data(seed=1)
+    effect = y - 0.5
+    predictions = make_learner(name, 'effect').fit(X, effect).predict(X)
+    assert predictions.shape == (X.shape[0],) and np.isfinite(predictions).all()
+    assert predictions.min() < 0 < predictions.max()
+
+
+def test_single_class_outcome_predicts_that_class():
+    X, _ = binary_data()
+    assert (make_learner('logistic').fit(X, np.ones(X.shape[0])).predict(X) == 1).all()
+
+
+def test_small_forest_options_and_unknown_learner():
+    model = make_learner('small_forest', trees=7, max_samples=0.2)
+    assert model.estimator.n_estimators == 7 and model.estimator.max_samples == 0.2
+    with pytest.raises(ValueError, match="Unknown causal learner"):
+        make_learner('svm')
@@ -0,0 +1,20 @@
+from benchmarks.pipeline import benchmark_pipeline
+from brand_lift import uploads
+
+
+def test_pipeline_benchmark_runs_every_stage_on_a_tiny_campaign():
+    google_api_available = uploads.GOOGLE_API_AVAILABLE
+    report = benchmark_pipeline(sizes=(200,), learner='ridge', folds=2, bootstrap_b=20, chart_workers=1, chat_latency=0)
+
+    assert list(report['stage']) == ['reshape', 'cleaning', 'segment_cube', 'top_box', 'stat_tests', 'causal',
+                                     'render_charts', 'upload_images', 'commentary', 'deck']
+    run = report.iloc[0]
+    # 8 KPI questions and 2 demographics per respondent; one chart per KPI question plus two.
+    assert run['long_rows'] == 200 * 10
+    assert run['charts'] == run['uploads'] == 10
+    assert run['commentaries'] == 8
+    # Each slide: createSlide, createShape, insertText, updateTextStyle, createImage.
+    assert run['slide_requests'] == 8 * 5
+    assert (report['wall_s'] >= 0).all()
+    # The Drive stubs are undone afterwards.
+    assert uploads.GOOGLE_API_AVAILABLE == google_api_available
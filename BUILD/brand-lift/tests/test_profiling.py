@@ -0,0 +1,125 @@
+import json
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from brand_lift.profiling import RunProfiler, peak_rss_mb
+
+STAGE_FIELDS = {'stage', 'wall_s', 'cpu_s', 'child_cpu_s', 'peak_rss_mb', 'rss_growth_mb', 'calls'}
+
+
+def test_nested_stages_are_listed_in_start_order_with_their_paths():
+    profiler = RunProfiler()
+    with profiler.stage('causal'):
+        with profiler.stage('cross_fit'):
+            with profiler.stage('fold'):
+                pass
+        with profiler.stage('bootstrap'):
+            pass
+    with profiler.stage('charts'):
+        pass
+
+    assert [s['stage'] for s in profiler.stages] == [
+        'causal', 'causal/cross_fit', 'causal/cross_fit/fold', 'causal/bootstrap', 'charts']
+    assert all(set(s) == STAGE_FIELDS for s in profiler.stages)
+    stages = {s['stage']: s for s in profiler.stages}
+    assert stages['causal']['wall_s'] >= stages['causal/cross_fit']['wall_s'] + stages['causal/bootstrap']['wall_s'] - 1e-3
+
+
+def test_stage_is_closed_and_the_stack_unwound_when_the_body_raises():
+    profiler = RunProfiler()
+    with pytest.raises(RuntimeError):
+        with profiler.stage('outer'):
+            with profiler.stage('inner'):
+                raise RuntimeError("boom")
+    with profiler.stage('after'):
+        pass
+    assert [s['stage'] for s in profiler.stages] == ['outer', 'outer/inner', 'after']
+    assert all('wall_s' in s for s in profiler.stages)
+
+
+def test_calls_are_counted_per_stage_and_in_total():
+    profiler = RunProfiler()
+    profiler.count('drive')
+    with profiler.stage('uploads'):
+        profiler.count('drive', 3)
+        with profiler.stage('slides'):
+            profiler.count('slides')
+    with profiler.stage('idle'):
+        pass
+
+    stages = {s['stage']: s for s in profiler.stages}
+    assert stages['uploads']['calls'] == {'drive': 3, 'slides': 1}
+    assert stages['uploads/slides']['calls'] == {'slides': 1}
+    assert stages['idle']['calls'] == {}
+    assert profiler.calls == {'drive': 4, 'slides': 1}
+
+
+def test_profiled_decorator_times_each_call_as_a_stage():
+    profiler = RunProfiler()
+
+    @profiler.profiled('render')
+    def render(n):
+        return n * 2
+
+    @profiler.profiled()
+    def upload_images():
+        return render(1)
+
+    assert upload_images() == 2
+    assert render.__name__ == 'render'
+    assert [s['stage'] for s in profiler.stages] == ['upload_images', 'upload_images/render']
+
+
+def test_memory_fields_track_peak_rss():
+    # Peak RSS is a high-water mark, so allocate past the current peak to move it.
+    profiler = RunProfiler()
+    before = peak_rss_mb()
+    with profiler.stage('allocate'):
+        block = np.ones(int((before + 64) * 2**20) // 8)
+        block.sum()  # touched, so it is resident
+    del block
+    record = profiler.stages[0]
+    assert record['peak_rss_mb'] >= before + 32
+    assert record['rss_growth_mb'] >= 32
+    assert record['cpu_s'] >= 0 and record['child_cpu_s'] == 0
+
+
+def test_child_cpu_is_attributed_to_the_stage_that_waited_for_the_child():
+    profiler = RunProfiler()
+    with profiler.stage('child'):
+        subprocess.run([sys.executable, '-c', 'sum(i * i for i in range(3_000_000))'], check=True)
+    assert profiler.stages[0]['child_cpu_s'] > 0
+
+
+def test_record_adds_a_wall_time_only_sub_stage():
+    profiler = RunProfiler()
+    with profiler.stage('report_artifacts'):
+        profiler.record('summary_table', 0.123456)
+    assert profiler.stages[1] == {'stage': 'report_artifacts/summary_table', 'wall_s': 0.1235}
+
+
+def test_write_report_dumps_stages_calls_and_extra_fields(tmp_path):
+    profiler = RunProfiler()
+    with profiler.stage('cleaning'):
+        profiler.count('openai', 2)
+    path = profiler.write_report(str(tmp_path / 'run_report.json'), prompt_cache={'hits': 1, 'misses': 2})
+
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    assert set(report) == {'started', 'total_wall_s', 'peak_rss_mb', 'calls', 'stages', 'prompt_cache'}
+    assert report['calls'] == {'openai': 2}
+    assert report['prompt_cache'] == {'hits': 1, 'misses': 2}
+    assert report['stages'] == json.loads(json.dumps(profiler.stages))
+    assert report['total_wall_s'] >= report['stages'][0]['wall_s']
+    assert report['peak_rss_mb'] > 0
+
+
+def test_profile_dir_dumps_cprofile_stats_for_top_level_stages_only(tmp_path):
+    profiler = RunProfiler(profile_dir=str(tmp_path / 'profiles'))
+    with profiler.stage('causal'):
+        with profiler.stage('cross_fit'):
+            pass
+    assert sorted(p.name for p in (tmp_path / 'profiles').iterdir()) == ['causal.prof']
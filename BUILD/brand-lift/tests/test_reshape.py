@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_export
+from brand_lift import reshape
+from brand_lift.reshape import RESHAPERS, plan_shards
+
+
+@pytest.fixture
+def export(tmp_path):
+    wide_path = str(tmp_path / "original.csv")
+    kpi_config, question_to_subcols = write_export(wide_path, 257)
+    return wide_path, kpi_config, question_to_subcols
+
+
+def reshaped_bytes(tmp_path, mode, export, **options):
+    out_path = str(tmp_path / f"long_{mode}.csv")
+    RESHAPERS[mode](*export[:1], out_path, *export[1:], **options)
+    with open(out_path, "rb") as f:
+        return f.read()
+
+
+def test_all_modes_write_identical_bytes(tmp_path, export):
+    reference = reshaped_bytes(tmp_path, "rowwise", export)
+    assert reference.count(b"\n") > 100
+    assert reshaped_bytes(tmp_path, "vectorized", export) == reference
+    assert reshaped_bytes(tmp_path, "streaming", export, chunk_size=50) == reference
+    assert reshaped_bytes(tmp_path, "parallel", export, n_workers=3) == reference
+
+
+def test_streaming_resumes_after_an_interrupted_chunk(tmp_path, export, monkeypatch):
+    reference = reshaped_bytes(tmp_path, "rowwise", export)
+    out_path = str(tmp_path / "long_resumed.csv")
+    real_iter = reshape.iter_long_chunks
+
+    def interrupted(*args, **kwargs):
+        for i, chunk in enumerate(real_iter(*args, **kwargs)):
+            if i == 2:
+                raise KeyboardInterrupt
+            yield chunk
+
+    monkeypatch.setattr(reshape, "iter_long_chunks", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        reshape.reshape_streaming(export[0], out_path, *export[1:], chunk_size=40)
+    assert os.path.exists(out_path + reshape.CHECKPOINT_SUFFIX)
+
+    monkeypatch.setattr(reshape, "iter_long_chunks", real_iter)
+    reshape.reshape_streaming(export[0], out_path, *export[1:], chunk_size=40)
+    with open(out_path, "rb") as f:
+        assert f.read() == reference
+    assert not os.path.exists(out_path + reshape.CHECKPOINT_SUFFIX)
+
+
+def test_shards_cover_the_data_rows_on_line_boundaries(export):
+    size = os.path.getsize(export[0])
+    with open(export[0], "rb") as f:
+        data = f.read()
+    shards = plan_shards(export[0], 5)
+    assert shards[0][0] == data.index(b"\n") + 1 and shards[-1][1] == size
+    assert all(end == next_start for (_, end), (next_start, _) in zip(shards, shards[1:]))
+    assert all(data[start - 1:start] == b"\n" for start, _ in shards)
+
+
+@pytest.mark.skipif(not reshape.ARROW_AVAILABLE, reason="pyarrow not installed")
+@pytest.mark.parametrize("output_format", ["parquet", "arrow"])
+def test_columnar_output_matches_csv(tmp_path, export, output_format):
+    csv_path = str(tmp_path / "long.csv")
+    reshape.reshape_vectorized(export[0], csv_path, *export[1:])
+    columnar_path = reshape.long_output_path(csv_path, output_format)
+    reshape.reshape_vectorized(export[0], columnar_path, *export[1:], output_format=output_format)
+    if output_format == "parquet":
+        table = reshape.pq.read_table(columnar_path)
+    else:
+        with reshape.pa.memory_map(columnar_path, "r") as source:
+            table = reshape.pa_ipc.open_file(source).read_all()
+    expected = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    assert table.column_names == reshape.LONG_FIELDNAMES
+    pd.testing.assert_frame_equal(table.to_pandas().astype(str), expected, check_dtype=False)
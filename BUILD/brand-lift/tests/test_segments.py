@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from brand_lift.segments import SegmentCube, TopBoxScorer, top_box_keywords
+from brand_lift.survey import SurveyFrame
+
+
+def survey_frame(categorical=False):
+    rows = [
+        ('R1', 'Control', 'Q9', '18-24'),
+        ('R1', 'Control', 'Q10', 'Female'),
+        ('R1', 'Control', 'Q1', 'Very aware'),
+        ('R1', 'Control', 'Q2', 'Very likely'),
+        ('R2', 'Exposed', 'Q9', '25-34'),
+        ('R2', 'Exposed', 'Q9', '18-24'),
+        ('R2', 'Exposed', 'Q10', 'Male'),
+        ('R2', 'Exposed', 'Q1', 'Very aware'),
+        ('R2', 'Exposed', 'Q2', 'Not likely'),
+        ('R2', 'Exposed', 'Q2', 'Very likely'),
+        ('R3', 'Exposed', 'Q10', 'Female'),
+        ('R3', 'Exposed', 'Q1', 'Not aware'),
+        ('R3', 'Exposed', 'Q2', None),
+        ('R4', 'Control', 'Q9', '25-34'),
+        ('R4', 'Control', 'Q1', 'Not aware'),
+        ('R4', 'Control', 'Q2', 'Not likely'),
+        ('R5', None, 'Q1', 'Very aware'),
+        ('R6', 'Exposed', 'Q10', 'Male'),
+        ('R6', 'Exposed', 'Q1', 'Somewhat aware'),
+        ('R6', 'Exposed', 'Q2', 'Unlikely'),
+        ('R6', 'Exposed', 'Q3', 'Yes'),
+        ('R7', 'Control', 'Q10', 'Male'),
+        ('R7', 'Control', 'Q2', 'Somewhat likely'),
+        ('R7', 'Control', 'Q3', 'No'),
+    ]
+    df = pd.DataFrame(rows, columns=['Respondent_ID', 'panel_group', 'Question_ID', 'Response_Code'])
+    if categorical:
+        # As loaded from step 2's dictionary-encoded Parquet / Arrow output.
+        df = df.astype({'panel_group': 'category', 'Question_ID': 'category', 'Response_Code': 'category'})
+    return SurveyFrame(df)
+
+
+def baseline_top_box(df, questions, kpi_name, by=('panel_group',)):
+    """The original per-row scoring: substring-match every answer, then average by group."""
+    subset = df[df['Question_ID'].isin(questions)].dropna(subset=['panel_group', 'Response_Code']).copy()
+    keywords = top_box_keywords(kpi_name)
+    subset['top_box'] = subset['Response_Code'].astype(str).str.lower().apply(
+        lambda x: 1 if any(kw in x for kw in keywords) else 0
+    )
+    return subset.groupby(list(by), observed=True)['top_box'].mean()*100
+
+
+def test_counts_match_crosstab():
+    survey = survey_frame()
+    cube = SegmentCube(survey, {'Age': 'Q9', 'Gender': 'Q10'})
+    df = survey.df
+    expected = pd.crosstab([df['Question_ID'], df['Response_Code']], df['panel_group']).stack()
+    expected = expected[expected > 0].rename('count').sort_index()
+    counts = cube.counts_by(['Question_ID', 'Response_Code', 'panel_group'])
+    pd.testing.assert_series_equal(counts, expected, check_names=False, check_dtype=False)
+    assert counts.index.names == ['Question_ID', 'Response_Code', 'panel_group']
+    assert sum(cube.counts) == df[['panel_group', 'Response_Code']].notna().all(axis=1).sum()
+
+
+def test_rates_match_normalised_crosstab():
+    survey = survey_frame()
+    cube = SegmentCube(survey)
+    q2 = survey.question('Q2')
+    expected = pd.crosstab(q2['panel_group'], q2['Response_Code'], normalize='index')
+    table = cube.array(['panel_group', 'Response_Code'], where={'Question_ID': ['Q2']})
+    rates = pd.DataFrame(table / table.sum(axis=1, keepdims=True), index=cube.labels['panel_group'],
+                         columns=cube.labels['Response_Code'])
+    rates = rates.loc[expected.index, expected.columns]
+    np.testing.assert_allclose(rates.to_numpy(), expected.to_numpy())
+
+
+def test_segment_cut_uses_each_respondents_first_answer():
+    survey = survey_frame()
+    cube = SegmentCube(survey, {'Age': 'Q9', 'Gender': 'Q10'})
+    df = survey.df
+    first_age = survey.question('Q9').drop_duplicates('Respondent_ID').set_index('Respondent_ID')['Response_Code']
+    q1 = df[(df['Question_ID'] == 'Q1') & df['panel_group'].notna()]
+    expected = pd.crosstab(q1['Respondent_ID'].map(first_age).fillna('no answer'), q1['Response_Code'])
+
+    counts = cube.counts_by(['Age', 'Response_Code'], where={'Question_ID': ['Q1']}).reset_index()
+    actual = counts.fillna({'Age': 'no answer'}).pivot(index='Age', columns='Response_Code', values='count').fillna(0)
+    pd.testing.assert_frame_equal(actual.loc[expected.index, expected.columns], expected, check_names=False,
+                                  check_dtype=False)
+    assert cube.segments == ['Age', 'Gender']
+    # R2 answered Q9 twice: only the first answer (25-34) places them.
+    exposed_ages = cube.counts_by(['Age'], where={'Question_ID': ['Q10'], 'panel_group': ['Exposed']})
+    assert exposed_ages.get('25-34') == 1 and '18-24' not in exposed_ages.index
+    assert exposed_ages[exposed_ages.index.isna()].sum() == 2  # R3 and R6 never answered Q9
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_top_box_rates_match_per_row_keyword_scoring(categorical):
+    survey = survey_frame(categorical)
+    scorer = TopBoxScorer(SegmentCube(survey, {'Gender': 'Q10'}))
+    kpis = {'Brand Awareness': ['Q1'], 'Purchase Intent': ['Q2'], 'Message Association': ['Q3'], 'Other': ['Q2', 'Q3']}
+    cube = scorer.cube({name: (questions, top_box_keywords(name)) for name, questions in kpis.items()}, segments=['Gender'])
+    rates = TopBoxScorer.rates(cube, ['score', 'panel_group'])
+    for name, questions in kpis.items():
+        expected = baseline_top_box(survey.df, questions, name)
+        pd.testing.assert_series_equal(rates.loc[name].astype(float), expected.astype(float), check_names=False,
+                                       check_index_type=False, check_categorical=False)
+
+    # Segment cuts: respondents with a Gender answer, scored per row after joining it on.
+    gender = survey.question('Q10').set_index('Respondent_ID')['Response_Code'].astype(str)
+    df = survey.df.assign(Gender=survey.df['Respondent_ID'].map(gender))
+    expected = baseline_top_box(df.dropna(subset=['Gender']), ['Q1'], 'Brand Awareness', by=('Gender', 'panel_group'))
+    actual = TopBoxScorer.rates(cube.xs('Brand Awareness', level='score'), ['Gender', 'panel_group'])
+    pd.testing.assert_series_equal(actual.astype(float), expected.astype(float), check_names=False,
+                                   check_index_type=False, check_categorical=False)
+
+
+def test_top_box_keywords_are_substring_matches():
+    scorer = TopBoxScorer(SegmentCube(survey_frame()))
+    flags = dict(zip(scorer.responses, scorer.keyword_flags(top_box_keywords('Purchase Intent'))))
+    # The report's top-box rates keep the original substring rule, so "Unlikely" counts as "likely".
+    assert flags['very likely'] and flags['somewhat likely'] and flags['unlikely'] and flags['not likely']
+    assert not flags['no'] and not flags['very aware']
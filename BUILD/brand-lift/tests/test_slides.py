@@ -0,0 +1,119 @@
+import re
+from types import SimpleNamespace
+
+import pytest
+
+from brand_lift import slides
+from brand_lift.profiling import RunProfiler
+from brand_lift.slides import DeckBuilder, slides_batch_update
+
+# Slides API object IDs: 5-50 characters, [a-zA-Z0-9_] first, then [a-zA-Z0-9_\-:].
+OBJECT_ID = re.compile(r'^[a-zA-Z0-9_][a-zA-Z0-9_\-:]{4,49}$')
+
+
+class HttpError(Exception):
+    """Shaped like googleapiclient.errors.HttpError: the status lives on resp."""
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.resp = SimpleNamespace(status=status)
+
+
+class FakeSlidesService:
+    """presentations().batchUpdate(...).execute(); the first `failures` calls raise that many errors."""
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.batches = []
+
+    def presentations(self):
+        return self
+
+    def batchUpdate(self, presentationId, body):
+        return SimpleNamespace(execute=lambda: self._execute(presentationId, body['requests']))
+
+    def _execute(self, presentation_id, requests):
+        if self.failures:
+            raise HttpError(self.failures.pop(0))
+        self.batches.append((presentation_id, list(requests)))
+        return {'replies': [{} for _ in requests]}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(slides.time, 'sleep', delays.append)
+    return delays
+
+
+def build_deck(service, slide_count, **options):
+    deck = DeckBuilder(service, 'deck-1', **options)
+    for i in range(slide_count):
+        slide_id = deck.add_slide()
+        deck.add_text_box(slide_id, f"Slide {i}", heading=i == 0)
+        deck.add_text_box(slide_id, "")
+        deck.add_image(slide_id, f"https://example.com/{i}.png")
+        deck.add_image(slide_id, None)
+    return deck
+
+
+def test_flush_sends_requests_in_order_in_chunks_of_max_requests(sleeps):
+    service = FakeSlidesService()
+    profiler = RunProfiler()
+    deck = build_deck(service, 10, max_requests=7, profiler=profiler)
+    queued = list(deck.requests)
+    assert len(queued) == 10 * 6  # slide, text box + text + style, blank text box, image
+
+    deck.flush()
+    assert [len(requests) for _, requests in service.batches] == [7] * 8 + [4]
+    assert [r for _, requests in service.batches for r in requests] == queued
+    assert {presentation_id for presentation_id, _ in service.batches} == {'deck-1'}
+    assert deck.batch_calls == 9 and deck.requests == []
+    assert profiler.calls['slides'] == 9
+    assert [s['stage'] for s in profiler.stages] == ['slides']
+    assert sleeps == []
+
+
+def test_object_ids_are_valid_unique_and_referenced_after_creation():
+    deck = build_deck(FakeSlidesService(), 3)
+    other = build_deck(FakeSlidesService(), 3)
+    created, seen = [], set()
+    for request in deck.requests:
+        kind, body = next(iter(request.items()))
+        if kind.startswith('create'):
+            created.append(body['objectId'])
+            page = body.get('elementProperties', {}).get('pageObjectId')
+            assert page is None or page in seen
+        else:
+            assert body['objectId'] in seen
+        seen.add(created[-1] if kind.startswith('create') else body['objectId'])
+
+    assert all(OBJECT_ID.match(object_id) for object_id in created)
+    assert len(set(created)) == len(created)
+    # Two decks in the same run never share IDs.
+    assert not set(created) & {next(iter(r.values()))['objectId'] for r in other.requests}
+
+
+def test_rate_limits_are_retried_with_jittered_exponential_backoff(sleeps):
+    service = FakeSlidesService(failures=[429, 429, 429])
+    profiler = RunProfiler()
+    slides_batch_update(service, 'deck-1', [{'createSlide': {}}], max_retries=5, retry_delay=2, profiler=profiler)
+    assert len(service.batches) == 1
+    assert profiler.calls['slides'] == 4
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= 2 * 2**attempt for attempt, delay in enumerate(sleeps))
+
+    sleeps.clear()
+    for _ in range(20):
+        slides_batch_update(FakeSlidesService(failures=[429]), 'deck-1', [], retry_delay=2)
+    assert len(sleeps) == 20 and len(set(sleeps)) > 1
+
+
+def test_rate_limit_gives_up_after_max_retries_and_other_errors_raise_at_once(sleeps):
+    service = FakeSlidesService(failures=[429] * 3)
+    with pytest.raises(HttpError):
+        slides_batch_update(service, 'deck-1', [], max_retries=3)
+    assert len(sleeps) == 2 and service.batches == []
+
+    service = FakeSlidesService(failures=[500])
+    with pytest.raises(HttpError):
+        slides_batch_update(service, 'deck-1', [])
+    assert len(sleeps) == 2
@@ -0,0 +1,142 @@
+import itertools
+
+import numpy as np
+import pytest
+from scipy.integrate import quad
+from scipy.stats import beta as beta_dist, chi2_contingency
+
+from brand_lift.stats import (BAYES_AVAILABLE, batched_chi_square, permutation_chi_square, permuted_tables,
+                             posterior_lift)
+
+
+def padded_stack(tables):
+    """Zero-pad tables to a common shape, as build_contingency_counts does."""
+    rows = max(t.shape[0] for t in tables)
+    cols = max(t.shape[1] for t in tables)
+    stack = np.zeros((len(tables), rows, cols), dtype=np.int64)
+    for i, t in enumerate(tables):
+        stack[i, :t.shape[0], :t.shape[1]] = t
+    return stack
+
+
+def random_tables(seed=0, n=40):
+    rng = np.random.default_rng(seed)
+    tables = []
+    for _ in range(n):
+        shape = (rng.integers(2, 4), rng.integers(2, 6))
+        tables.append(rng.poisson(rng.uniform(0.5, 30), size=shape))
+    # Small 2x2 tables exercise Yates' correction, including cells already within 0.5 of expected.
+    tables += [np.array([[3, 1], [1, 3]]), np.array([[10, 10], [10, 11]]), np.array([[0, 5], [7, 2]])]
+    return tables
+
+
+def test_batched_chi_square_matches_scipy_per_table():
+    tables = random_tables()
+    stat, p, dof, min_expected = batched_chi_square(padded_stack(tables))
+    for i, table in enumerate(tables):
+        live = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        if min(live.shape) < 2:
+            assert dof[i] == 0 and p[i] == 1.0
+            continue
+        expected_stat, expected_p, expected_dof, expected = chi2_contingency(live)
+        assert dof[i] == expected_dof
+        assert stat[i] == pytest.approx(expected_stat, rel=1e-9, abs=1e-12)
+        assert p[i] == pytest.approx(expected_p, rel=1e-9, abs=1e-12)
+        assert min_expected[i] == pytest.approx(expected.min())
+
+
+def test_batched_chi_square_ignores_empty_rows_and_columns():
+    table = np.array([[12, 0, 3], [4, 0, 9]])
+    padded = np.zeros((1, 3, 5), dtype=np.int64)
+    padded[0, :2, :3] = table
+    stat, p, dof, _ = batched_chi_square(padded)
+    expected_stat, expected_p, expected_dof, _ = chi2_contingency(table[:, [0, 2]])
+    assert dof[0] == expected_dof == 1
+    assert stat[0] == pytest.approx(expected_stat) and p[0] == pytest.approx(expected_p)
+
+
+def test_batched_chi_square_degenerate_tables():
+    stack = padded_stack([np.zeros((2, 2), dtype=np.int64), np.array([[5, 3], [0, 0]])])
+    stat, p, dof, min_expected = batched_chi_square(stack)
+    assert dof.tolist() == [0, 0]
+    assert stat.tolist() == [0.0, 0.0] and p.tolist() == [1.0, 1.0]
+    assert np.isinf(min_expected[0])
+
+
+def exact_permutation_p(table):
+    """p-value over every relabelling of a two-row table's respondents, by brute force."""
+    table = np.asarray(table)
+    responses = np.repeat(np.arange(table.shape[1]), table.sum(axis=0))
+    col_tot = np.bincount(responses, minlength=table.shape[1])
+    n, first_row = len(responses), table[0].sum()
+    expected = np.outer(table.sum(axis=1), col_tot) / n
+
+    def pearson(row0):
+        t = np.stack([row0, col_tot - row0])
+        return ((t - expected)**2 / expected).sum()
+
+    observed = pearson(table[0])
+    stats = [pearson(np.bincount(responses[list(idx)], minlength=table.shape[1]))
+             for idx in itertools.combinations(range(n), first_row)]
+    return np.mean(np.array(stats) >= observed - 1e-9), observed
+
+
+@pytest.mark.parametrize("table", [[[4, 1, 0], [1, 3, 4]], [[5, 1], [1, 4]], [[2, 2, 2], [2, 2, 3]]])
+def test_permutation_p_matches_brute_force_relabelling(table):
+    exact, exact_stat = exact_permutation_p(table)
+    # confidence=1 disables early stopping, so every table gets max_permutations draws.
+    p, used, observed = permutation_chi_square(padded_stack([np.array(table)]), max_permutations=20_000, confidence=1.0)
+    assert used[0] == 20_000
+    assert observed[0] == pytest.approx(exact_stat)
+    assert observed[0] == pytest.approx(chi2_contingency(table, correction=False)[0])
+    assert p[0] == pytest.approx(exact, abs=4 * np.sqrt(exact * (1 - exact) / 20_000) + 1e-3)
+
+
+def test_permuted_tables_keep_margins_and_hypergeometric_means():
+    row_tot, col_tot = np.array([[7, 5, 3]]), np.array([[6, 4, 1, 4]])
+    tables = permuted_tables(row_tot, col_tot, 20_000, np.random.default_rng(1))
+    assert (tables >= 0).all()
+    assert (tables.sum(axis=3) == row_tot).all() and (tables.sum(axis=2) == col_tot).all()
+    expected = np.outer(row_tot[0], col_tot[0]) / row_tot.sum()
+    np.testing.assert_allclose(tables[:, 0].mean(axis=0), expected, atol=0.05)
+
+
+def test_permutation_stops_early_once_decided():
+    clear = np.array([[40, 2], [3, 45]])
+    null = np.array([[20, 21], [22, 19]])
+    p, used, _ = permutation_chi_square(padded_stack([clear, null, np.zeros((2, 2), dtype=np.int64)]))
+    assert p[0] < 0.05 and p[1] > 0.05
+    assert used[0] < 10_000 and used[1] < 10_000
+    assert used[2] == 0 and p[2] == 1.0
+
+
+def test_posterior_lift_matches_beta_binomial_posteriors():
+    successes, trials = np.array([[30, 45], [5, 4], [0, 0]]), np.array([[100, 110], [40, 35], [0, 0]])
+    posterior = posterior_lift(successes, trials, prior=(1.0, 2.0), draws=200_000)
+    a, b = 1.0 + successes, 2.0 + trials - successes
+    np.testing.assert_allclose(posterior['control_rate'], a[:, 0] / (a[:, 0] + b[:, 0]))
+    np.testing.assert_allclose(posterior['exposed_rate'], a[:, 1] / (a[:, 1] + b[:, 1]))
+    np.testing.assert_allclose(posterior['lift_mean'], posterior['exposed_rate'] - posterior['control_rate'])
+    for i in range(len(successes)):
+        control, exposed = beta_dist(a[i, 0], b[i, 0]), beta_dist(a[i, 1], b[i, 1])
+        # P(p_exposed > p_control) = integral of f_exposed(x) * F_control(x) over [0, 1].
+        prob = quad(lambda x: exposed.pdf(x) * control.cdf(x), 0, 1)[0]
+        assert posterior['prob_positive'][i] == pytest.approx(prob, abs=5e-3)
+        lift = exposed.rvs(400_000, random_state=9) - control.rvs(400_000, random_state=10)
+        lower, upper = np.percentile(lift, [2.5, 97.5])
+        assert posterior['lift_CI_lower'][i] == pytest.approx(lower, abs=5e-3)
+        assert posterior['lift_CI_upper'][i] == pytest.approx(upper, abs=5e-3)
+
+
+def test_posterior_lift_is_seeded():
+    first = posterior_lift([[3, 9]], [[20, 21]], seed=5)
+    second = posterior_lift([[3, 9]], [[20, 21]], seed=5)
+    assert first['lift_CI_lower'] == second['lift_CI_lower'] and first['prob_positive'] == second['prob_positive']
+
+
+@pytest.mark.skipif(BAYES_AVAILABLE, reason="pymc installed")
+def test_posterior_lift_falls_back_to_conjugate_without_pymc():
+    with pytest.warns(UserWarning, match="pymc not installed"):
+        fallback = posterior_lift([[3, 9]], [[20, 21]], method="mcmc")
+    conjugate = posterior_lift([[3, 9]], [[20, 21]])
+    assert fallback['lift_CI_lower'] == conjugate['lift_CI_lower']
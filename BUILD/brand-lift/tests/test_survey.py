@@ -0,0 +1,47 @@
+import pandas as pd
+
+from brand_lift.survey import DataCleaner, SurveyFrame
+
+
+def long_table(rows):
+    return pd.DataFrame(rows, columns=['Respondent_ID', 'panel_group', 'Question_ID', 'Response_Code'])
+
+
+def test_question_offsets_slice_each_question():
+    df = long_table([
+        ('R1', 'Control', 'Q2', 'Very likely'),
+        ('R1', 'Control', 'Q1', 'Yes'),
+        ('R2', 'Exposed', 'Q2', 'Not likely'),
+        ('R2', 'Exposed', None, 'Yes'),
+    ])
+    survey = SurveyFrame(df)
+    assert survey.question_ids == ['Q2', 'Q1']
+    assert survey.question('Q2')['Respondent_ID'].tolist() == ['R1', 'R2']
+    assert survey.question('Q1')['Response_Code'].tolist() == ['Yes']
+    assert survey.question('Q9').empty
+    assert survey.questions(['Q1', 'Q2', 'Q1'])['Question_ID'].tolist() == ['Q1', 'Q2', 'Q2']
+
+
+def test_purchase_binary_is_int_and_any_very_likely_wins():
+    df = long_table([
+        ('R1', 'Control', 'Q2', 'Somewhat likely'),
+        ('R1', 'Control', 'Q2', 'Very likely'),
+        ('R1', 'Control', 'Q1', 'Yes'),
+        ('R2', 'Exposed', 'Q2', 'Very likely'),
+        ('R2', 'Exposed', 'Q2', 'Not likely'),
+        ('R3', 'Exposed', 'Q2', 'Not likely'),
+        ('R3', 'Exposed', 'Q2', 'Not likely'),
+        ('R4', 'Control', 'Q1', 'No'),
+    ])
+    cleaned = DataCleaner(df, high_missing_threshold=50).run()
+    assert pd.api.types.is_integer_dtype(cleaned['purchase_binary'])
+    flags = cleaned.groupby('Respondent_ID')['purchase_binary'].agg(['min', 'max'])
+    # Every row of a respondent carries the same flag, whatever order their duplicate Q2 answers came in.
+    assert (flags['min'] == flags['max']).all()
+    assert flags['max'].to_dict() == {'R1': 1, 'R2': 1, 'R3': 0, 'R4': 0}
+
+
+def test_purchase_binary_without_q2_is_zero():
+    df = long_table([('R1', 'Control', 'Q1', 'Yes'), ('R2', 'Exposed', 'Q1', 'No')])
+    cleaned = DataCleaner(df, high_missing_threshold=50).run()
+    assert cleaned['purchase_binary'].tolist() == [0, 0]
@@ -0,0 +1,111 @@
+import itertools
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from brand_lift import uploads
+from brand_lift.profiling import RunProfiler
+from brand_lift.uploads import ImageUploader
+
+
+class FakeBatch:
+    def __init__(self, drive, callback):
+        self.drive, self.callback, self.requests = drive, callback, []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.drive.batches.append([request for _, request in self.requests])
+        for request_id, request in self.requests:
+            failed = request['fileId'] in self.drive.permission_failures
+            self.callback(request_id, None if failed else {'id': 'perm'}, RuntimeError("denied") if failed else None)
+
+
+class FakeDriveService:
+    """files().create / permissions().create / new_batch_http_request, recording what was sent."""
+    def __init__(self, upload_failures=(), permission_failures=()):
+        self.upload_failures = set(upload_failures)
+        self.permission_failures = set(permission_failures)
+        self.uploaded, self.batches = [], []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def files(self):
+        return self
+
+    def permissions(self):
+        return SimpleNamespace(create=self._create_permission)
+
+    def create(self, body, media_body, fields):
+        def execute():
+            if body['name'] in self.upload_failures:
+                raise RuntimeError("upload failed")
+            with self._lock:
+                file_id = f"file{next(self._ids)}"
+                self.uploaded.append((body['name'], body['parents'], media_body))
+            return {'id': file_id, 'webContentLink': f"https://drive/{file_id}"}
+        return SimpleNamespace(execute=execute)
+
+    def _create_permission(self, fileId, body):
+        # Only ever sent inside a batch: a direct execute() would be a round trip per image.
+        assert body == {'role': 'reader', 'type': 'anyone'}
+        return {'fileId': fileId}
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    monkeypatch.setattr(uploads, 'GOOGLE_API_AVAILABLE', True)
+    monkeypatch.setattr(uploads, 'MediaFileUpload', lambda path, mimetype: (path, mimetype), raising=False)
+    return FakeDriveService()
+
+
+def write_images(tmp_path, contents):
+    paths = []
+    for name, data in contents.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        paths.append(str(path))
+    return paths
+
+
+def test_identical_images_upload_once_and_permissions_go_in_one_batch(tmp_path, drive):
+    a, a_copy, b, c = write_images(tmp_path, {'a.png': b'A', 'a_copy.png': b'A', 'b.png': b'B', 'c.png': b'C'})
+    profiler = RunProfiler()
+    uploader = ImageUploader('folder', lambda: drive, max_workers=4, profiler=profiler)
+    with pytest.warns(UserWarning, match="not found"):
+        urls = uploader.upload([a, a_copy, b, c, a, None, str(tmp_path / 'missing.png')])
+
+    assert sorted(name for name, _, _ in drive.uploaded) in (['a.png', 'b.png', 'c.png'], ['a_copy.png', 'b.png', 'c.png'])
+    assert {parents[0] for _, parents, _ in drive.uploaded} == {'folder'}
+    assert all(media[1] == 'image/png' for _, _, media in drive.uploaded)
+    assert len(drive.batches) == 1 and len(drive.batches[0]) == 3
+    assert set(urls) == {a, a_copy, b, c}
+    assert urls[a] == urls[a_copy] and len({urls[a], urls[b], urls[c]}) == 3
+    assert uploader.uploads == 3
+    assert profiler.calls['drive'] == 4  # three uploads and one permissions batch
+    assert [s['stage'] for s in profiler.stages] == ['upload_images']
+
+    # A later call only sends images it has not seen, matched by content rather than path.
+    d, b_again = write_images(tmp_path, {'d.png': b'D', 'b_again.png': b'B'})
+    later = uploader.upload([b, b_again, d])
+    assert len(drive.uploaded) == 4 and len(drive.batches) == 2 and len(drive.batches[1]) == 1
+    assert later[b_again] == urls[b]
+
+
+def test_permission_batches_are_capped_and_failures_get_no_url(tmp_path, drive):
+    paths = write_images(tmp_path, {f"{i}.png": bytes([i]) for i in range(5)})
+    drive.upload_failures = {'0.png'}
+    drive.permission_failures = {'file1'}
+    uploader = ImageUploader('folder', lambda: drive, max_workers=1, batch_max_calls=2)
+    with pytest.warns(UserWarning):
+        urls = uploader.upload(paths)
+
+    assert [len(batch) for batch in drive.batches] == [2, 2]
+    assert urls[paths[0]] is None
+    assert sum(url is None for url in urls.values()) == 2
+    assert uploader.uploads == 4